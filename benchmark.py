@@ -0,0 +1,757 @@
+"""Benchmarks for the scanner and thumbnail code on synthetic backup trees.
+
+    python benchmark.py generate /tmp/bench_tree --projects 40 --files 60
+    python benchmark.py run --tree /tmp/bench_tree -o before.json
+    python benchmark.py run --tree /tmp/bench_tree -o after.json --compare before.json
+    python benchmark.py compare before.json after.json
+
+The generated tree looks like a real backup drive: clients, years and
+projects with shooting days, each day holding card dumps in the folder
+layouts cameras write (DCIM/100EOS5D, PRIVATE/AVCHD/BDMV/STREAM,
+PRIVATE/M4ROOT/CLIP, ...) next to ordinary edit and export folders. Media
+files start with the header of their format and are padded (sparsely where
+the filesystem allows) to a realistic size; some cards are dumped twice so
+the duplicate finder has work to do. JPEGs are real, decodable images when
+Pillow is installed.
+
+Every case runs in a fresh interpreter so the peak RSS reported is that of
+the case alone. Each case is timed --repeats times (the best run is the
+headline number) and then run once more with os.scandir, os.stat and open
+wrapped to count filesystem calls per file in the tree. Results are saved as
+JSON together with the commit they were measured on.
+"""
+
+import argparse
+import builtins
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import mediaScan
+from mediaScan import MediaScanner
+
+BENCHMARK_VERSION = 1
+
+# name template, content kind
+CANON_FILES = [('IMG_{n:04d}.JPG', 'jpeg'), ('IMG_{n:04d}.CR2', 'cr2'), ('MVI_{n:04d}.MOV', 'mov')]
+SONY_PHOTO_FILES = [('DSC{n:05d}.JPG', 'jpeg'), ('DSC{n:05d}.ARW', 'tiff')]
+NIKON_FILES = [('DSC_{n:04d}.NEF', 'tiff'), ('DSC_{n:04d}.JPG', 'jpeg')]
+GOPRO_FILES = [('GX01{n:04d}.MP4', 'mp4'), ('GX01{n:04d}.THM', 'jpeg'),
+               ('GL01{n:04d}.LRV', 'mp4'), ('GOPR{n:04d}.JPG', 'jpeg')]
+DJI_FILES = [('DJI_{n:04d}.JPG', 'jpeg'), ('DJI_{n:04d}.DNG', 'tiff'),
+             ('DJI_{n:04d}.MP4', 'mp4'), ('DJI_{n:04d}.SRT', 'text')]
+
+# Folder layout of a card dump: relative folder, file templates (empty = no files)
+CARD_LAYOUTS = {
+    'canon': [('DCIM/100EOS5D', CANON_FILES), ('DCIM/101EOS5D', CANON_FILES),
+              ('MISC', [])],
+    'sony_avchd': [('PRIVATE/AVCHD/BDMV/STREAM', [('{n:05d}.MTS', 'mts')]),
+                   ('PRIVATE/AVCHD/BDMV/CLIPINF', [('{n:05d}.CPI', 'text')]),
+                   ('DCIM/100MSDCF', SONY_PHOTO_FILES)],
+    'sony_xavc': [('PRIVATE/M4ROOT/CLIP', [('C{n:04d}.MP4', 'mp4'), ('C{n:04d}M01.XML', 'text')]),
+                  ('PRIVATE/M4ROOT/THMBNL', [('C{n:04d}T01.JPG', 'jpeg')])],
+    'panasonic': [('PRIVATE/AVCHD/BDMV/STREAM', [('{n:05d}.MTS', 'mts')]),
+                  ('DCIM/100_PANA', [('P{n:07d}.JPG', 'jpeg')])],
+    'nikon': [('DCIM/100NCD750', NIKON_FILES)],
+    'gopro': [('DCIM/100GOPRO', GOPRO_FILES)],
+    'dji': [('DCIM/100MEDIA', DJI_FILES)],
+}
+
+# Ordinary project folders next to the card dumps
+PROJECT_FOLDERS = [
+    ('Edit', [('project_v{n}.prproj', 'text'), ('notes_{n}.txt', 'text')]),
+    ('Exports', [('export_{n:02d}.mp4', 'mp4')]),
+    ('Audio', [('ZOOM{n:04d}.WAV', 'text')]),
+]
+
+GROUP_LEVELS = ['Client', 'Year', 'Archive', 'Disk', 'Set']
+
+# Leading bytes of each kind of file
+FILE_HEADERS = {
+    'jpeg': b'\xff\xd8\xff\xe1\x00\x10Exif\x00\x00II*\x00\x08\x00\x00\x00\xff\xd9',
+    'cr2': b'II*\x00\x10\x00\x00\x00CR\x02\x00\x00\x00\x00\x00',
+    'tiff': b'II*\x00\x08\x00\x00\x00',
+    'mp4': b'\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom',
+    'mov': b'\x00\x00\x00\x14ftypqt  \x00\x00\x02\x00qt  ',
+    'mts': b'\x00\x00\x00\x00\x47\x40\x00\x10\x00',
+    'text': b'synthetic benchmark file\n',
+}
+
+def file_size_kb(kind: str, options) -> int:
+    if kind in ('mp4', 'mov', 'mts'):
+        return options.video_kb
+    if kind in ('cr2', 'tiff'):
+        return options.raw_kb
+    if kind == 'jpeg':
+        return options.photo_kb
+    return 4
+
+def exif_with_thumbnail(thumbnail: bytes) -> bytes:
+    """Minimal little-endian EXIF block whose IFD1 carries a JPEG thumbnail"""
+    ifd0 = struct.pack('<H', 1) + struct.pack('<HHII', 0x0112, 3, 1, 1) + struct.pack('<I', 26)
+    ifd1 = (struct.pack('<H', 2) + struct.pack('<HHII', 0x0201, 4, 1, 56)
+            + struct.pack('<HHII', 0x0202, 4, 1, len(thumbnail)) + struct.pack('<I', 0))
+    return b'Exif\x00\x00' + b'II*\x00' + struct.pack('<I', 8) + ifd0 + ifd1 + thumbnail
+
+def jpeg_samples(pixels: int, count: int = 8) -> List[bytes]:
+    """A few real JPEGs to use as photo content (stub headers without Pillow).
+
+    Like camera JPEGs, every other sample embeds a 160x120 EXIF preview,
+    so the thumbnail cases exercise both the EXIF and the draft decode path.
+    """
+    if not pixels:
+        return []
+    try:
+        from PIL import Image
+    except ImportError:
+        return []
+    from io import BytesIO
+
+    samples = []
+    width, height = pixels, pixels * 3 // 4
+    for i in range(count):
+        img = Image.new('RGB', (width, height), ((i * 67) % 256, (i * 131) % 256, 160))
+        # A gradient band so the encoder has real work to do
+        band = Image.linear_gradient('L').resize((width, height // 2))
+        img.paste(Image.merge('RGB', (band, band, band)), (0, height // 4))
+        options = {'quality': 85}
+        if i % 2 == 0:
+            preview = BytesIO()
+            img.resize((160, 120)).save(preview, 'JPEG', quality=75)
+            options['exif'] = exif_with_thumbnail(preview.getvalue())
+        buffer = BytesIO()
+        img.save(buffer, 'JPEG', **options)
+        samples.append(buffer.getvalue())
+    return samples
+
+def box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+def canon_movie_header(preview: bytes) -> bytes:
+    """QuickTime header with the moov/udta/CNTH/CNDA preview EOS cameras write"""
+    return FILE_HEADERS['mov'] + box(b'moov', box(b'udta', box(b'CNTH', box(b'CNDA', preview))))
+
+def write_media_file(path: str, kind: str, rng: random.Random, options, jpegs: List[bytes]) -> int:
+    """Write a header, pad to a jittered size and end with a few unique bytes"""
+    if kind == 'jpeg' and jpegs:
+        header = rng.choice(jpegs)
+    elif kind == 'mov' and jpegs:
+        header = canon_movie_header(rng.choice(jpegs))
+    else:
+        header = FILE_HEADERS[kind]
+    size = int(file_size_kb(kind, options) * 1024 * rng.uniform(0.75, 1.25))
+    tail = rng.getrandbits(128).to_bytes(16, 'little')
+    size = max(size, len(header) + len(tail))
+    with open(path, 'wb') as f:
+        f.write(header)
+        # Zero padding is left as a hole where the filesystem supports it
+        f.truncate(size - len(tail))
+        f.seek(size - len(tail))
+        f.write(tail)
+    return size
+
+def write_folder_files(folder: str, templates, count: int, rng: random.Random,
+                       options, jpegs: List[bytes]) -> Dict:
+    os.makedirs(folder, exist_ok=True)
+    written = {'files': 0, 'bytes': 0}
+    if not templates:
+        return written
+    for i in range(count):
+        # Consecutive files share a number: IMG_0001.JPG + IMG_0001.CR2, GX010001.MP4 + .THM
+        template, kind = templates[i % len(templates)]
+        path = os.path.join(folder, template.format(n=i // len(templates) + 1))
+        written['bytes'] += write_media_file(path, kind, rng, options, jpegs)
+        written['files'] += 1
+    return written
+
+def write_card(card_path: str, layout: str, seed: int, options, jpegs: List[bytes]) -> Dict:
+    """Write one card dump; the same seed always produces identical files"""
+    rng = random.Random(seed)
+    written = {'files': 0, 'bytes': 0}
+    for folder, templates in CARD_LAYOUTS[layout]:
+        count = max(1, int(options.files * rng.uniform(0.5, 1.5)))
+        result = write_folder_files(os.path.join(card_path, *folder.split('/')),
+                                    templates, count, rng, options, jpegs)
+        written['files'] += result['files']
+        written['bytes'] += result['bytes']
+    return written
+
+def project_path(root: str, project: int, depth: int) -> str:
+    """Spread projects over depth levels of grouping folders, three per level"""
+    parts = []
+    for level in range(depth):
+        name = GROUP_LEVELS[level % len(GROUP_LEVELS)]
+        parts.append(f"{name}_{(project // 3 ** (depth - level - 1)) % 3}")
+    parts.append(f"Project_{project:03d}")
+    return os.path.join(root, *parts)
+
+def generate_tree(root: str, options) -> Dict:
+    """Create a synthetic backup tree under root and return what was written"""
+    rng = random.Random(options.seed)
+    jpegs = jpeg_samples(options.jpeg_pixels)
+    layouts = sorted(CARD_LAYOUTS)
+    summary = {'cards': 0, 'duplicate_cards': 0, 'files': 0, 'bytes': 0}
+
+    for project in range(options.projects):
+        project_dir = project_path(root, project, options.depth)
+        for folder, templates in PROJECT_FOLDERS:
+            result = write_folder_files(os.path.join(project_dir, folder), templates,
+                                        max(1, options.files // 10), rng, options, jpegs)
+            summary['files'] += result['files']
+            summary['bytes'] += result['bytes']
+
+        for day in range(1, options.days + 1):
+            day_dir = os.path.join(project_dir, f"Day_{day:02d}")
+            for card in range(1, options.cards + 1):
+                layout = rng.choice(layouts)
+                seed = rng.getrandbits(32)
+                card_dir = os.path.join(day_dir, f"{layout}_card{card}")
+                copies = [card_dir]
+                if rng.random() < options.duplicate_ratio:
+                    # The same card offloaded twice, as happens on real drives
+                    copies.append(card_dir + ' copy')
+                    summary['duplicate_cards'] += 1
+                for path in copies:
+                    result = write_card(path, layout, seed, options, jpegs)
+                    summary['files'] += result['files']
+                    summary['bytes'] += result['bytes']
+                summary['cards'] += 1
+
+    summary['real_jpegs'] = bool(jpegs)
+    return summary
+
+def tree_stats(root: str) -> Dict:
+    stats = {'dirs': 0, 'files': 0, 'bytes': 0}
+    for dirpath, dirnames, filenames in os.walk(root):
+        stats['dirs'] += 1
+        stats['files'] += len(filenames)
+        for name in filenames:
+            try:
+                stats['bytes'] += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return stats
+
+class CountingEntry:
+    """os.DirEntry stand-in that counts stat() calls"""
+    __slots__ = ('entry', 'counters')
+
+    def __init__(self, entry, counters):
+        self.entry = entry
+        self.counters = counters
+
+    @property
+    def name(self):
+        return self.entry.name
+
+    @property
+    def path(self):
+        return self.entry.path
+
+    def __fspath__(self):
+        return self.entry.path
+
+    def inode(self):
+        return self.entry.inode()
+
+    def is_dir(self, *, follow_symlinks=True):
+        return self.entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_file(self, *, follow_symlinks=True):
+        return self.entry.is_file(follow_symlinks=follow_symlinks)
+
+    def is_symlink(self):
+        return self.entry.is_symlink()
+
+    def stat(self, *, follow_symlinks=True):
+        self.counters['entry_stat'] += 1
+        return self.entry.stat(follow_symlinks=follow_symlinks)
+
+class CountingScandir:
+    def __init__(self, iterator, counters):
+        self.iterator = iterator
+        self.counters = counters
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return CountingEntry(next(self.iterator), self.counters)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.iterator.close()
+
+@contextlib.contextmanager
+def count_filesystem_calls():
+    """Count os.scandir, os.stat/lstat, DirEntry.stat and open calls"""
+    counters = {'scandir': 0, 'stat': 0, 'entry_stat': 0, 'open': 0}
+    real_scandir, real_stat, real_lstat, real_open = os.scandir, os.stat, os.lstat, builtins.open
+
+    def scandir(*args, **kwargs):
+        counters['scandir'] += 1
+        return CountingScandir(real_scandir(*args, **kwargs), counters)
+
+    def stat(*args, **kwargs):
+        counters['stat'] += 1
+        return real_stat(*args, **kwargs)
+
+    def lstat(*args, **kwargs):
+        counters['stat'] += 1
+        return real_lstat(*args, **kwargs)
+
+    def counting_open(*args, **kwargs):
+        counters['open'] += 1
+        return real_open(*args, **kwargs)
+
+    os.scandir, os.stat, os.lstat, builtins.open = scandir, stat, lstat, counting_open
+    try:
+        yield counters
+    finally:
+        os.scandir, os.stat, os.lstat, builtins.open = real_scandir, real_stat, real_lstat, real_open
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if unavailable)"""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        return round(peak / divisor, 1)
+
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return round(counters.PeakWorkingSetSize / (1024 * 1024), 1)
+    except Exception:
+        pass
+    return None
+
+# Benchmark cases. Each one gets the case context and returns the seconds of
+# its timed part plus any case-specific numbers; setup stays outside the timer.
+
+def timed_scan(context, name: str, **kwargs) -> Dict:
+    output_file = os.path.join(context['workdir'], name)
+    scanner = MediaScanner(context['tree'], output_file, **kwargs)
+    start = time.perf_counter()
+    results = scanner.scan_and_save()
+    seconds = time.perf_counter() - start
+    if not results:
+        raise RuntimeError(f"Scan of {context['tree']} failed")
+    return {'seconds': seconds, 'folders': results['total_folders'],
+            'reused_folders': scanner.reused_folders}
+
+def case_scan_json(context):
+    return timed_scan(context, 'scan.json')
+
+def case_scan_parallel(context):
+    result = timed_scan(context, 'scan_parallel.json', workers=context['workers'])
+    result['workers'] = context['workers']
+    return result
+
+def case_scan_ndjson(context):
+    return timed_scan(context, 'scan.ndjson')
+
+def case_rescan_unchanged(context):
+    return timed_scan(context, 'rescan.json', previous_scan=context['baseline'])
+
+def case_scan_duplicates(context):
+    return timed_scan(context, 'scan_duplicates.json', find_duplicates=True)
+
+def case_folder_helpers(context):
+    """The per-folder helpers the scanner was originally built on"""
+    folders = mediaScan.load_scan(context['baseline'])['folders']
+    scanner = MediaScanner(context['tree'], os.devnull)
+    start = time.perf_counter()
+    for folder in folders:
+        path = MediaScanner._os_path(folder['path'])
+        scanner.contains_media_files(path)
+        scanner.get_folder_size(path)
+        scanner.get_media_info(path)
+    return {'seconds': time.perf_counter() - start, 'folders': len(folders)}
+
+def write_large_scans(baseline: str, workdir: str, folders: int) -> Dict:
+    """JSON and compact scans of `folders` records, cycled from the baseline scan under copy_NNNNN folders"""
+    with open(baseline, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    templates = data['folders']
+    if not templates:
+        raise ValueError("The baseline scan found no camera folders to copy")
+    records = []
+    for i in range(folders):
+        template = templates[i % len(templates)]
+        relative_path = os.path.join(f"copy_{i // len(templates):05d}",
+                                     MediaScanner._os_path(template['relative_path']))
+        records.append(dict(template, path=MediaScanner._record_path(os.path.join(data['base_path'], relative_path)),
+                            relative_path=MediaScanner._record_path(relative_path)))
+    data['folders'] = records
+    data.update(mediaScan.summarize_folders(records))
+    paths = {'large_json': os.path.join(workdir, 'large.json'),
+             'large_compact': os.path.join(workdir, 'large.mscan')}
+    for path in paths.values():
+        mediaScan.save_scan(data, path)
+    return paths
+
+def write_large_scans_subprocess(baseline: str, workdir: str, folders: int) -> Dict:
+    # Linux carries a process's peak RSS over into the children it starts,
+    # so the records are built in a child of their own
+    command = [sys.executable, os.path.abspath(__file__), '_large_scans', baseline, workdir,
+               '--folders', str(folders)]
+    completed = subprocess.run(command, stdout=subprocess.PIPE, text=True, check=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def timed_load(path: str) -> Dict:
+    start = time.perf_counter()
+    data = mediaScan.load_scan(path)
+    return {'seconds': time.perf_counter() - start, 'folders': len(data['folders'])}
+
+def case_load_large_json(context):
+    """Loading a large scan; its peak RSS is mostly the folder records"""
+    return timed_load(context['large_json'])
+
+def case_load_large_compact(context):
+    return timed_load(context['large_compact'])
+
+def thumbnail_files(context, grid):
+    """The first --thumbnails media files of the tree and their video previews,
+    collected the way the viewer lists a folder"""
+    from mediaScanGUI import add_preview_candidates, match_video_previews
+
+    files = []
+    candidates = {}
+    for dirpath, dirnames, filenames in os.walk(context['tree']):
+        dirnames.sort()
+        add_preview_candidates(candidates, dirpath, filenames)
+        for name in sorted(filenames):
+            if os.path.splitext(name.lower())[1] in grid.thumbnail_types:
+                files.append(os.path.join(dirpath, name))
+        if len(files) >= context['thumbnails']:
+            break
+    files = files[:context['thumbnails']]
+    return files, match_video_previews(files, candidates, grid.file_types['video'])
+
+def timed_thumbnails(context, warm: bool) -> Dict:
+    try:
+        import tkinter
+        from mediaScanGUI import ThumbnailGrid
+        root = tkinter.Tk()
+    except Exception as e:
+        return {'skipped': f"thumbnail grid unavailable: {str(e)}"}
+
+    try:
+        root.withdraw()
+        cache_path = os.path.join(context['workdir'], f"thumbnails_{time.time_ns()}.sqlite")
+        grid = ThumbnailGrid(root, cache_path=cache_path)
+        files, grid.video_previews = thumbnail_files(context, grid)
+        raw_types = grid.file_types['raw']
+        video_types = grid.file_types['video']
+
+        def decode_all():
+            decoded = 0
+            for path in files:
+                ext = os.path.splitext(path.lower())[1]
+                if ext in raw_types:
+                    img = grid.get_embedded_thumbnail(path)
+                elif ext in video_types:
+                    img = grid.get_video_thumbnail(path)
+                else:
+                    img = grid.get_pil_thumbnail(path)
+                decoded += img is not None
+            return decoded
+
+        if warm:
+            decode_all()
+        start = time.perf_counter()
+        decoded = decode_all()
+        seconds = time.perf_counter() - start
+        result = {'seconds': seconds, 'thumbnails': len(files), 'decoded': decoded,
+                  'ms_per_thumbnail': round(seconds * 1000 / max(1, len(files)), 3),
+                  'cache': grid.cache_stats(), 'tiers': grid.thumbnail_tier_stats()}
+        grid.destroy()
+        return result
+    finally:
+        root.destroy()
+
+def case_thumbnails_cold(context):
+    return timed_thumbnails(context, warm=False)
+
+def case_thumbnails_warm(context):
+    return timed_thumbnails(context, warm=True)
+
+CASES = {
+    'scan_json': case_scan_json,
+    'scan_parallel': case_scan_parallel,
+    'scan_ndjson': case_scan_ndjson,
+    'rescan_unchanged': case_rescan_unchanged,
+    'scan_duplicates': case_scan_duplicates,
+    'folder_helpers': case_folder_helpers,
+    'load_large_json': case_load_large_json,
+    'load_large_compact': case_load_large_compact,
+    'thumbnails_cold': case_thumbnails_cold,
+    'thumbnails_warm': case_thumbnails_warm,
+}
+
+def run_case(name: str, context: Dict, repeats: int) -> Dict:
+    """Time one case in this process; called in a child interpreter"""
+    case = CASES[name]
+    runs = []
+    extra = {}
+    for _ in range(max(1, repeats)):
+        extra = case(context)
+        if 'skipped' in extra:
+            return {'name': name, 'skipped': extra['skipped']}
+        runs.append(extra.pop('seconds'))
+
+    # Untimed pass: the wrappers would distort the timings above
+    with count_filesystem_calls() as counters:
+        case(context)
+
+    files = max(1, context['files'])
+    result = {
+        'name': name,
+        'seconds': round(min(runs), 6),
+        'mean_seconds': round(sum(runs) / len(runs), 6),
+        'runs': [round(seconds, 6) for seconds in runs],
+        'scandir_calls': counters['scandir'],
+        'stat_calls': counters['stat'] + counters['entry_stat'],
+        'open_calls': counters['open'],
+        'stats_per_file': round((counters['stat'] + counters['entry_stat']) / files, 4),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    result.update(extra)
+    return result
+
+def run_case_subprocess(name: str, context: Dict, repeats: int) -> Dict:
+    command = [sys.executable, os.path.abspath(__file__), '_case', name,
+               '--context', json.dumps(context), '--repeats', str(repeats)]
+    completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        error = completed.stderr.strip().splitlines()
+        return {'name': name, 'error': error[-1] if error else f"exit code {completed.returncode}"}
+    return json.loads(lines[-1])
+
+def git_commit() -> Dict:
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+    return {'commit': commit, 'dirty': bool(status)}
+
+def run_benchmarks(args) -> Dict:
+    names = args.cases or list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        raise ValueError(f"Unknown benchmark case(s): {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory(prefix='mediascan_bench_') as workdir:
+        tree = args.tree
+        generated = None
+        if tree is None:
+            tree = os.path.join(workdir, 'tree')
+            print(f"Generating synthetic tree in {tree}", file=sys.stderr)
+            generated = generate_tree(tree, args)
+        elif not os.path.isdir(tree):
+            raise ValueError(f"Not a folder: {tree}")
+
+        stats = tree_stats(tree)
+        baseline = os.path.join(workdir, 'baseline.json')
+        with contextlib.redirect_stdout(sys.stderr):
+            MediaScanner(tree, baseline).scan_and_save()
+
+        context = {'tree': os.path.abspath(tree), 'workdir': workdir, 'baseline': baseline,
+                   'workers': args.workers, 'thumbnails': args.thumbnails, 'files': stats['files']}
+        if any(name.startswith('load_large') for name in names):
+            print(f"Writing scans of {args.load_folders:,} folders", file=sys.stderr)
+            context.update(write_large_scans_subprocess(baseline, workdir, args.load_folders))
+        cases = {}
+        for name in names:
+            print(f"Running {name}...", file=sys.stderr)
+            cases[name] = run_case_subprocess(name, context, args.repeats)
+
+    tree_info = dict(stats, path=os.path.abspath(args.tree) if args.tree else None)
+    if generated is not None:
+        tree_info['generated'] = dict(generated, **generator_options(args))
+
+    report = {
+        'benchmark_version': BENCHMARK_VERSION,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeats': args.repeats,
+        'tree': tree_info,
+        'cases': cases,
+    }
+    report.update(git_commit())
+    return report
+
+def generator_options(args) -> Dict:
+    return {key: getattr(args, key) for key in
+            ('projects', 'days', 'cards', 'files', 'depth', 'photo_kb', 'raw_kb',
+             'video_kb', 'jpeg_pixels', 'duplicate_ratio', 'seed')}
+
+def format_report(report: Dict) -> str:
+    lines = [f"commit {report.get('commit')}{' (dirty)' if report.get('dirty') else ''}, "
+             f"{report['tree']['files']:,} files in {report['tree']['dirs']:,} folders"]
+    for name, case in report['cases'].items():
+        if 'seconds' not in case:
+            lines.append(f"  {name:<18} {case.get('skipped') or 'error: ' + case.get('error', '?')}")
+            continue
+        rss = case['peak_rss_mb']
+        lines.append(f"  {name:<18} {case['seconds']:>9.3f} s  "
+                     f"{case['stats_per_file']:>7.3f} stats/file  "
+                     f"{rss if rss is not None else '?':>7} MB peak")
+    return '\n'.join(lines)
+
+def compare_reports(before: Dict, after: Dict) -> str:
+    lines = [f"{before.get('commit')} -> {after.get('commit')}"]
+    for name, case in after['cases'].items():
+        old = before['cases'].get(name, {})
+        if 'seconds' not in case or 'seconds' not in old:
+            continue
+        change = (case['seconds'] - old['seconds']) / old['seconds'] * 100 if old['seconds'] else 0.0
+        lines.append(f"  {name:<18} {old['seconds']:>9.3f} s -> {case['seconds']:>9.3f} s "
+                     f"({change:+.1f}%)  stats/file {old['stats_per_file']} -> {case['stats_per_file']}")
+    return '\n'.join(lines)
+
+def load_report(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def add_generator_arguments(parser) -> None:
+    parser.add_argument('--projects', type=int, default=20, help='number of projects (default: 20)')
+    parser.add_argument('--days', type=int, default=3, help='shooting days per project (default: 3)')
+    parser.add_argument('--cards', type=int, default=2, help='card dumps per day (default: 2)')
+    parser.add_argument('--files', type=int, default=40,
+                        help='average files per camera folder (default: 40)')
+    parser.add_argument('--depth', type=int, default=2,
+                        help='grouping folders above each project (default: 2)')
+    parser.add_argument('--photo-kb', type=int, default=256, help='average JPEG size (default: 256)')
+    parser.add_argument('--raw-kb', type=int, default=1024, help='average RAW size (default: 1024)')
+    parser.add_argument('--video-kb', type=int, default=4096, help='average video size (default: 4096)')
+    parser.add_argument('--jpeg-pixels', type=int, default=640,
+                        help='width of the real JPEGs written with Pillow; 0 for stub headers (default: 640)')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.1,
+                        help='share of cards that are dumped twice (default: 0.1)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (default: 1)')
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog='benchmark', description='Benchmark mediaScan on synthetic camera backup trees.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help='write a synthetic backup tree')
+    generate.add_argument('path', help='folder to create the tree in')
+    add_generator_arguments(generate)
+
+    run = commands.add_parser('run', help='run the benchmark cases')
+    run.add_argument('--tree', help='existing tree to benchmark (default: generate a temporary one)')
+    run.add_argument('--cases', nargs='+', metavar='CASE',
+                     help=f"cases to run (default: all of {', '.join(CASES)})")
+    run.add_argument('--repeats', type=int, default=3, help='timed runs per case (default: 3)')
+    run.add_argument('--workers', type=int, default=4,
+                     help='threads for the scan_parallel case (default: 4)')
+    run.add_argument('--thumbnails', type=int, default=200,
+                     help='images decoded by the thumbnail cases (default: 200)')
+    run.add_argument('--load-folders', type=int, default=100000,
+                     help='folders in the scans loaded by the load_large cases (default: 100000)')
+    run.add_argument('-o', '--output', help='results file (default: benchmark_<commit>_<time>.json)')
+    run.add_argument('--compare', help='earlier results file to compare against')
+    add_generator_arguments(run)
+
+    compare = commands.add_parser('compare', help='compare two results files')
+    compare.add_argument('before')
+    compare.add_argument('after')
+
+    large_scans = commands.add_parser('_large_scans')
+    large_scans.add_argument('baseline')
+    large_scans.add_argument('workdir')
+    large_scans.add_argument('--folders', type=int, required=True)
+
+    case = commands.add_parser('_case')
+    case.add_argument('name', choices=list(CASES))
+    case.add_argument('--context', required=True)
+    case.add_argument('--repeats', type=int, default=3)
+    return parser
+
+def main(argv=None) -> int:
+    args = build_arg_parser().parse_args(argv)
+
+    if args.command == '_case':
+        # Scanner errors are printed on stdout; keep it for the result line
+        with contextlib.redirect_stdout(sys.stderr):
+            result = run_case(args.name, json.loads(args.context), args.repeats)
+        print(json.dumps(result))
+        return 0
+
+    if args.command == '_large_scans':
+        print(json.dumps(write_large_scans(args.baseline, args.workdir, args.folders)))
+        return 0
+
+    if args.command == 'generate':
+        if os.path.exists(args.path) and os.listdir(args.path):
+            print(f"Error: {args.path} is not empty", file=sys.stderr)
+            return 1
+        summary = generate_tree(args.path, args)
+        print(json.dumps(summary, indent=2))
+        return 0
+
+    if args.command == 'compare':
+        print(compare_reports(load_report(args.before), load_report(args.after)))
+        return 0
+
+    try:
+        report = run_benchmarks(args)
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+
+    output = args.output or (f"benchmark_{report.get('commit') or 'unknown'}_"
+                             f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(format_report(report))
+    if args.compare:
+        print(compare_reports(load_report(args.compare), report))
+    print(f"Results saved to {output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
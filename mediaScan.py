@@ -1,875 +1,3137 @@
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, Canvas
+import array
+import fnmatch
 import json
 import os
-from PIL import Image, ImageTk
+import re
+import sys
 import datetime
-from typing import Dict, List
-import subprocess
-from tkinter import Canvas, Scrollbar
+from typing import Dict, List, Tuple
 import threading
-from queue import Queue
+import collections
+import collections.abc
+import contextlib
+import hashlib
+import heapq
+import operator
+import struct
+import time
+from queue import Queue, Empty
+
+# Scanning and the command line only use the standard library. The Tk viewer
+# lives in mediaScanGUI and is imported only when the GUI is started, so a
+# headless scan never loads tkinter, PIL, rawpy or pywin32.
+
+class ScanProgress:
+    """Thread-safe scan counters with a running estimate of the total work.
+
+    There is no counting pre-pass. The total number of directories is
+    estimated from what has been seen so far: for every depth the average
+    fan-out (subdirectories found per directory listed) gives the expected
+    size of a not-yet-listed subtree at that depth, and the directories
+    still waiting in the frontier are weighted by it. The estimate firms up
+    as the scan proceeds and the reported percentage never moves backwards.
+    The first few dozen directories say little about the tree's shape, so
+    no percentage is reported until min_sample directories have been listed.
+    """
+
+    min_sample = 64
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.start_time = time.monotonic()
+        self.last_report = 0.0
+        self.dirs = 0
+        self.files = 0
+        self.bytes = 0
+        self.listed = [0]        # directories listed, per depth
+        self.discovered = [1]    # directories found (root counts as found), per depth
+        self.percent = 0.0
+
+    def directory_listed(self, depth: int, subdirs: int, files: int, size: int) -> None:
+        with self.lock:
+            while len(self.discovered) < depth + 2:
+                self.discovered.append(0)
+                self.listed.append(0)
+            self.listed[depth] += 1
+            self.discovered[depth + 1] += subdirs
+            self.dirs += 1
+            self.files += files
+            self.bytes += size
+
+    def add_bytes(self, size: int) -> None:
+        with self.lock:
+            self.bytes += size
+
+    def estimated_total(self) -> float:
+        """Directories listed so far plus the expected size of the frontier"""
+        levels = len(self.discovered)
+        subtree = [1.0] * (levels + 1)
+        for depth in range(levels - 2, -1, -1):
+            if self.listed[depth]:
+                fanout = self.discovered[depth + 1] / self.listed[depth]
+                subtree[depth] = 1.0 + fanout * subtree[depth + 1]
+        total = float(self.dirs)
+        for depth in range(levels):
+            frontier = self.discovered[depth] - self.listed[depth]
+            total += frontier * subtree[depth]
+        return total
+
+    def due(self) -> bool:
+        """True at most once per interval; used to throttle progress callbacks"""
+        now = time.monotonic()
+        if now - self.last_report < self.interval:
+            return False
+        self.last_report = now
+        return True
+
+    def snapshot(self, done: bool = False) -> Dict:
+        with self.lock:
+            elapsed = max(time.monotonic() - self.start_time, 1e-6)
+            if done:
+                self.percent = 100.0
+            elif self.dirs >= self.min_sample:
+                estimate = min(self.dirs / self.estimated_total() * 100, 99.9)
+                self.percent = max(self.percent, estimate)
+            fraction = self.percent / 100
+            eta = elapsed * (1 - fraction) / fraction if fraction else None
+            return {
+                'percent': self.percent,
+                'dirs': self.dirs,
+                'files': self.files,
+                'bytes': self.bytes,
+                'elapsed': elapsed,
+                'dirs_per_sec': self.dirs / elapsed,
+                'files_per_sec': self.files / elapsed,
+                'eta_seconds': 0.0 if done else eta,
+                'done': done,
+            }
+
+class Telemetry:
+    """Counters, phase timers, slowest-path samples and errors of a scan.
+
+    Cheap enough to leave on: hot loops tally locally and hand over one
+    record() per directory (or per thumbnail), which takes the lock once.
+    Timers keep count, total and maximum; the slowest samples per timer
+    are kept in a bounded heap. error() still prints, as before, and keeps
+    the first few messages for the report.
+    """
+
+    def __init__(self, samples: int = 10, error_samples: int = 20):
+        self.samples = samples
+        self.error_samples = error_samples
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}
+        # name -> [count, total seconds, max seconds]
+        self.timers = {}
+        # name -> min-heap of (seconds, label), the slowest kept
+        self.slowest = {}
+        self.error_count = 0
+        self.errors = []
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, counters: Dict = None, timings: Dict = None, label: str = None) -> None:
+        """Add counter amounts and timer seconds in one go; label names the path for slow samples"""
+        with self.lock:
+            if counters:
+                for name, amount in counters.items():
+                    self.counters[name] = self.counters.get(name, 0) + amount
+            if timings:
+                for name, seconds in timings.items():
+                    self._time(name, seconds, label)
+
+    def _time(self, name: str, seconds: float, label) -> None:
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = [0, 0.0, 0.0]
+        timer[0] += 1
+        timer[1] += seconds
+        if seconds > timer[2]:
+            timer[2] = seconds
+        if label is not None:
+            heap = self.slowest.setdefault(name, [])
+            if len(heap) < self.samples:
+                heapq.heappush(heap, (seconds, label))
+            elif seconds > heap[0][0]:
+                heapq.heapreplace(heap, (seconds, label))
+
+    @contextlib.contextmanager
+    def phase(self, name: str, label: str = None):
+        """Time a block as one sample of timer name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(timings={name: time.perf_counter() - start}, label=label)
+
+    def error(self, message: str) -> None:
+        print(message)
+        with self.lock:
+            self.error_count += 1
+            if len(self.errors) < self.error_samples:
+                self.errors.append(message)
+
+    def report(self) -> Dict:
+        with self.lock:
+            return {
+                'elapsed_seconds': round(time.time() - self.started, 3),
+                'counters': dict(sorted(self.counters.items())),
+                'timers': {
+                    name: {'count': count, 'total_seconds': round(total, 6),
+                           'mean_ms': round(total * 1000 / count, 3), 'max_ms': round(longest * 1000, 3)}
+                    for name, (count, total, longest) in sorted(self.timers.items())
+                },
+                'slowest': {
+                    name: [{'ms': round(seconds * 1000, 3), 'path': label}
+                           for seconds, label in sorted(heap, reverse=True)]
+                    for name, heap in sorted(self.slowest.items())
+                },
+                'errors': {'count': self.error_count, 'samples': list(self.errors)},
+            }
+
+def format_telemetry(report: Dict, slowest: int = 3) -> str:
+    """Multi-line text rendering of a Telemetry report"""
+    lines = [f"elapsed {report['elapsed_seconds']:.2f} s"]
+    if report['counters']:
+        lines.append('counters: ' + ', '.join(f"{name} {value:,}" for name, value in report['counters'].items()))
+    for name, timer in report['timers'].items():
+        lines.append(f"{name}: {timer['count']:,} x {timer['mean_ms']:.3f} ms = "
+                     f"{timer['total_seconds']:.3f} s (max {timer['max_ms']:.1f} ms)")
+        for sample in report['slowest'].get(name, [])[:slowest]:
+            lines.append(f"    {sample['ms']:10.1f} ms  {sample['path']}")
+    errors = report['errors']
+    if errors['count']:
+        lines.append(f"errors: {errors['count']}")
+        lines.extend(f"    {message}" for message in errors['samples'][:slowest])
+    return '\n'.join(lines)
+
+class DuplicateFinder:
+    """Staged duplicate detection that avoids reading most bytes.
+
+    Candidates arrive grouped by size. Hardlinks to one inode are
+    collapsed first, since deleting one frees nothing: only the first path
+    is hashed and the others are listed as its aliases. Sizes left with a
+    single inode are dropped. The remaining files are hashed over their first and last
+    block, which separates nearly all non-identical files of equal size.
+    Only files that still collide after that are hashed in full, in
+    large sequential chunks. Hashing runs on a thread pool, since reads
+    from separate files overlap well on NAS and RAID storage.
+    """
+
+    def __init__(self, workers: int = 4, block_size: int = 64 * 1024,
+                 chunk_size: int = 8 * 1024 * 1024, telemetry: Telemetry = None):
+        self.workers = max(1, int(workers))
+        self.telemetry = telemetry
+        self.block_size = block_size
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        self.stats = {'files_considered': 0, 'hardlinks_skipped': 0, 'edge_hashed': 0,
+                      'fully_hashed': 0, 'bytes_read': 0}
+
+    def find(self, files_by_size: Dict[int, List[tuple]]) -> List[Dict]:
+        """Return duplicate groups, largest files first.
+
+        files_by_size maps a size to (path, inode) pairs, where inode is
+        (st_dev, st_ino) for files with more than one link and None
+        otherwise. Each group is {'id', 'size', 'hash', 'files', 'copies'}:
+        copies counts distinct inodes, and 'hardlinks' lists the paths
+        sharing one, when there are any.
+        """
+        import concurrent.futures
+
+        candidates = {}
+        aliases = {}
+        for size, files in files_by_size.items():
+            if len(files) < 2:
+                continue
+            inodes = {}
+            for path, inode in files:
+                inodes.setdefault(path if inode is None else inode, []).append(path)
+            if len(inodes) < 2:
+                continue
+            candidates[size] = []
+            for paths in inodes.values():
+                paths.sort()
+                candidates[size].append(paths[0])
+                if len(paths) > 1:
+                    aliases[paths[0]] = paths
+        self.stats['files_considered'] = sum(len(paths) for paths in candidates.values())
+        self.stats['hardlinks_skipped'] = sum(len(paths) - 1 for paths in aliases.values())
+        groups = []
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # Stage 2: first and last block. Files no larger than two blocks
+            # have been read completely, so their edge hash is final.
+            edge_groups = self._group_by(executor, self.edge_hash,
+                                         [(size, path) for size, paths in candidates.items() for path in paths])
+            pending = []
+            for (size, digest), paths in edge_groups.items():
+                if size <= 2 * self.block_size:
+                    groups.append((size, digest, paths))
+                else:
+                    pending.extend((size, path) for path in paths)
+
+            # Stage 3: full content, only for files that still collide
+            full_groups = self._group_by(executor, self.full_hash, pending)
+            groups.extend((size, digest, paths) for (size, digest), paths in full_groups.items())
+
+        groups.sort(key=lambda group: (-group[0], sorted(group[2])[0]))
+        results = []
+        for index, (size, digest, paths) in enumerate(groups):
+            group = {'id': index, 'size': size, 'hash': digest,
+                     'files': sorted(path for first in paths for path in aliases.get(first, (first,))),
+                     'copies': len(paths)}
+            hardlinks = sorted(aliases[first] for first in paths if first in aliases)
+            if hardlinks:
+                group['hardlinks'] = hardlinks
+            results.append(group)
+        return results
+
+    def _group_by(self, executor, hash_function, files) -> Dict:
+        """Hash (size, path) pairs in parallel; keep (size, hash) keys shared by 2+ files"""
+        buckets = {}
+        for (size, path), digest in zip(files, executor.map(lambda item: hash_function(*item), files)):
+            if digest is not None:
+                buckets.setdefault((size, digest), []).append(path)
+        return {key: paths for key, paths in buckets.items() if len(paths) > 1}
+
+    def edge_hash(self, size: int, path: str):
+        try:
+            hasher = hashlib.blake2b(digest_size=16)
+            with open(path, 'rb') as f:
+                head = f.read(self.block_size)
+                hasher.update(head)
+                read = len(head)
+                if size > 2 * self.block_size:
+                    f.seek(size - self.block_size)
+                    tail = f.read(self.block_size)
+                    hasher.update(tail)
+                    read += len(tail)
+                elif size > self.block_size:
+                    rest = f.read()
+                    hasher.update(rest)
+                    read += len(rest)
+            self._count('edge_hashed', read)
+            return hasher.hexdigest()
+        except OSError as e:
+            self._error(f"Error hashing {path}: {str(e)}")
+            return None
+
+    def full_hash(self, size: int, path: str):
+        try:
+            hasher = hashlib.blake2b(digest_size=32)
+            buffer = bytearray(self.chunk_size)
+            view = memoryview(buffer)
+            read = 0
+            with open(path, 'rb', buffering=0) as f:
+                while True:
+                    count = f.readinto(buffer)
+                    if not count:
+                        break
+                    hasher.update(view[:count])
+                    read += count
+            self._count('fully_hashed', read)
+            return hasher.hexdigest()
+        except OSError as e:
+            self._error(f"Error hashing {path}: {str(e)}")
+            return None
+
+    def _error(self, message: str) -> None:
+        if self.telemetry:
+            self.telemetry.error(message)
+        else:
+            print(message)
+
+    def _count(self, stage: str, read: int) -> None:
+        with self.lock:
+            self.stats[stage] += 1
+            self.stats['bytes_read'] += read
+
+def duplicate_group_inodes(group: Dict) -> List[List[str]]:
+    """A duplicate group's paths, one list per distinct inode"""
+    hardlinks = group.get('hardlinks', [])
+    linked = {path for paths in hardlinks for path in paths}
+    return hardlinks + [[path] for path in group['files'] if path not in linked]
+
+def duplicate_stats_by_folder(groups: List[Dict], folder_paths) -> Dict[str, Dict]:
+    """Per camera folder: duplicate files below it and the bytes its copies free.
+
+    A folder's copies of a group are all reclaimable when another copy
+    exists outside it; when every copy lives inside it, one must be kept.
+    A copy counts only when every hardlink to it is inside the folder.
+    folder_paths holds the folders' normalized (unescaped) paths.
+    """
+    per_folder = {}
+    for group in groups:
+        inodes = duplicate_group_inodes(group)
+        copies_by_folder = {}   # folder -> [files, copies]
+        for paths in inodes:
+            inside = {}
+            for file_path in paths:
+                directory = os.path.dirname(file_path)
+                while True:
+                    if directory in folder_paths:
+                        inside[directory] = inside.get(directory, 0) + 1
+                    parent = os.path.dirname(directory)
+                    if parent == directory:
+                        break
+                    directory = parent
+            for folder_path, files in inside.items():
+                counts = copies_by_folder.setdefault(folder_path, [0, 0])
+                counts[0] += files
+                if files == len(paths):
+                    counts[1] += 1
+
+        for folder_path, (files, copies) in copies_by_folder.items():
+            removable = copies if copies < len(inodes) else copies - 1
+            stats = per_folder.setdefault(folder_path, {'files': 0, 'reclaimable_bytes': 0, 'groups': []})
+            stats['files'] += files
+            stats['reclaimable_bytes'] += removable * group['size']
+            stats['groups'].append(group['id'])
+
+    for stats in per_folder.values():
+        stats['reclaimable_mb'] = round(stats['reclaimable_bytes'] / (1024 * 1024), 2)
+    return per_folder
+
+# Camera folder rules, tried in order; the first one that applies wins. Each
+# rule matches the folder name by exactly one of "exact" (case-insensitive
+# name), "glob" (whole name) or "regex" (searched, case-insensitive), and may
+# add structural conditions: "parent" (name of the containing folder) and
+# "contains" (has a subfolder with one of these names).
+DEFAULT_CAMERA_RULES = [
+    {'name': 'sony_xavc', 'exact': 'PRIVATE', 'contains': ['M4ROOT'], 'vendor': 'Sony'},
+    {'name': 'sony_xdcam', 'exact': 'XDROOT', 'vendor': 'Sony'},
+    {'name': 'private_avchd', 'exact': 'PRIVATE', 'contains': ['AVCHD']},
+    {'name': 'private', 'exact': 'PRIVATE'},
+    {'name': 'avchd', 'exact': 'AVCHD'},
+    {'name': 'sd_video', 'exact': 'SD_VIDEO', 'vendor': 'Panasonic'},
+    {'name': 'dcim', 'exact': 'DCIM'},
+    {'name': 'canon_eos', 'regex': r'^\d{3}EOS', 'vendor': 'Canon'},
+    {'name': 'canon_dcf', 'regex': r'^(\d{3}CANON|CANONMSC)$', 'vendor': 'Canon'},
+    {'name': 'canon_cinema', 'glob': 'CLIPS[0-9][0-9][0-9]', 'parent': ['CONTENTS'], 'vendor': 'Canon'},
+    {'name': 'nikon', 'regex': r'^\d{3}(NIKON|NC)', 'vendor': 'Nikon'},
+    {'name': 'sony_dcf', 'regex': r'^\d{3}MSDCF$', 'vendor': 'Sony'},
+    {'name': 'panasonic_dcf', 'regex': r'^\d{3}_PANA$', 'vendor': 'Panasonic'},
+    {'name': 'fujifilm_dcf', 'regex': r'^\d{3}_FUJI$', 'vendor': 'Fujifilm'},
+    {'name': 'olympus_dcf', 'regex': r'^\d{3}OLYMP$', 'vendor': 'Olympus'},
+    {'name': 'gopro', 'regex': r'^\d{3}GOPRO$', 'vendor': 'GoPro'},
+    {'name': 'dji_media', 'regex': r'^\d{3}MEDIA$', 'parent': ['DCIM'], 'vendor': 'DJI'},
+    {'name': 'dji_folder', 'regex': r'^DJI_\d{3}$', 'vendor': 'DJI'},
+    {'name': 'blackmagic_clip', 'regex': r'^[A-Z]\d{3}_\d{8}_C\d{3}$', 'vendor': 'Blackmagic'},
+    # Any other DCF folder (three digits and five characters) inside DCIM
+    {'name': 'dcf', 'regex': r'^\d{3}[A-Z0-9_]{5}$', 'parent': ['DCIM']},
+]
+
+CAMERA_RULES_FILE = 'camera_rules.json'
+
+class CameraFolderRules:
+    """Camera folder classifier compiled once from a list of rules.
+
+    Exact names go into a dictionary and every glob and regex into a single
+    alternation with one named group per rule, so classifying a directory is
+    one dictionary lookup and one regex match however many rules there are.
+    Only when a name matches is the rule list consulted: the alternation
+    reports the first pattern rule that matched, and later ones are tried
+    individually only if its structural conditions fail.
+    """
+
+    def __init__(self, rules: List[Dict]):
+        self.rules = []
+        self.exact = {}
+        self.pattern_rules = []
+        self.group_positions = {}
+        alternatives = []
+
+        for index, spec in enumerate(rules):
+            rule = self._compile_rule(index, spec)
+            self.rules.append(rule)
+            if rule['exact'] is not None:
+                self.exact.setdefault(rule['exact'], []).append(index)
+            else:
+                group = f"r{index}"
+                self.group_positions[group] = len(self.pattern_rules)
+                self.pattern_rules.append(index)
+                alternatives.append(f"(?P<{group}>{rule['source']})")
+
+        try:
+            self.pattern = (re.compile('|'.join(alternatives), re.IGNORECASE | re.DOTALL)
+                            if alternatives else None)
+        except re.error as e:
+            raise ValueError(f"Camera folder rules cannot be combined: {str(e)}")
+
+    @classmethod
+    def from_file(cls, path: str, include_defaults: bool = True) -> 'CameraFolderRules':
+        """Load rules from a JSON file: a list of rules or {"rules": [...]}.
+
+        The file's rules take precedence over the built-in ones, which are
+        appended unless the file sets "include_defaults": false.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            include_defaults = data.get('include_defaults', include_defaults)
+            data = data.get('rules', [])
+        if not isinstance(data, list):
+            raise ValueError(f"{path}: expected a list of camera folder rules")
+        return cls(data + (DEFAULT_CAMERA_RULES if include_defaults else []))
+
+    @staticmethod
+    def _compile_rule(index: int, spec: Dict) -> Dict:
+        kinds = [kind for kind in ('exact', 'glob', 'regex') if spec.get(kind)]
+        if len(kinds) != 1:
+            raise ValueError(f"Camera folder rule {index} needs exactly one of exact, glob or regex")
+        kind = kinds[0]
+        value = spec[kind]
+
+        if kind == 'glob':
+            source = fnmatch.translate(value)
+        elif kind == 'regex':
+            # Search semantics on top of the anchored match, unless the
+            # regex is anchored itself (the common, cheap case)
+            source = f"(?:{value})" if value.startswith('^') else f".*?(?:{value})"
+        else:
+            source = None
+
+        regex = None
+        if source is not None:
+            try:
+                regex = re.compile(source, re.IGNORECASE | re.DOTALL)
+            except re.error as e:
+                raise ValueError(f"Camera folder rule {index} ({value!r}): {str(e)}")
+
+        def names(key):
+            value = spec.get(key)
+            if value is None:
+                return None
+            if isinstance(value, str):
+                value = [value]
+            return frozenset(name.lower() for name in value)
+
+        return {
+            'name': spec.get('name') or f"{kind}:{value}",
+            'vendor': spec.get('vendor'),
+            'exact': value.lower() if kind == 'exact' else None,
+            'source': source,
+            'regex': regex,
+            'parent': names('parent'),
+            'contains': names('contains'),
+        }
+
+    def classify(self, name: str, parent_name: str = None, subfolders=None):
+        """Return the first rule that applies to a folder, or None.
+
+        subfolders is an iterable of the folder's subfolder names; it is
+        only consumed when a matching rule has a "contains" condition.
+        parent_name or subfolders may be None when unknown, in which case
+        rules that depend on them do not apply.
+        """
+        exact = self.exact.get(name.lower())
+        match = self.pattern.match(name) if self.pattern is not None else None
+        if exact is None and match is None:
+            return None
+
+        children = [subfolders, None]   # source, lower-cased set once built
+        best = None
+        for index in exact or ():
+            if self._applies(self.rules[index], parent_name, children):
+                best = index
+                break
+
+        if match is not None:
+            first = self.group_positions[match.lastgroup]
+            for position in range(first, len(self.pattern_rules)):
+                index = self.pattern_rules[position]
+                if best is not None and index > best:
+                    break
+                rule = self.rules[index]
+                if ((position == first or rule['regex'].match(name))
+                        and self._applies(rule, parent_name, children)):
+                    best = index
+                    break
+
+        return self.rules[best] if best is not None else None
+
+    @staticmethod
+    def _applies(rule: Dict, parent_name, children: List) -> bool:
+        if rule['parent'] is not None:
+            if parent_name is None or parent_name.lower() not in rule['parent']:
+                return False
+        if rule['contains'] is not None:
+            if children[1] is None:
+                if children[0] is None:
+                    return False
+                children[1] = {child.lower() for child in children[0]}
+            if rule['contains'].isdisjoint(children[1]):
+                return False
+        return True
 
 class MediaScanner:
-    def __init__(self, base_path: str, output_file: str):
-        self.base_path = os.path.normpath(base_path)
+    # Fields set while reviewing a scan, kept across incremental rescans
+    REVIEW_FIELDS = ('marked_for_deletion', 'processed')
+
+    def __init__(self, base_path, output_file: str, workers: int = 1,
+                 previous_scan: str = None, output_format: str = None,
+                 find_duplicates: bool = False, hash_workers: int = 4,
+                 camera_rules=None, disk_usage: bool = False):
+        # One folder or a list of roots, scanned concurrently per device
+        if isinstance(base_path, (list, tuple)):
+            self.roots = list(dict.fromkeys(os.path.normpath(path) for path in base_path))
+        else:
+            self.roots = [os.path.normpath(base_path)]
+        self.base_path = self.roots[0]
+        if len(self.roots) > 1:
+            try:
+                self.base_path = os.path.commonpath(self.roots)
+            except ValueError:
+                pass  # roots on different Windows drives
+        self.root_stats = {}
         self.output_file = output_file
-        self.camera_folder_patterns = [
-            'DCIM',
-            'PRIVATE',
-            '100EOS',
-            '101EOS',
-            '102EOS',
-            'CANON',
-            'SD_VIDEO',
-            'AVCHD',
-        ]
+        self.output_format = output_format or scan_format(output_file)
+        self.workers = max(1, int(workers))
+        self.previous_scan = previous_scan
+        self.previous_folders = None
+        self.reused_folders = 0
+        self.rescanned_folders = 0
+        self.progress = ScanProgress()
+        self.telemetry = Telemetry()
+        self.find_duplicates = find_duplicates
+        self.hash_workers = hash_workers
+        self.duplicate_candidates = {}
+        self.duplicate_lock = threading.Lock()
+        # Guards counters and totals shared by concurrently walked roots
+        self.totals_lock = threading.Lock()
+        self.disk_usage = disk_usage
+        self.disk_totals = None
+        self.camera_rules = self._load_camera_rules(camera_rules)
         self.media_extensions = {
             'photos': {'.jpg', '.jpeg', '.cr2', '.cr3', '.nef', '.arw', '.raw', '.dng'},
-            'videos': {'.mp4', '.mov', '.mts', '.m2ts', '.avi'}
+            'videos': {'.mp4', '.mov', '.mts', '.m2ts', '.avi', '.mxf', '.braw'}
         }
+
+    @staticmethod
+    def _load_camera_rules(camera_rules) -> CameraFolderRules:
+        """Compiled rules from an instance, a rules file, camera_rules.json next to this module, or the defaults"""
+        if isinstance(camera_rules, CameraFolderRules):
+            return camera_rules
+        if camera_rules is None:
+            local_rules = os.path.join(os.path.dirname(os.path.abspath(__file__)), CAMERA_RULES_FILE)
+            if os.path.isfile(local_rules):
+                camera_rules = local_rules
+        if camera_rules is not None:
+            return CameraFolderRules.from_file(camera_rules)
+        return CameraFolderRules(DEFAULT_CAMERA_RULES)
         
     def scan_and_save(self, progress_callback=None) -> Dict:
+        if self.output_format == 'ndjson':
+            return self.scan_and_stream(progress_callback)
         try:
             scan_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             results = {
                 'scan_time': scan_time,
                 'base_path': self.base_path,
+                **self._roots_header(),
                 'total_size_mb': 0,
                 'folders': []
             }
 
-            # First, count total folders for progress
-            total_folders = sum(1 for _ in os.walk(self.base_path))
-            processed_folders = 0
-
-            for root, dirs, _ in os.walk(self.base_path):
-                processed_folders += 1
-                if progress_callback:
-                    progress = (processed_folders / total_folders) * 100
-                    progress_callback(progress)
-
-                for dir_name in dirs:
-                    try:
-                        full_path = os.path.normpath(os.path.join(root, dir_name))
-                        
-                        if self.is_camera_folder(dir_name) and self.contains_media_files(full_path):
-                            size_mb = self.get_folder_size(full_path)
-                            media_info = self.get_media_info(full_path)
-                            
-                            folder_info = {
-                                'name': dir_name,
-                                'path': full_path.replace('\\', '\\\\'),
-                                'relative_path': os.path.relpath(full_path, self.base_path).replace('\\', '\\\\'),
-                                'size_mb': size_mb,
-                                'last_modified': datetime.datetime.fromtimestamp(
-                                    os.path.getmtime(full_path)
-                                ).strftime('%Y-%m-%d %H:%M:%S'),
-                                'media_info': media_info,
-                                'processed': False,
-                                'project_name': os.path.basename(os.path.dirname(full_path))
-                            }
-                            
-                            results['folders'].append(folder_info)
-                            results['total_size_mb'] += size_mb
-                            
-                    except Exception as e:
-                        print(f"Error processing directory {dir_name}: {str(e)}")
-                        continue
+            telemetry = self.telemetry = Telemetry()
+            with telemetry.phase('load_previous'):
+                self.load_previous_scan()
+            with telemetry.phase('walk'):
+                for folder_info in self.walk_camera_folders(progress_callback):
+                    results['folders'].append(folder_info)
 
+            # Sort before summing so parallel scans produce identical output
             results['folders'].sort(key=lambda x: x['path'].lower())
-            results['total_folders'] = len(results['folders'])
-            results['total_size_gb'] = round(results['total_size_mb'] / 1024, 2)
+            results.update(summarize_folders(results['folders']))
+            if self.previous_folders is not None:
+                results['incremental'] = self._incremental_summary()
+            if self.disk_usage:
+                results['disk_usage'] = self._disk_usage_summary()
+            if len(self.roots) > 1:
+                results['roots'] = self._root_summaries()
+            if self.find_duplicates:
+                folder_paths = {self._os_path(folder['path']): folder for folder in results['folders']}
+                groups = self._add_duplicate_results(results, folder_paths)
+                for folder_path, stats in duplicate_stats_by_folder(groups, folder_paths).items():
+                    folder_paths[folder_path]['duplicates'] = stats
             
-            with open(self.output_file, 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=4, ensure_ascii=False)
+            # The saved block cannot include its own write; the returned one does
+            results['telemetry'] = telemetry.report()
+            with telemetry.phase('write'):
+                save_scan(results, self.output_file, self.output_format)
+            results['telemetry'] = telemetry.report()
             
             return results
             
         except Exception as e:
-            print(f"Error during scan: {str(e)}")
+            self.telemetry.error(f"Error during scan: {str(e)}")
             return {}
 
-    def is_camera_folder(self, folder_name: str) -> bool:
-        return any(pattern.lower() in folder_name.lower() for pattern in self.camera_folder_patterns)
-    
-    def contains_media_files(self, folder_path: str) -> bool:
-        try:
-            all_extensions = self.media_extensions['photos'].union(self.media_extensions['videos'])
-            for root, _, files in os.walk(folder_path):
-                if any(f.lower().endswith(tuple(all_extensions)) for f in files):
-                    return True
-            return False
-        except Exception as e:
-            print(f"Error checking media files in {folder_path}: {str(e)}")
-            return False
-    
-    def get_folder_size(self, folder_path: str) -> float:
-        try:
-            total_size = 0
-            for root, _, files in os.walk(folder_path):
-                total_size += sum(
-                    os.path.getsize(os.path.join(root, file))
-                    for file in files
-                )
-            return round(total_size / (1024 * 1024), 2)
-        except Exception as e:
-            print(f"Error calculating size for {folder_path}: {str(e)}")
-            return 0.0
+    def scan_and_stream(self, progress_callback=None) -> Dict:
+        """Scan and write newline-delimited JSON as folders complete.
 
-    def get_media_info(self, folder_path: str) -> Dict:
-        info = {'photos': 0, 'videos': 0, 'total_files': 0, 'extensions': {}}
+        The file starts with a header record, has one line per camera folder
+        written (and flushed) as soon as its subtree is aggregated, and ends
+        with a summary record. Memory stays flat since no folder list is kept,
+        and an interrupted scan leaves every finished folder readable. Returns
+        the header and summary fields with an empty folder list.
+        """
         try:
-            for root, _, files in os.walk(folder_path):
-                for file in files:
-                    ext = os.path.splitext(file.lower())[1]
-                    if ext in self.media_extensions['photos']:
-                        info['photos'] += 1
-                    elif ext in self.media_extensions['videos']:
-                        info['videos'] += 1
-                    info['total_files'] += 1
-                    info['extensions'][ext] = info['extensions'].get(ext, 0) + 1
-        except Exception as e:
-            print(f"Error getting media info for {folder_path}: {str(e)}")
-        return info
-
-import concurrent.futures
-from functools import partial
+            results = {
+                'scan_time': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'base_path': self.base_path,
+                **self._roots_header(),
+            }
+            total_size_mb = 0
+            total_folders = 0
+            folder_paths = set()
+
+            telemetry = self.telemetry = Telemetry()
+            with telemetry.phase('load_previous'):
+                self.load_previous_scan()
+            remove_marks_journal(self.output_file)
+            walk_start = time.perf_counter()
+            with open(self.output_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'record': 'header', **results}, ensure_ascii=False) + '\n')
+                for folder_info in self.walk_camera_folders(progress_callback):
+                    write_start = time.perf_counter()
+                    f.write(json.dumps(folder_info, ensure_ascii=False, default=json_default) + '\n')
+                    f.flush()
+                    telemetry.record(timings={'write': time.perf_counter() - write_start})
+                    total_size_mb += folder_info['size_mb']
+                    total_folders += 1
+                    if self.find_duplicates:
+                        folder_paths.add(self._os_path(folder_info['path']))
+
+                telemetry.record(timings={'walk': time.perf_counter() - walk_start})
+                if self.find_duplicates:
+                    # Folder lines are already written; attach per-folder
+                    # duplicate stats as separate records keyed by path
+                    groups = self._add_duplicate_results(results, folder_paths)
+                    for folder_path, stats in duplicate_stats_by_folder(groups, folder_paths).items():
+                        record = {'record': 'folder_duplicates',
+                                  'path': self._record_path(folder_path), 'duplicates': stats}
+                        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+                results['total_size_mb'] = round(total_size_mb, 2)
+                results['total_folders'] = total_folders
+                results['total_size_gb'] = round(total_size_mb / 1024, 2)
+                if self.previous_folders is not None:
+                    results['incremental'] = self._incremental_summary()
+                if self.disk_usage:
+                    results['disk_usage'] = self._disk_usage_summary()
+                if len(self.roots) > 1:
+                    results['roots'] = self._root_summaries()
+                results['telemetry'] = telemetry.report()
+                summary = {key: results[key] for key in SCAN_SUMMARY_KEYS if key in results}
+                f.write(json.dumps({'record': 'summary', **summary}, ensure_ascii=False) + '\n')
+
+            results['folders'] = []
+            results['output_file'] = self.output_file
+            return results
 
-class ThumbnailGrid(ttk.Frame):
-    def __init__(self, parent, **kwargs):
-        super().__init__(parent, **kwargs)
-        self.thumbnail_size = 200
-        self.padding = 10
-        self.thumbnails = []
-        self.photo_references = {}  # Changed to dict to track by filepath
-        
-        # Create thread pool for background loading
-        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
-        self.pending_thumbnails = {}
-        
-        # Try to import rawpy
-        try:
-            import rawpy
-            self.rawpy = rawpy
-            self.has_rawpy = True
-        except ImportError:
-            print("rawpy not found. Install with: pip install rawpy")
-            self.has_rawpy = False
+        except Exception as e:
+            self.telemetry.error(f"Error during scan: {str(e)}")
+            return {}
 
-        # Try to import Windows specific libraries
-        try:
-            import win32com.client
-            import win32gui
-            import win32con
-            import win32ui
-            from win32com.shell import shell, shellcon
-            
-            self.win32gui = win32gui
-            self.win32con = win32con
-            self.win32ui = win32ui
-            self.shell = shell
-            self.shellcon = shellcon
-            self.has_shell = True
-        except ImportError:
-            print("pywin32 not found. Install with: pip install pywin32")
-            self.has_shell = False
-        
-        # Define file type icons
-        self.file_icons = {
-            'image': '📷',
-            'video': '🎥',
-            'raw': '📸',
-            'unknown': '📄'
+    def _add_duplicate_results(self, results: Dict, folder_paths) -> List[Dict]:
+        """Run the duplicate finder over the collected media files"""
+        finder = DuplicateFinder(workers=self.hash_workers, telemetry=self.telemetry)
+        with self.telemetry.phase('duplicates'):
+            groups = finder.find(self.duplicate_candidates)
+        self.telemetry.record(counters={f'duplicate_{name}': value for name, value in finder.stats.items()})
+        reclaimable = sum((group['copies'] - 1) * group['size'] for group in groups)
+        results['duplicates'] = {
+            'groups': len(groups),
+            'duplicate_files': sum(len(group['files']) for group in groups),
+            'reclaimable_bytes': reclaimable,
+            'reclaimable_gb': round(reclaimable / (1024 ** 3), 2),
+            **finder.stats,
         }
-        
-        # Define file extensions for each type
-        self.file_types = {
-            'image': {'.jpg', '.jpeg', '.png', '.gif', '.bmp'},
-            'video': {'.mp4', '.mov', '.avi', '.mts', '.m2ts'},
-            'raw': {'.cr2', '.cr3', '.nef', '.arw', '.raw', '.dng'}
+        results['duplicate_groups'] = groups
+        return groups
+
+    @staticmethod
+    def _os_path(record_path: str) -> str:
+        """Undo the backslash escaping of a folder record's path"""
+        return os.path.normpath(record_path.replace('\\\\', '\\'))
+
+    def _incremental_summary(self) -> Dict:
+        return {
+            'previous_scan': self.previous_scan,
+            'reused_folders': self.reused_folders,
+            'rescanned_folders': self.rescanned_folders,
         }
-        
-        self.create_widgets()
-
-    def create_widgets(self):
-        """Create and setup the UI elements"""
-        # Create canvas with scrollbar
-        self.canvas = Canvas(self, bg='white')
-        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
-        self.scrollable_frame = ttk.Frame(self.canvas)
-
-        # Configure canvas
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
-        
-        # Create scrollable window
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
 
-        # Pack scrollbar and canvas
-        self.scrollbar.pack(side="right", fill="y")
-        self.canvas.pack(side="left", fill="both", expand=True)
-
-        # Bind mousewheel
-        self.bind_mousewheel()
-
-    def bind_mousewheel(self):
-        def _on_mousewheel(event):
-            self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        self.canvas.bind_all("<MouseWheel>", _on_mousewheel)
+    def _roots_header(self) -> Dict:
+        return {'base_paths': list(self.roots)} if len(self.roots) > 1 else {}
+
+    def _root_summaries(self) -> List[Dict]:
+        """Per-root totals of a multi-root scan, in the order the roots were given"""
+        summaries = []
+        for root in self.roots:
+            stats = self.root_stats.get(root, {})
+            size_mb = stats.get('size_mb', 0)
+            summaries.append({
+                'path': self._record_path(root),
+                'device': stats.get('device'),
+                'total_folders': stats.get('folders', 0),
+                'total_size_mb': round(size_mb, 2),
+                'total_size_gb': round(size_mb / 1024, 2),
+                'seconds': round(stats.get('seconds', 0.0), 3),
+            })
+        return summaries
+
+    def _disk_usage_summary(self) -> Dict:
+        """Logical, allocated and reclaimable bytes of the whole scan, each file counted once"""
+        totals = self.disk_totals or self._empty_totals()
+        allocated = self._allocated_bytes(totals)
+        return {
+            'logical_bytes': totals['size'],
+            'allocated_bytes': allocated,
+            'reclaimable_bytes': totals['disk_bytes'],
+            'logical_gb': round(totals['size'] / (1024 ** 3), 2),
+            'allocated_gb': round(allocated / (1024 ** 3), 2),
+            'reclaimable_gb': round(totals['disk_bytes'] / (1024 ** 3), 2),
+            'shared_files': len(totals['links']),
+        }
 
-    def get_windows_thumbnail(self, file_path):
-        """Try to get thumbnail using Windows Shell"""
+    def load_previous_scan(self) -> None:
+        """Index the folders of previous_scan by path for an incremental rescan."""
+        self.previous_folders = None
+        self.reused_folders = 0
+        self.rescanned_folders = 0
+        if not self.previous_scan:
+            return
         try:
-            if not self.has_shell:
-                return None
+            previous = load_scan(self.previous_scan)
+            self.previous_folders = {folder['path']: folder for folder in previous.get('folders', [])}
+        except Exception as e:
+            self.telemetry.error(f"Error loading previous scan {self.previous_scan}: {str(e)}")
+
+    def walk_camera_folders(self, progress_callback=None):
+        """Yield a folder record for every camera folder under the scanned roots.
+
+        Single os.scandir pass: each directory is listed once, file sizes come
+        from the DirEntry stat cache and are only collected below camera
+        folders, and subtree totals are folded into the enclosing folder on
+        the way back up. With more than one worker the listing is spread over
+        a thread pool (see _walk_parallel), and several roots are walked
+        concurrently (see _walk_devices); records then arrive in completion
+        order, so callers that need a stable order sort them.
+        """
+        self.duplicate_candidates = {}
+        self.disk_totals = self._empty_totals() if self.disk_usage else None
+        self.root_stats = {}
+        progress = self.progress = ScanProgress()
+        if len(self.roots) > 1:
+            yield from self._walk_devices(progress_callback)
+        else:
+            yield from self._walk_root(self.roots[0], progress_callback)
+        if progress_callback:
+            progress_callback(progress.snapshot(done=True))
+
+    def _walk_root(self, root_path, progress_callback=None):
+        """Walk one root, serially or over the worker pool, tallying its per-root totals"""
+        start = time.perf_counter()
+        stats = {'folders': 0, 'size_mb': 0}
+        try:
+            walk = self._walk_parallel if self.workers > 1 else self._walk_serial
+            for folder_info in walk(root_path, progress_callback):
+                stats['folders'] += 1
+                stats['size_mb'] += folder_info['size_mb']
+                yield folder_info
+        finally:
+            seconds = time.perf_counter() - start
+            self.telemetry.record(timings={'root': seconds}, label=root_path)
+            with self.totals_lock:
+                self.root_stats.setdefault(root_path, {}).update(stats, seconds=seconds)
+
+    def _walk_devices(self, progress_callback=None):
+        """Walk several roots at once, one root at a time per device.
+
+        Roots are grouped by st_dev: each device gets a thread that walks its
+        roots one after another, so two roots on the same disk do not compete
+        for its heads while separate drives and shares run in parallel.
+        Records come back through a queue and progress is sampled here, on
+        the calling thread.
+        """
+        devices = {}
+        for root in self.roots:
+            try:
+                device = os.stat(root).st_dev
+            except OSError as e:
+                self.telemetry.error(f"Error reading {root}: {str(e)}")
+                device = None
+            devices.setdefault(device if device is not None else root, []).append(root)
+            self.root_stats[root] = {'device': device}
 
-            # Get shell folder and file info
-            flags = self.shellcon.SHGFI_ICON | self.shellcon.SHGFI_LARGEICON | self.shellcon.SHGFI_USEFILEATTRIBUTES
-            file_info = self.shell.SHGetFileInfo(file_path, 0, flags)
-            
-            if not file_info or not file_info[0] or not file_info[0].hIcon:
-                return None
+        events = Queue()
+        stop = threading.Event()
 
-            # Extract icon
-            hicon = file_info[0].hIcon
-            
-            # Create a device context and bitmap
-            dc = self.win32ui.CreateDCFromHandle(self.win32gui.GetDC(0))
-            memdc = dc.CreateCompatibleDC()
-            bitmap = self.win32ui.CreateBitmap()
-            bitmap.CreateCompatibleBitmap(dc, self.thumbnail_size, self.thumbnail_size)
-            memdc.SelectObject(bitmap)
-            
-            # Draw icon on bitmap
-            memdc.FillSolidRect((0, 0, self.thumbnail_size, self.thumbnail_size), 0xFFFFFF)
-            self.win32gui.DrawIconEx(
-                memdc.GetHandleOutput(), 
-                0, 0, hicon, 
-                self.thumbnail_size, self.thumbnail_size, 
-                0, None, 0x0003
-            )
-            
-            # Convert to PIL Image
-            bmpstr = bitmap.GetBitmapBits(True)
-            img = Image.frombuffer(
-                'RGBA',
-                (self.thumbnail_size, self.thumbnail_size),
-                bmpstr, 'raw', 'BGRA', 0, 1
-            )
-            
-            # Clean up
-            self.win32gui.DestroyIcon(hicon)
-            bitmap.DeleteObject()
-            memdc.DeleteDC()
-            dc.DeleteDC()
-            
-            return img
+        def device_worker(roots):
+            try:
+                for root in roots:
+                    for folder_info in self._walk_root(root):
+                        events.put(('folder', folder_info))
+                        if stop.is_set():
+                            return
+            except Exception as e:
+                self.telemetry.error(f"Error scanning {', '.join(roots)}: {str(e)}")
+            finally:
+                events.put(('done', None))
 
-        except Exception as e:
-            print(f"Error getting Windows thumbnail for {file_path}: {str(e)}")
-            return None
+        threads = [threading.Thread(target=device_worker, args=(roots,), daemon=True)
+                   for roots in devices.values()]
+        for thread in threads:
+            thread.start()
 
-    def get_embedded_thumbnail(self, file_path):
-        """Try to extract embedded JPEG thumbnail from RAW file"""
+        progress = self.progress
+        running = len(threads)
         try:
-            if not self.has_rawpy:
-                return None
-
-            with self.rawpy.imread(file_path) as raw:
+            while running:
                 try:
-                    thumb = raw.extract_thumb()
-                    if thumb.format == self.rawpy.ThumbFormat.JPEG:
-                        from io import BytesIO
-                        img = Image.open(BytesIO(thumb.data))
-                        img.thumbnail((self.thumbnail_size, self.thumbnail_size))
-                        return img.copy()
-                except:
-                    return None
-        except Exception as e:
-            print(f"Error extracting thumbnail from {file_path}: {str(e)}")
-        return None
+                    kind, payload = events.get(timeout=progress.interval)
+                except Empty:
+                    kind = payload = None
+                if kind == 'done':
+                    running -= 1
+                elif kind == 'folder':
+                    yield payload
+                if progress_callback and progress.due():
+                    progress_callback(progress.snapshot())
+        finally:
+            stop.set()
+
+    def _walk_serial(self, root_path, progress_callback=None):
+        """Depth-first walk of one root on the calling thread"""
+        media_suffixes = self._media_suffixes()
+        progress = self.progress
+        root = self._open_directory(root_path, '', None, None, media_suffixes)
+        stack = [root]
+
+        while stack:
+            frame = stack[-1]
+            if frame['subdirs']:
+                entry = frame['subdirs'].pop()
+                stack.append(self._open_directory(entry.path, entry.name, entry, frame, media_suffixes))
+                if progress_callback and progress.due():
+                    progress_callback(progress.snapshot())
+                continue
+
+            stack.pop()
+            self._resolve_directory(frame)
+            folder_info = self._close_directory(frame)
+            if folder_info:
+                yield folder_info
+
+    def _walk_parallel(self, root_path, progress_callback=None):
+        """Parallel variant of walk_camera_folders over a work-stealing pool.
+
+        Each worker owns a deque of pending directories: it pushes the
+        subdirectories it discovers onto its own deque and pops from the same
+        end (depth-first, good locality), and when that runs dry it steals the
+        oldest entry from another worker's deque. Listing and stat calls run
+        outside the lock so round-trips to network storage overlap; only the
+        cheap bottom-up merge of a finished directory into its parent is
+        serialized. Records are handed back to the calling thread through a
+        queue and progress is sampled there, so callbacks run where they did
+        before.
+        """
+        media_suffixes = self._media_suffixes()
+        progress = self.progress
+        root = self._open_directory(root_path, '', None, None, media_suffixes)
+        if not root['subdirs']:
+            return
 
-    def get_pil_thumbnail(self, file_path):
-        """Create thumbnail from file using PIL as last resort"""
-        try:
-            with Image.open(file_path) as img:
-                img.thumbnail((self.thumbnail_size, self.thumbnail_size))
-                return img.copy()
-        except Exception as e:
-            print(f"Error creating PIL thumbnail for {file_path}: {str(e)}")
+        deques = [collections.deque() for _ in range(self.workers)]
+        cond = threading.Condition()
+        events = Queue()
+        state = {'finished': False}
+
+        for i, entry in enumerate(root['subdirs']):
+            deques[i % self.workers].append((entry, root))
+        root['pending'] = len(root['subdirs'])
+        root['subdirs'] = []
+
+        def take(index):
+            own = deques[index]
+            if own:
+                return own.pop()
+            for offset in range(1, self.workers):
+                victim = deques[(index + offset) % self.workers]
+                if victim:
+                    return victim.popleft()
             return None
 
-    def update_thumbnail(self, file_path, img):
-        """Update thumbnail in the UI from background thread"""
-        if file_path not in self.pending_thumbnails:
-            return
-        
-        label = self.pending_thumbnails[file_path]
-        if not label.winfo_exists():
-            return
-            
-        try:
-            photo = ImageTk.PhotoImage(img)
-            self.photo_references[file_path] = photo
-            label.configure(image=photo)
-        except Exception as e:
-            print(f"Error updating thumbnail for {file_path}: {str(e)}")
+        def complete(frame):
+            # Called with cond held: fold finished directories upwards.
+            # Resolving may stat deferred files, so it runs unlocked; the
+            # frame is no longer shared once all of its children are done.
+            while True:
+                if frame['totals'] is not None:
+                    cond.release()
+                    try:
+                        self._resolve_directory(frame)
+                    finally:
+                        cond.acquire()
+                folder_info = self._close_directory(frame)
+                if folder_info:
+                    events.put(('folder', folder_info))
+                parent = frame['parent']
+                parent['pending'] -= 1
+                if parent['pending']:
+                    return
+                if parent is root:
+                    state['finished'] = True
+                    cond.notify_all()
+                    events.put(('done', None))
+                    return
+                frame = parent
+
+        def worker(index):
+            while True:
+                with cond:
+                    task = take(index)
+                    while task is None:
+                        if state['finished']:
+                            return
+                        cond.wait()
+                        task = take(index)
+
+                entry, parent = task
+                try:
+                    frame = self._open_directory(entry.path, entry.name, entry, parent, media_suffixes)
+                except Exception as e:
+                    self.telemetry.error(f"Error processing directory {entry.name}: {str(e)}")
+                    frame = {'path': entry.path, 'name': entry.name, 'entry': entry, 'parent': parent,
+                             'root': parent['root'], 'depth': parent['depth'] + 1, 'is_camera': False, 'camera_rule': None, 'mtime': None,
+                             'totals': None, 'subdirs': []}
+
+                subdirs = frame['subdirs']
+                frame['subdirs'] = []
+                frame['pending'] = len(subdirs)
+                with cond:
+                    if subdirs:
+                        deques[index].extend((child, frame) for child in subdirs)
+                        cond.notify(len(subdirs))
+                    else:
+                        complete(frame)
+
+        threads = [threading.Thread(target=worker, args=(i,), daemon=True)
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
 
-    def load_thumbnail_async(self, file_path, label):
-        """Load thumbnail in background thread"""
-        ext = os.path.splitext(file_path.lower())[1]
-        img = None
-        
-        # Try Windows thumbnail first for all files
-        img = self.get_windows_thumbnail(file_path)
-        
-        if not img:
-            # If Windows failed and it's a RAW file, try embedded JPEG
-            if ext in self.file_types['raw']:
-                img = self.get_embedded_thumbnail(file_path)
-            # For regular images, try PIL as last resort
-            elif ext in self.file_types['image']:
-                img = self.get_pil_thumbnail(file_path)
-                
-        if img:
-            # Schedule update in main thread
-            self.after(0, lambda: self.update_thumbnail(file_path, img))
-
-    def add_thumbnail(self, file_path, row, col):
-        """Add a thumbnail or filename to the grid"""
         try:
-            thumb_frame = ttk.Frame(self.scrollable_frame)
-            thumb_frame.grid(row=row, column=col, padx=5, pady=5)
-            
-            # Get file extension and type
-            ext = os.path.splitext(file_path.lower())[1]
-            
-            # Create placeholder with icon
-            if ext in self.file_types['raw']:
-                icon = self.file_icons['raw']
-            elif ext in self.file_types['image']:
-                icon = self.file_icons['image']
-            elif ext in self.file_types['video']:
-                icon = self.file_icons['video']
-            else:
-                icon = self.file_icons['unknown']
-            
-            # Create label that will be updated with thumbnail
-            label = ttk.Label(thumb_frame, text=icon, font=('Arial', 24))
-            label.pack(pady=5)
-            
-            # Start background loading if it's an image or raw file
-            if ext in self.file_types['image'] or ext in self.file_types['raw']:
-                self.pending_thumbnails[file_path] = label
-                self.executor.submit(self.load_thumbnail_async, file_path, label)
-            
-            # Show filename and extension
-            filename = os.path.basename(file_path)
-            name_label = ttk.Label(thumb_frame, 
-                                 text=f"{filename}\n{ext.upper()}",
-                                 wraplength=self.thumbnail_size)
-            name_label.pack()
-            
-        except Exception as e:
-            print(f"Error creating thumbnail for {file_path}: {str(e)}")
-            
-    def clear(self):
-        """Clear all thumbnails"""
-        self.pending_thumbnails.clear()
-        self.photo_references.clear()
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-        self.thumbnails.clear()
-
-    def destroy(self):
-        """Clean up resources when widget is destroyed"""
-        self.executor.shutdown(wait=False)
-        super().destroy()
-
-# class ThumbnailGrid(ttk.Frame):
-#     def __init__(self, parent, **kwargs):
-#         super().__init__(parent, **kwargs)
-#         self.thumbnail_size = 200
-#         self.padding = 10
-#         self.thumbnails = []
-#         self.thumbnail_folders = ['thumbs', '.thumbs', 'Thumbs', '.Thumbnails']
-        
-#         # Define file type icons
-#         self.file_icons = {
-#             'image': '📷',
-#             'video': '🎥',
-#             'raw': '📸',
-#             'unknown': '📄'
-#         }
-        
-#         # Define file extensions for each type
-#         self.file_types = {
-#             'image': {'.jpg', '.jpeg', '.png', '.gif', '.bmp'},
-#             'video': {'.mp4', '.mov', '.avi', '.mts', '.m2ts'},
-#             'raw': {'.cr2', '.cr3', '.nef', '.arw', '.raw', '.dng'}
-#         }
-        
-#         self.create_widgets()
-        
-#     def create_widgets(self):
-#         """Create and setup the UI elements"""
-#         # Create canvas with scrollbar
-#         self.canvas = Canvas(self, bg='white')
-#         self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
-#         self.scrollable_frame = ttk.Frame(self.canvas)
-
-#         # Configure canvas
-#         self.scrollable_frame.bind(
-#             "<Configure>",
-#             lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-#         )
-        
-#         # Create scrollable window
-#         self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-#         self.canvas.configure(yscrollcommand=self.scrollbar.set)
-
-#         # Pack scrollbar and canvas
-#         self.scrollbar.pack(side="right", fill="y")
-#         self.canvas.pack(side="left", fill="both", expand=True)
-
-#         # Bind mousewheel
-#         self.bind_mousewheel()
-        
-#     def bind_mousewheel(self):
-#         """Bind mousewheel to scrolling"""
-#         def _on_mousewheel(event):
-#             self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-            
-#         self.canvas.bind_all("<MouseWheel>", _on_mousewheel)
-        
-#     def clear(self):
-#         """Clear all thumbnails"""
-#         for widget in self.scrollable_frame.winfo_children():
-#             widget.destroy()
-#         self.thumbnails.clear()
-
-#     def find_thumbnail(self, image_path):
-#         """Try to find an existing thumbnail for the image"""
-#         # Check parent directory for thumbnail folders
-#         parent_dir = os.path.dirname(image_path)
-#         filename = os.path.basename(image_path)
-        
-#         # Look for thumbnails in common thumbnail directories
-#         for thumb_dir in self.thumbnail_folders:
-#             thumb_path = os.path.join(parent_dir, thumb_dir, filename)
-#             if os.path.exists(thumb_path):
-#                 return thumb_path
-                
-#         return None
-
-#     def get_file_type(self, filename):
-#         """Determine file type based on extension"""
-#         ext = os.path.splitext(filename.lower())[1]
-#         for ftype, extensions in self.file_types.items():
-#             if ext in extensions:
-#                 return ftype
-#         return 'unknown'
-
-#     def add_thumbnail(self, file_path, row, col):
-#         """Add a thumbnail or filename to the grid"""
-#         try:
-#             thumb_frame = ttk.Frame(self.scrollable_frame)
-#             thumb_frame.grid(row=row, column=col, padx=5, pady=5)
-            
-#             # Get file type and corresponding icon
-#             file_type = self.get_file_type(file_path)
-#             icon = self.file_icons.get(file_type, self.file_icons['unknown'])
-            
-#             # Create placeholder with icon
-#             placeholder = ttk.Frame(thumb_frame, width=self.thumbnail_size, height=100)
-#             placeholder.pack()
-#             placeholder.pack_propagate(False)
-            
-#             icon_label = ttk.Label(placeholder, text=icon, font=('Arial', 24))
-#             icon_label.pack(pady=10)
-            
-#             # Show filename and extension
-#             filename = os.path.basename(file_path)
-#             ext = os.path.splitext(filename)[1].upper()
-#             name_label = ttk.Label(thumb_frame, 
-#                                  text=f"{filename}\n{ext}",
-#                                  wraplength=self.thumbnail_size)
-#             name_label.pack()
-            
-#         except Exception as e:
-#             print(f"Error creating thumbnail for {file_path}: {str(e)}")
-
-class MediaManager:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Media Manager")
-        self.root.geometry("1400x900")
-        
-        self.current_folder_index = 0
-        self.file_list = []
-        self.status_var = tk.StringVar()
-        self.progress_var = tk.DoubleVar()
-        self.scanning = False
-        
-        self.setup_ui()
-
-    def setup_ui(self):
-        # Main container
-        self.main_frame = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
-        self.main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-
-        # Left panel for folder list
-        self.folder_list_frame = ttk.Frame(self.main_frame)
-        self.main_frame.add(self.folder_list_frame, weight=1)
-
-        # Center panel container
-        self.center_container = ttk.Frame(self.main_frame)
-        self.main_frame.add(self.center_container, weight=3)
-
-        # Right panel for JSON data
-        self.right_panel = ttk.Frame(self.main_frame)
-        self.main_frame.add(self.right_panel, weight=1)
-
-        # Setup folder list (left panel)
-        # Add total size label at the top of folder list
-        self.total_size_var = tk.StringVar(value="Total Size: 0 GB")
-        total_size_label = ttk.Label(self.folder_list_frame, 
-                                   textvariable=self.total_size_var,
-                                   font=('Arial', 10))
-        total_size_label.pack(pady=(0, 5), padx=5, anchor='w')
-
-        folder_list_label = ttk.Label(self.folder_list_frame, text="Folders", font=('Arial', 11, 'bold'))
-        folder_list_label.pack(pady=5, padx=5, anchor='w')
-
-        self.folder_list = ttk.Treeview(self.folder_list_frame, selectmode='browse', show='tree')
-        folder_list_scroll = ttk.Scrollbar(self.folder_list_frame, orient="vertical", command=self.folder_list.yview)
-        self.folder_list.configure(yscrollcommand=folder_list_scroll.set)
-
-        folder_list_scroll.pack(side=tk.RIGHT, fill=tk.Y)
-        self.folder_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
-        self.folder_list.bind('<<TreeviewSelect>>', self.on_folder_select)
-
-        # Setup JSON display (right panel)
-        json_label = ttk.Label(self.right_panel, text="Folder Data:", font=('Arial', 11, 'bold'))
-        json_label.pack(pady=5, padx=5, anchor='w')
-        
-        json_frame = ttk.Frame(self.right_panel)
-        json_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        
-        self.json_text = tk.Text(json_frame, wrap=tk.WORD, width=40)
-        json_scrollbar = ttk.Scrollbar(json_frame, command=self.json_text.yview)
-        self.json_text.configure(yscrollcommand=json_scrollbar.set)
-        
-        json_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.json_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-        # Create both frames in center container
-        self.setup_scan_frame()
-        self.setup_viewer_frame()
-        
-        # Initially show scan frame
-        self.show_scan_frame()
+            while True:
+                try:
+                    kind, payload = events.get(timeout=progress.interval)
+                except Empty:
+                    kind = payload = None
+                if kind == 'done':
+                    break
+                if kind == 'folder':
+                    yield payload
+                if progress_callback and progress.due():
+                    progress_callback(progress.snapshot())
+        finally:
+            with cond:
+                state['finished'] = True
+                cond.notify_all()
+
+    def _media_suffixes(self) -> tuple:
+        return tuple(self.media_extensions['photos'] | self.media_extensions['videos'])
+
+    def _resolve_directory(self, frame: Dict) -> None:
+        """Settle a directory whose subtree has been fully listed.
+
+        Computes its tree signature (name, mtime and entry count of every
+        directory below it). For a camera folder whose signature matches the
+        previous scan the old totals are reused and the deferred file stats
+        are skipped; otherwise the deferred files are stat'ed now.
+        """
+        if frame['totals'] is None:
+            return
 
-    def setup_scan_frame(self):
-        """Create the scan frame"""
-        self.scan_frame = ttk.Frame(self.center_container)
-        
-        scan_label = ttk.Label(self.scan_frame, 
-                             text="Select a folder to scan or load existing scan",
-                             font=('Arial', 12))
-        scan_label.pack(pady=20)
-        
-        button_frame = ttk.Frame(self.scan_frame)
-        button_frame.pack(pady=10)
-        
-        ttk.Button(button_frame, text="New Scan", 
-                  command=self.select_folder).pack(side=tk.LEFT, padx=5)
-        ttk.Button(button_frame, text="Load Existing Scan", 
-                  command=self.load_existing_scan).pack(side=tk.LEFT, padx=5)
-        
-        self.progress_bar = ttk.Progressbar(self.scan_frame, 
-                                          variable=self.progress_var,
-                                          mode='determinate')
-        self.progress_bar.pack(fill=tk.X, padx=50, pady=10)
-
-    def setup_viewer_frame(self):
-        """Create the viewer frame"""
-        self.viewer_frame = ttk.Frame(self.center_container)
-        
-        nav_frame = ttk.Frame(self.viewer_frame)
-        nav_frame.pack(fill=tk.X, pady=(0, 10))
+        signature = hashlib.blake2b(digest_size=16)
+        own = f"{frame['name']}\0{frame['mtime_ns']}\0{frame['entries']}"
+        signature.update(own.encode('utf-8', 'surrogateescape'))
+        for child_signature in sorted(frame['child_signatures']):
+            signature.update(child_signature)
+        frame['signature'] = signature.digest()
 
-        ttk.Button(nav_frame, text="Previous Folder", command=self.prev_folder).pack(side=tk.LEFT)
-        ttk.Button(nav_frame, text="Next Folder", command=self.next_folder).pack(side=tk.LEFT, padx=5)
-        ttk.Button(nav_frame, text="New Scan", command=self.new_scan).pack(side=tk.LEFT, padx=5)
-        
-        info_frame = ttk.Frame(self.viewer_frame)
-        info_frame.pack(fill=tk.X, pady=(0, 10))
-        
-        self.folder_info = ttk.Label(info_frame, text="", wraplength=1300)
-        self.folder_info.pack(fill=tk.X)
+        if not frame['is_camera']:
+            return
 
-        self.thumbnail_grid = ThumbnailGrid(self.viewer_frame)
-        self.thumbnail_grid.pack(fill=tk.BOTH, expand=True)
-        
-        control_frame = ttk.Frame(self.viewer_frame)
-        control_frame.pack(fill=tk.X, pady=(10, 0))
-        
-        ttk.Button(control_frame, text="Mark for Deletion", 
-                  command=self.mark_deletion).pack(side=tk.LEFT)
-        ttk.Button(control_frame, text="Mark as Keep", 
-                  command=self.mark_keep).pack(side=tk.LEFT, padx=5)
-        ttk.Button(control_frame, text="Open Folder", 
-                  command=self.open_folder).pack(side=tk.LEFT, padx=5)
-        
-        self.status_label = ttk.Label(control_frame, textvariable=self.status_var)
-        self.status_label.pack(side=tk.RIGHT)
-
-    def show_scan_frame(self):
-        """Switch to scan frame"""
-        self.viewer_frame.pack_forget()
-        self.scan_frame.pack(fill=tk.BOTH, expand=True)
-        self.progress_var.set(0)
-        
-    def show_viewer_frame(self):
-        """Switch to viewer frame"""
-        self.scan_frame.pack_forget()
-        self.viewer_frame.pack(fill=tk.BOTH, expand=True)
-
-    def scanning_complete(self):
-        self.scanning = False
-        if self.data and self.data.get('folders'):
-            self.show_viewer_frame()
-            self.load_current_folder()
-        else:
-            messagebox.showwarning("No Results", 
-                                 "No camera media folders found in the selected directory.")
+        previous = None
+        if self.previous_folders is not None:
+            previous = self.previous_folders.get(self._record_path(frame['path']))
+        frame['previous'] = previous
+
+        if (previous and 'size_bytes' in previous
+                and (not self.disk_usage or self._reusable_disk_usage(previous))
+                and previous.get('tree_signature') == frame['signature'].hex()):
+            frame['totals'] = self._totals_from_record(previous)
+            self.telemetry.record(counters={'stats_skipped': len(frame['deferred'])})
+            frame['deferred'] = []
+            frame['reused'] = True
+            return
 
-    def new_scan(self):
-        self.show_scan_frame()
-        
-    def load_existing_scan(self):
-        """Load a previously saved JSON scan file"""
-        json_file = filedialog.askopenfilename(
-            title="Select Scan File",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
-        )
-        
-        if json_file:
+        if frame['deferred']:
+            media_suffixes = self._media_suffixes()
+            stat_bytes = 0
+            start = time.perf_counter()
+            for child in frame['deferred']:
+                try:
+                    st = child.stat()
+                    size = st.st_size
+                    self._count_file(frame['totals'], child.name.lower(), size, media_suffixes)
+                    if self.disk_usage:
+                        self._count_allocation(frame['totals'], st)
+                    stat_bytes += size
+                except OSError as e:
+                    self.telemetry.error(f"Error reading {child.path}: {str(e)}")
+            self.telemetry.record(counters={'stat_calls': len(frame['deferred']), 'bytes_stat': stat_bytes},
+                                  timings={'stat': time.perf_counter() - start}, label=frame['path'])
+            frame['deferred'] = []
+            self.progress.add_bytes(stat_bytes)
+
+    @staticmethod
+    def _reusable_disk_usage(previous: Dict) -> bool:
+        # Hardlinks shared with other folders have to be seen again to be
+        # matched up, so only self-contained folders are reused
+        disk_usage = previous.get('disk_usage')
+        return disk_usage is not None and disk_usage['shared_files'] == 0
+
+    def _close_directory(self, frame: Dict):
+        """Fold a fully scanned directory into its parent; return its record if it is a camera folder."""
+        parent = frame['parent']
+        totals = frame['totals']
+        folder_info = None
+
+        if frame['is_camera'] and totals['has_media']:
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    self.data = json.load(f)
-                
-                self.data['json_path'] = json_file
-                self.show_viewer_frame()
-                self.load_current_folder()
-                
+                folder_info = self._folder_record(frame, totals)
             except Exception as e:
-                messagebox.showerror("Error", f"Could not load scan file: {str(e)}")
+                self.telemetry.error(f"Error processing directory {frame['name']}: {str(e)}")
+
+        if folder_info and self.previous_folders is not None:
+            with self.totals_lock:
+                if frame['reused']:
+                    self.reused_folders += 1
+                else:
+                    self.rescanned_folders += 1
+
+        if parent is not None and parent['totals'] is not None and totals is not None:
+            self._merge_totals(parent['totals'], totals)
+            parent['child_signatures'].append(frame['signature'])
+            if frame['deferred']:
+                parent['deferred'].extend(frame['deferred'])
+        elif folder_info and self.disk_usage:
+            # Outermost camera folder: its subtree goes into the scan-wide
+            # totals, so nested folders and hardlinks are counted once
+            with self.totals_lock:
+                self._merge_totals(self.disk_totals, totals)
+
+        return folder_info
+
+    def _open_directory(self, path, name, entry, parent, media_suffixes):
+        """List one directory, classify it and tally its files if it sits inside a camera folder."""
+        depth = parent['depth'] + 1 if parent is not None else 0
+        entries = 0
+        subdirs = []
+        file_entries = []
+        start = time.perf_counter()
 
-    def update_folder_list(self):
-        """Update the folder list with current data"""
-        self.folder_list.delete(*self.folder_list.get_children())
-        
-        if hasattr(self, 'data') and self.data.get('folders'):
-            # Calculate total size
-            total_size_mb = sum(folder['size_mb'] for folder in self.data['folders'])
-            total_size_gb = total_size_mb / 1024
-            self.total_size_var.set(f"Total Size: {total_size_gb:.2f} GB")
-
-            for idx, folder in enumerate(self.data['folders']):
-                # Create folder display text
-                folder_text = f"{folder['name']} ({folder['size_mb']:.1f}MB)"
-                if folder.get('marked_for_deletion'):
-                    folder_text += " [DELETE]"
-                
-                # Insert into treeview with tag for styling
-                tag = 'marked' if folder.get('marked_for_deletion') else ''
-                self.folder_list.insert('', 'end', text=folder_text, 
-                                    values=(idx,), tags=(tag,))
-
-            # Configure tag colors
-            self.folder_list.tag_configure('marked', foreground='red')
-
-            # Select current folder
-            items = self.folder_list.get_children()
-            if items:
-                self.folder_list.selection_set(items[self.current_folder_index])
-                self.folder_list.see(items[self.current_folder_index])
-
-    def on_folder_select(self, event):
-        """Handle folder selection from the list"""
-        selection = self.folder_list.selection()
-        if selection:
-            item = selection[0]
-            idx = int(self.folder_list.item(item)['values'][0])
-            if idx != self.current_folder_index:
-                self.current_folder_index = idx
-                self.load_current_folder()
-            
-    def load_existing_scan(self):
-        """Load a previously saved JSON scan file"""
-        json_file = filedialog.askopenfilename(
-            title="Select Scan File",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
-        )
-        
-        if json_file:
+        try:
+            with os.scandir(path) as it:
+                for child in it:
+                    entries += 1
+                    try:
+                        if child.is_dir(follow_symlinks=False):
+                            subdirs.append(child)
+                        else:
+                            file_entries.append(child)
+                    except OSError as e:
+                        self.telemetry.error(f"Error reading {child.path}: {str(e)}")
+        except OSError as e:
+            self.telemetry.error(f"Error listing directory {path}: {str(e)}")
+        listed = time.perf_counter()
+
+        # Classified after listing so structural rules can look at subfolders
+        camera_rule = None
+        if parent is not None:
+            camera_rule = self.camera_rules.classify(
+                name, parent['name'] or os.path.basename(parent['path']),
+                (child.name for child in subdirs))
+        is_camera = camera_rule is not None
+        collect = is_camera or (parent is not None and parent['totals'] is not None)
+        totals = self._empty_totals() if collect else None
+        # On an incremental rescan file stats wait until the enclosing camera
+        # folder's tree signature shows whether they are needed at all. The
+        # duplicate finder needs every media file's size, so it disables that.
+        defer = collect and self.previous_folders is not None and not self.find_duplicates
+        deferred = []
+        duplicate_candidates = [] if collect and self.find_duplicates else None
+        mtime = None
+        mtime_ns = None
+        stat_bytes = 0
+        stat_calls = 0
+
+        if collect:
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    self.data = json.load(f)
-                
-                # Store the JSON file path for future saves
-                self.data['json_path'] = json_file
-                
-                # Switch to viewer mode
-                self.scan_frame.pack_forget()
-                self.viewer_frame.pack(fill=tk.BOTH, expand=True)
-                self.load_current_folder()
-                
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not load scan file: {str(e)}")
-                
-    def select_folder(self):
-        folder_path = filedialog.askdirectory(title="Select Folder to Scan")
-        if folder_path:
-            self.progress_var.set(0)
-            self.scanning = True
-            
-            # Create output filename from folder name
-            folder_name = os.path.basename(folder_path)
-            output_file = f"{folder_name}_scan_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            
-            # Start scanning in a separate thread
-            scanner = MediaScanner(folder_path, output_file)
-            
-            def scan_thread():
-                self.data = scanner.scan_and_save(self.update_progress)
-                self.root.after(0, self.scanning_complete)
-            
-            threading.Thread(target=scan_thread, daemon=True).start()
-
-    def update_progress(self, value):
-        self.progress_var.set(value)
-        self.root.update_idletasks()
-
-    def scanning_complete(self):
-        self.scanning = False
-        if self.data and self.data.get('folders'):
-            self.scan_frame.pack_forget()
-            self.viewer_frame.pack(fill=tk.BOTH, expand=True)
-            self.load_current_folder()
+                stat_calls += 1
+                st = entry.stat()
+                mtime = st.st_mtime
+                mtime_ns = st.st_mtime_ns
+            except OSError as e:
+                self.telemetry.error(f"Error reading {path}: {str(e)}")
+
+            if defer:
+                deferred = file_entries
+            else:
+                stat_calls += len(file_entries)
+                for child in file_entries:
+                    try:
+                        file_name = child.name.lower()
+                        st = child.stat()
+                        size = st.st_size
+                        self._count_file(totals, file_name, size, media_suffixes)
+                        if self.disk_usage:
+                            self._count_allocation(totals, st)
+                        stat_bytes += size
+                        if duplicate_candidates is not None and size and file_name.endswith(media_suffixes):
+                            # Windows scandir reports st_nlink as 0, so every file stands alone there
+                            inode = (st.st_dev, st.st_ino) if st.st_nlink > 1 else None
+                            duplicate_candidates.append((size, child.path, inode))
+                    except OSError as e:
+                        self.telemetry.error(f"Error reading {child.path}: {str(e)}")
+        files = len(file_entries)
+        timings = {'list': listed - start}
+        if stat_calls:
+            timings['stat'] = time.perf_counter() - listed
+        self.telemetry.record(
+            counters={'dirs_listed': 1, 'entries': entries, 'stat_calls': stat_calls, 'bytes_stat': stat_bytes},
+            timings=timings, label=path)
+
+        self.progress.directory_listed(depth, len(subdirs), files, stat_bytes)
+        if duplicate_candidates:
+            with self.duplicate_lock:
+                for size, file_path, inode in duplicate_candidates:
+                    self.duplicate_candidates.setdefault(size, []).append((file_path, inode))
+
+        return {
+            'path': path,
+            'name': name,
+            'entry': entry,
+            'parent': parent,
+            'root': parent['root'] if parent is not None else path,
+            'depth': depth,
+            'is_camera': is_camera,
+            'camera_rule': camera_rule,
+            'mtime': mtime,
+            'mtime_ns': mtime_ns,
+            'entries': entries,
+            'totals': totals,
+            'deferred': deferred,
+            'child_signatures': [],
+            'signature': None,
+            'previous': None,
+            'reused': False,
+            'subdirs': subdirs,
+        }
+
+    @staticmethod
+    def _empty_totals() -> Dict:
+        # disk_bytes: allocated bytes freed by deleting the subtree (single-link
+        # files and hardlinked files whose links all lie inside it); links:
+        # the other hardlinked files, (st_dev, st_ino) -> [allocated, st_nlink,
+        # links seen]
+        return {'size': 0, 'has_media': False,
+                'photos': 0, 'videos': 0, 'total_files': 0, 'extensions': {},
+                'disk_bytes': 0, 'links': {}}
+
+    @staticmethod
+    def _count_allocation(totals: Dict, st) -> None:
+        """Add a file's allocated blocks from the stat result the scan already has"""
+        # st_blocks is in 512-byte units on every POSIX system; Windows has
+        # no st_blocks and reports st_nlink/st_ino as 0 from scandir
+        blocks = getattr(st, 'st_blocks', None)
+        allocated = st.st_size if blocks is None else blocks * 512
+        if st.st_nlink > 1:
+            MediaScanner._add_link(totals, (st.st_dev, st.st_ino), [allocated, st.st_nlink, 1])
+        else:
+            totals['disk_bytes'] += allocated
+
+    @staticmethod
+    def _add_link(totals: Dict, key, link: List) -> None:
+        links = totals['links']
+        known = links.get(key)
+        if known is None:
+            known = links[key] = list(link)
         else:
-            messagebox.showwarning("No Results", 
-                                 "No camera media folders found in the selected directory.")
+            known[2] += link[2]
+        if known[2] >= known[1]:
+            # Every link is inside this subtree: the blocks come back on delete
+            del links[key]
+            totals['disk_bytes'] += known[0]
+
+    @staticmethod
+    def _allocated_bytes(totals: Dict) -> int:
+        return totals['disk_bytes'] + sum(link[0] for link in totals['links'].values())
+
+    def _count_file(self, totals: Dict, name: str, size: int, media_suffixes: tuple) -> None:
+        ext = os.path.splitext(name)[1]
+        totals['size'] += size
+        totals['total_files'] += 1
+        totals['extensions'][ext] = totals['extensions'].get(ext, 0) + 1
+        if ext in self.media_extensions['photos']:
+            totals['photos'] += 1
+        elif ext in self.media_extensions['videos']:
+            totals['videos'] += 1
+        if not totals['has_media'] and name.endswith(media_suffixes):
+            totals['has_media'] = True
+
+    @staticmethod
+    def _merge_totals(target: Dict, source: Dict) -> None:
+        target['size'] += source['size']
+        target['has_media'] = target['has_media'] or source['has_media']
+        target['photos'] += source['photos']
+        target['videos'] += source['videos']
+        target['total_files'] += source['total_files']
+        extensions = target['extensions']
+        for ext, count in source['extensions'].items():
+            extensions[ext] = extensions.get(ext, 0) + count
+        target['disk_bytes'] += source['disk_bytes']
+        for key, link in source['links'].items():
+            MediaScanner._add_link(target, key, link)
+
+    @staticmethod
+    def _totals_from_record(folder: Dict) -> Dict:
+        media_info = folder['media_info']
+        return {'size': folder['size_bytes'], 'has_media': True,
+                'photos': media_info['photos'], 'videos': media_info['videos'],
+                'total_files': media_info['total_files'],
+                'extensions': dict(media_info['extensions']),
+                'disk_bytes': folder.get('disk_usage', {}).get('reclaimable_bytes', 0),
+                'links': {}}
+
+    @staticmethod
+    def _record_path(path: str) -> str:
+        return os.path.normpath(path).replace('\\', '\\\\')
+
+    def _folder_record(self, frame: Dict, totals: Dict) -> Dict:
+        full_path = os.path.normpath(frame['path'])
+        folder_info = {
+            'name': frame['name'],
+            'path': self._record_path(full_path),
+            'relative_path': os.path.relpath(full_path, frame['root']).replace('\\', '\\\\'),
+            'size_mb': round(totals['size'] / (1024 * 1024), 2),
+            'size_bytes': totals['size'],
+            'last_modified': datetime.datetime.fromtimestamp(
+                frame['mtime']
+            ).strftime('%Y-%m-%d %H:%M:%S'),
+            'media_info': {
+                'photos': totals['photos'],
+                'videos': totals['videos'],
+                'total_files': totals['total_files'],
+                'extensions': dict(sorted(totals['extensions'].items())),
+            },
+            'processed': False,
+            'project_name': os.path.basename(os.path.dirname(full_path)),
+            'camera_rule': frame['camera_rule']['name'],
+            'camera_vendor': frame['camera_rule']['vendor'],
+            'tree_signature': frame['signature'].hex(),
+        }
+        if len(self.roots) > 1:
+            folder_info['root'] = self._record_path(frame['root'])
+        if self.disk_usage:
+            folder_info['disk_usage'] = {
+                'allocated_bytes': self._allocated_bytes(totals),
+                'reclaimable_bytes': totals['disk_bytes'],
+                'reclaimable_mb': round(totals['disk_bytes'] / (1024 * 1024), 2),
+                'shared_files': len(totals['links']),
+            }
 
-    def new_scan(self):
-        self.viewer_frame.pack_forget()
-        self.scan_frame.pack(fill=tk.BOTH, expand=True)
-        self.progress_var.set(0)
-        
-    def load_current_folder(self):
-        if not self.data['folders']:
-            messagebox.showerror("Error", "No folders found in scan results")
-            return
+        # Carry over review state from the previous scan; computed blocks
+        # (duplicates, disk_usage) are recomputed or dropped
+        if frame['previous']:
+            for key in self.REVIEW_FIELDS:
+                if key in frame['previous']:
+                    folder_info[key] = frame['previous'][key]
 
-        folder_data = self.data['folders'][self.current_folder_index]
-        folder_path = folder_data['path'].replace('\\\\', '\\')
+        return FolderRecord(folder_info)
 
-        # Update JSON display
-        self.json_text.delete(1.0, tk.END)
-        json_str = json.dumps(folder_data, indent=2)
-        self.json_text.insert(tk.END, json_str)
-        
-        self.folder_info.config(text=f"Folder: {folder_data['name']}\n"
-                                   f"Project: {folder_data['project_name']}\n"
-                                   f"Path: {folder_path}\n"
-                                   f"Size: {folder_data['size_mb']:.2f} MB\n"
-                                   f"Photos: {folder_data['media_info']['photos']}, "
-                                   f"Videos: {folder_data['media_info']['videos']}\n"
-                                   f"Status: {'Marked for deletion' if folder_data.get('marked_for_deletion') else 'Keep'}")
-        
-        self.thumbnail_grid.clear()
-        
-        # Collect all media files
-        self.file_list = []
-        for root, _, files in os.walk(folder_path):
-            for file in files:
-                ext = os.path.splitext(file.lower())[1]
-                if (ext in self.thumbnail_grid.file_types['image'] or
-                    ext in self.thumbnail_grid.file_types['video'] or
-                    ext in self.thumbnail_grid.file_types['raw']):
-                    self.file_list.append(os.path.join(root, file))
-        
-        # Load files in batches
-        self.load_file_batch(0)
-        
-        total_folders = len(self.data['folders'])
-        self.status_var.set(f"Folder {self.current_folder_index + 1} of {total_folders}")
-        self.update_folder_list()
-
-    def load_file_batch(self, start_index, batch_size=20):
-        """Load files in smaller batches"""
-        columns = 4
-        end_index = min(start_index + batch_size, len(self.file_list))
-        
-        for idx in range(start_index, end_index):
-            row = idx // columns
-            col = idx % columns
-            self.thumbnail_grid.add_thumbnail(self.file_list[idx], row, col)
-            
-        # Schedule next batch if there are more files
-        if end_index < len(self.file_list):
-            self.root.after(100, lambda: self.load_file_batch(end_index))
+    def is_camera_folder(self, folder_name: str, parent_name: str = None, subfolders=None) -> bool:
+        return self.camera_rules.classify(folder_name, parent_name, subfolders) is not None
+    
+    def contains_media_files(self, folder_path: str) -> bool:
+        try:
+            all_extensions = self.media_extensions['photos'].union(self.media_extensions['videos'])
+            with self.telemetry.phase('helper.contains_media_files', folder_path):
+                for root, _, files in os.walk(folder_path):
+                    if any(f.lower().endswith(tuple(all_extensions)) for f in files):
+                        return True
+            return False
+        except Exception as e:
+            self.telemetry.error(f"Error checking media files in {folder_path}: {str(e)}")
+            return False
+    
+    def get_folder_size(self, folder_path: str) -> float:
+        try:
+            total_size = 0
+            with self.telemetry.phase('helper.get_folder_size', folder_path):
+                for root, _, files in os.walk(folder_path):
+                    total_size += sum(
+                        os.path.getsize(os.path.join(root, file))
+                        for file in files
+                    )
+            return round(total_size / (1024 * 1024), 2)
+        except Exception as e:
+            self.telemetry.error(f"Error calculating size for {folder_path}: {str(e)}")
+            return 0.0
 
+    def get_media_info(self, folder_path: str) -> Dict:
+        info = {'photos': 0, 'videos': 0, 'total_files': 0, 'extensions': {}}
+        try:
+            with self.telemetry.phase('helper.get_media_info', folder_path):
+                for root, _, files in os.walk(folder_path):
+                    for file in files:
+                        ext = os.path.splitext(file.lower())[1]
+                        if ext in self.media_extensions['photos']:
+                            info['photos'] += 1
+                        elif ext in self.media_extensions['videos']:
+                            info['videos'] += 1
+                        info['total_files'] += 1
+                        info['extensions'][ext] = info['extensions'].get(ext, 0) + 1
+        except Exception as e:
+            self.telemetry.error(f"Error getting media info for {folder_path}: {str(e)}")
+        return info
 
-    def prev_folder(self):
-        if self.current_folder_index > 0:
-            self.current_folder_index -= 1
-            self.load_current_folder()
+SCAN_SUMMARY_KEYS = ('total_size_mb', 'total_folders', 'total_size_gb', 'roots', 'incremental',
+                     'disk_usage', 'duplicates', 'duplicate_groups', 'telemetry')
+
+def is_ndjson_path(path: str) -> bool:
+    return os.path.splitext(path or '')[1].lower() in ('.ndjson', '.jsonl')
+
+COMPACT_SUFFIX = '.mscan'
+# Scan file formats and the extension each is saved with
+SCAN_FORMAT_EXTENSIONS = {'json': 'json', 'ndjson': 'ndjson', 'compact': COMPACT_SUFFIX[1:]}
+
+def is_compact_path(path: str) -> bool:
+    return os.path.splitext(path or '')[1].lower() == COMPACT_SUFFIX
+
+def scan_format(path: str) -> str:
+    """Format a scan file name implies: 'ndjson', 'compact' or 'json'"""
+    if is_ndjson_path(path):
+        return 'ndjson'
+    if is_compact_path(path):
+        return 'compact'
+    return 'json'
+
+def iter_ndjson_records(path: str):
+    """Yield (kind, record) pairs from an NDJSON scan file.
+
+    kind is 'header', 'folder' or 'summary'. Unreadable lines, such as a
+    torn last line from an interrupted scan, are skipped.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                print(f"Skipping unreadable line {line_number} in {path}")
+                continue
+            yield record.pop('record', 'folder'), record
+
+# Marks an unset slot or missing key
+_MISSING = object()
+
+class SlottedRecord(collections.abc.MutableMapping):
+    """Base of the slotted scan records: a dict with a slot per FIELDS key.
+
+    Reads and writes like the dict it was built from, with the same keys,
+    values and key order. FIELDS keys are held in slots as they are; any
+    other key, and a FIELDS key that would break the order (out of FIELDS
+    order, or set after an extra key), goes to the 'extra' dict. So slot
+    keys always come first, in FIELDS order, and the record dumps exactly
+    like the dict. to_dict() gives that dict; json_default does it for
+    json.dump.
+    """
+
+    FIELDS = ()
+    POSITIONS = {}
+    # object_hook turns dicts holding 'path' and this key into records
+    MARKER = None
+    # Keys whose string values repeat across folders
+    INTERNED = ()
+    __slots__ = ('extra',)
+
+    def __init__(self, folder: Dict = None, strings: Dict = None):
+        """folder's keys and values; strings, when given, interns the INTERNED values (one per scan)"""
+        self.extra = None
+        if not folder:
+            return
+        positions = self.POSITIONS
+        position = 0
+        extra = None
+        for key, value in folder.items():
+            index = positions.get(key, -1)
+            if index >= position and extra is None:
+                setattr(self, key, value)
+                position = index + 1
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self.extra = extra
+        if strings is not None:
+            for key in self.INTERNED:
+                value = getattr(self, key, None)
+                if type(value) is str:
+                    setattr(self, key, strings.setdefault(value, value))
+
+    @classmethod
+    def from_values(cls, values) -> 'SlottedRecord':
+        """A record holding values for the leading FIELDS, in order (see CompactScan)"""
+        record = cls.__new__(cls)
+        record.extra = None
+        for key, value in zip(cls.FIELDS, values):
+            setattr(record, key, value)
+        return record
+
+    @classmethod
+    def object_hook(cls, strings: Dict = None):
+        """json object_hook that builds records as they are decoded, sharing strings across them"""
+        strings = {} if strings is None else strings
+        marker = cls.MARKER
+
+        def hook(value):
+            return cls(value, strings) if 'path' in value and marker in value else value
+        return hook
+
+    def get(self, key, default=None):
+        if key in self.POSITIONS:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                return value
+        extra = self.extra
+        if extra is not None and key in extra:
+            return extra[key]
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        extra = self.extra
+        if extra is not None and key in extra:
+            extra[key] = value
+            return
+        index = self.POSITIONS.get(key)
+        if index is not None and (hasattr(self, key) or (
+                extra is None and not any(hasattr(self, later) for later in self.FIELDS[index + 1:]))):
+            setattr(self, key, value)
+            return
+        if extra is None:
+            extra = self.extra = {}
+        extra[key] = value
+
+    def __delitem__(self, key):
+        extra = self.extra
+        if extra is not None and key in extra:
+            del extra[key]
+            if not extra:
+                self.extra = None
+        elif key in self.POSITIONS and hasattr(self, key):
+            delattr(self, key)
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self.POSITIONS and hasattr(self, key):
+            return True
+        extra = self.extra
+        return extra is not None and key in extra
+
+    def __iter__(self):
+        for key in self.FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for key in self.FIELDS if hasattr(self, key)) + len(self.extra or ())
+
+    def to_dict(self) -> Dict:
+        folder = {}
+        for key in self.FIELDS:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                folder[key] = value
+        if self.extra:
+            folder.update(self.extra)
+        return folder
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+class FolderRecord(SlottedRecord):
+    """One camera folder of a scan. media_info stays a plain dict, so it can be changed in place."""
+
+    FIELDS = ('name', 'path', 'relative_path', 'size_mb', 'size_bytes', 'last_modified', 'media_info',
+              'processed', 'project_name', 'camera_rule', 'camera_vendor', 'tree_signature', 'root',
+              'marked_for_deletion')
+    POSITIONS = dict(zip(FIELDS, range(len(FIELDS))))
+    MARKER = 'media_info'
+    INTERNED = frozenset(('project_name', 'camera_rule', 'camera_vendor', 'root'))
+    __slots__ = FIELDS
+
+class FolderSummary(SlottedRecord):
+    """A ScanIndex summary: the SUMMARY_FIELDS of a record plus its offset and length in the scan file"""
+
+    FIELDS = ('name', 'path', 'size_mb', 'last_modified', 'project_name', 'camera_vendor',
+              'photos', 'videos', 'extensions', 'offset', 'length', 'marked_for_deletion')
+    POSITIONS = dict(zip(FIELDS, range(len(FIELDS))))
+    MARKER = 'offset'
+    INTERNED = frozenset(('project_name', 'camera_vendor'))
+    __slots__ = FIELDS
+
+def json_default(value):
+    """default for json.dump(s): writes records as their layout dicts"""
+    if isinstance(value, SlottedRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+@contextlib.contextmanager
+def gc_paused():
+    """Hold off the cyclic GC while building many records that are all kept"""
+    import gc
+
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def summarize_folders(folders: List[Dict]) -> Dict:
+    total_size_mb = sum(folder['size_mb'] for folder in folders)
+    return {
+        'total_size_mb': round(total_size_mb, 2),
+        'total_folders': len(folders),
+        'total_size_gb': round(total_size_mb / 1024, 2),
+    }
+
+def load_scan(path: str) -> Dict:
+    """Load a JSON, NDJSON or compact scan file into the usual results layout, with its marks journal applied"""
+    if is_compact_path(path):
+        with open(path, 'rb') as f:
+            data = CompactScan.loads(f.read())
+        apply_marks(data['folders'], read_marks(path))
+        return data
+    if not is_ndjson_path(path):
+        with open(path, 'r', encoding='utf-8') as f, gc_paused():
+            data = json.load(f, object_hook=FolderRecord.object_hook())
+        apply_marks(data.get('folders', []), read_marks(path))
+        return data
+
+    data = {'folders': []}
+    summary = None
+    folder_duplicates = []
+    strings = {}
+    with gc_paused():
+        for kind, record in iter_ndjson_records(path):
+            if kind == 'folder':
+                data['folders'].append(FolderRecord(record, strings))
+            elif kind == 'header':
+                data.update(record)
+            elif kind == 'summary':
+                summary = record
+            elif kind == 'folder_duplicates':
+                folder_duplicates.append(record)
+    # A scan that never finished has no summary; recompute what it would say
+    data.update(summary or summarize_folders(data['folders']))
+    apply_folder_duplicates(data['folders'], folder_duplicates)
+    apply_marks(data['folders'], read_marks(path))
+    return data
+
+def apply_folder_duplicates(folders: List[Dict], records: List[Dict]) -> None:
+    """Attach NDJSON 'folder_duplicates' records to their folder dicts"""
+    if not records:
+        return
+    by_path = {folder['path']: folder for folder in folders}
+    for record in records:
+        folder = by_path.get(record['path'])
+        if folder is not None:
+            folder['duplicates'] = record['duplicates']
+
+def save_scan(data: Dict, path: str, output_format: str = None, marks_upto: int = None) -> None:
+    """Write scan results as JSON, NDJSON or compact (default: by extension), replacing the file atomically.
+
+    The marks journal is removed afterwards, or only its first marks_upto
+    bytes when data holds just the marks replayed up to there.
+    """
+    output_format = output_format or scan_format(path)
+    tmp_path = path + '.tmp'
+    if output_format == 'compact':
+        with open(tmp_path, 'wb') as f:
+            f.write(CompactScan.dumps(data))
+    elif output_format == 'ndjson':
+        header = {key: value for key, value in data.items()
+                  if key not in SCAN_SUMMARY_KEYS and key not in ('folders', 'json_path')}
+        summary = {key: data[key] for key in SCAN_SUMMARY_KEYS if key in data}
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'record': 'header', **header}, ensure_ascii=False) + '\n')
+            for folder in data.get('folders', []):
+                f.write(json.dumps(folder, ensure_ascii=False, default=json_default) + '\n')
+            f.write(json.dumps({'record': 'summary', **summary}, ensure_ascii=False) + '\n')
+    else:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False, default=json_default)
+    os.replace(tmp_path, path)
+    # The rewritten file holds the replayed marks, so the journal is folded in
+    remove_marks_journal(path, marks_upto)
+
+class CompactScan:
+    """Binary scan file (.mscan) that round-trips the JSON scan layout.
+
+    JSON scans spell out the absolute path of every folder, and again as
+    relative_path, with escaped backslashes and indentation, so archive
+    scans are mostly repeated path prefixes. Here paths are front-coded
+    (length shared with the previous path plus the new suffix), name and
+    relative_path are stored as the length of the path suffix they equal,
+    repeated strings (project, rule, vendor, root, extension sets) are
+    interned, and numbers, timestamps and tree signatures are packed
+    arrays. The file is MAGIC, a version byte and a zlib stream holding a
+    JSON manifest (header, string tables, column layout) followed by the
+    columns. Values a column cannot hold exactly go to the manifest's
+    per-folder 'rest' as overrides or dropped keys, so any folder dict
+    loads back equal. Folders load as FolderRecords.
+    """
+
+    MAGIC = b'MSCAN'
+    VERSION = 1
+    LEVEL = 6
+    # Folder keys held in columns, in the order records are rebuilt
+    FIELDS = ('name', 'path', 'relative_path', 'size_mb', 'size_bytes', 'last_modified', 'media_info',
+              'processed', 'project_name', 'camera_rule', 'camera_vendor', 'tree_signature')
+    INTERNED = ('project_name', 'camera_rule', 'camera_vendor')
+    COLUMNS = (('path_prefix', 'I'), ('path_suffix', 's'), ('name_length', 'I'),
+               ('relative_length', 'I'), ('size_bytes', 'q'), ('last_modified', 'q'),
+               ('photos', 'I'), ('videos', 'I'), ('total_files', 'I'), ('extension_set', 'I'),
+               ('extension_counts', 'I'), ('project_name', 'I'), ('camera_rule', 'I'),
+               ('camera_vendor', 'I'), ('root', 'I'), ('flags', 'B'), ('tree_signature', 's'))
+    PROCESSED = 1
+    MARKED = 2
+    HAS_MARK = 4
+    HAS_ROOT = 8
+    SIGNATURE_BYTES = 16
+
+    @staticmethod
+    def _shared_prefix(a: str, b: str) -> int:
+        """Length of the common prefix of a and b, by bisection on C-speed slice compares"""
+        low, high = 0, min(len(a), len(b))
+        while low < high:
+            middle = (low + high + 1) // 2
+            if a[:middle] == b[:middle]:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    @staticmethod
+    def _stamp(text) -> int:
+        """'2024-05-01 12:30:00' as 20240501123000; -1 if it would not format back the same"""
+        if isinstance(text, str) and len(text) == 19:
+            digits = text[:4] + text[5:7] + text[8:10] + text[11:13] + text[14:16] + text[17:19]
+            if digits.isdigit() and CompactScan._format_stamp(int(digits)) == text:
+                return int(digits)
+        return -1
+
+    @staticmethod
+    def _format_stamp(stamp: int) -> str:
+        text = f"{stamp:014d}"
+        return f"{text[:4]}-{text[4:6]}-{text[6:8]} {text[8:10]}:{text[10:12]}:{text[12:]}"
+
+    @classmethod
+    def dumps(cls, data: Dict) -> bytes:
+        import zlib
+
+        folders = data.get('folders', [])
+        header = {key: value for key, value in data.items() if key not in ('folders', 'json_path')}
+        columns = {name: ([] if code == 's' else array.array(code)) for name, code in cls.COLUMNS}
+        strings = {}
+        extension_sets = {}
+        stamps = {}
+        rest = {}
+        previous = ''
+        for index, folder in enumerate(folders):
+            extra = folder.to_dict() if isinstance(folder, SlottedRecord) else dict(folder)
+            dropped = [key for key in cls.FIELDS if key not in folder]
+
+            path = extra.pop('path', '')
+            if not isinstance(path, str):
+                extra['path'], path = path, ''
+            shared = cls._shared_prefix(previous, path)
+            columns['path_prefix'].append(shared)
+            columns['path_suffix'].append(path[shared:])
+            previous = path
+            for key, column in (('name', 'name_length'), ('relative_path', 'relative_length')):
+                value = extra.pop(key, None)
+                if isinstance(value, str) and value and path.endswith(value):
+                    columns[column].append(len(value))
+                else:
+                    columns[column].append(0)
+                    if key in folder:
+                        extra[key] = value
+
+            size_bytes = extra.pop('size_bytes', 0)
+            if not isinstance(size_bytes, int) or isinstance(size_bytes, bool) or not 0 <= size_bytes < 2 ** 63:
+                extra['size_bytes'], size_bytes = size_bytes, 0
+            columns['size_bytes'].append(size_bytes)
+            if type(extra.get('size_mb')) is float and extra['size_mb'] == round(size_bytes / (1024 * 1024), 2):
+                del extra['size_mb']
+            value = extra.get('last_modified')
+            stamp = -1
+            if isinstance(value, str):
+                if value not in stamps:
+                    stamps[value] = cls._stamp(value)
+                stamp = stamps[value]
+            if stamp >= 0:
+                del extra['last_modified']
+            columns['last_modified'].append(stamp)
+
+            media_info = extra.pop('media_info', None)
+            extensions = media_info.get('extensions') if isinstance(media_info, dict) else None
+            counts = (media_info.get('photos'), media_info.get('videos'),
+                      media_info.get('total_files')) if isinstance(extensions, dict) else ()
+            if (len(counts) == 3 and len(media_info) == 4
+                    and all(type(value) is int and 0 <= value < 2 ** 32
+                            for value in (*counts, *extensions.values()))):
+                for column, value in zip(('photos', 'videos', 'total_files'), counts):
+                    columns[column].append(value)
+                columns['extension_set'].append(
+                    extension_sets.setdefault(tuple(extensions), len(extension_sets)))
+                columns['extension_counts'].extend(extensions.values())
+            else:
+                for column in ('photos', 'videos', 'total_files'):
+                    columns[column].append(0)
+                # Rebuilt as an empty media_info, then overridden or dropped
+                columns['extension_set'].append(extension_sets.setdefault((), len(extension_sets)))
+                if 'media_info' in folder:
+                    extra['media_info'] = media_info
+
+            for key in cls.INTERNED:
+                value = extra.pop(key, None)
+                if value is not None and not isinstance(value, str):
+                    extra[key], value = value, None
+                columns[key].append(strings.setdefault(value, len(strings)))
+            flags = 0
+            root = extra.pop('root', None)
+            if isinstance(root, str):
+                flags |= cls.HAS_ROOT
+                columns['root'].append(strings.setdefault(root, len(strings)))
+            else:
+                columns['root'].append(0)
+                if root is not None or 'root' in folder:
+                    extra['root'] = root
+            processed = extra.pop('processed', False)
+            if processed is True:
+                flags |= cls.PROCESSED
+            elif processed is not False:
+                extra['processed'] = processed
+            if type(extra.get('marked_for_deletion')) is bool:
+                flags |= cls.HAS_MARK | (cls.MARKED if extra.pop('marked_for_deletion') else 0)
+            columns['flags'].append(flags)
+
+            signature = extra.pop('tree_signature', None)
+            raw = None
+            if isinstance(signature, str) and len(signature) == 2 * cls.SIGNATURE_BYTES:
+                try:
+                    raw = bytes.fromhex(signature)
+                except ValueError:
+                    pass
+            if raw is None or raw.hex() != signature:
+                raw = bytes(cls.SIGNATURE_BYTES)
+                if 'tree_signature' in folder:
+                    extra['tree_signature'] = signature
+            columns['tree_signature'].append(raw)
+
+            if extra or dropped:
+                rest[index] = [extra, dropped]
+
+        blobs = []
+        layout = []
+        for name, code in cls.COLUMNS:
+            column = columns[name]
+            if name == 'path_suffix':
+                blob = '\0'.join(column).encode('utf-8')
+            elif code == 's':
+                blob = b''.join(column)
+            else:
+                if sys.byteorder == 'big':
+                    column.byteswap()
+                blob = column.tobytes()
+            layout.append([name, code, len(blob)])
+            blobs.append(blob)
+        manifest = json.dumps({
+            'header': header,
+            'count': len(folders),
+            'strings': list(strings),
+            'extension_sets': [list(names) for names in extension_sets],
+            'rest': {str(index): value for index, value in rest.items()},
+            'columns': layout,
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        payload = b''.join([struct.pack('<I', len(manifest)), manifest, *blobs])
+        return cls.MAGIC + bytes([cls.VERSION]) + zlib.compress(payload, cls.LEVEL)
+
+    @classmethod
+    def loads(cls, blob: bytes) -> Dict:
+        # Most of a plain build's time is the collector rescanning the new records
+        with gc_paused():
+            return cls._loads(blob)
+
+    @classmethod
+    def _loads(cls, blob: bytes) -> Dict:
+        import zlib
+
+        if not blob.startswith(cls.MAGIC):
+            raise ValueError("Not a compact scan file")
+        version = blob[len(cls.MAGIC)]
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported compact scan version {version}")
+        payload = zlib.decompress(blob[len(cls.MAGIC) + 1:])
+        (manifest_length,) = struct.unpack_from('<I', payload)
+        position = 4 + manifest_length
+        manifest = json.loads(payload[4:position].decode('utf-8'))
+
+        columns = {}
+        for name, code, length in manifest['columns']:
+            raw = payload[position:position + length]
+            position += length
+            if code == 's':
+                columns[name] = raw
+            else:
+                column = array.array(code)
+                column.frombytes(raw)
+                if sys.byteorder == 'big':
+                    column.byteswap()
+                columns[name] = column
+
+        count = manifest['count']
+        suffixes = columns['path_suffix'].decode('utf-8').split('\0') if count else []
+        paths = []
+        previous = ''
+        for shared, suffix in zip(columns['path_prefix'], suffixes):
+            previous = previous[:shared] + suffix
+            paths.append(previous)
+        # One string object per distinct value, shared by every folder using it
+        strings = manifest['strings']
+        extension_sets = [tuple(names) for names in manifest['extension_sets']]
+        counts = columns['extension_counts']
+        width = 2 * cls.SIGNATURE_BYTES
+        signatures = columns['tree_signature'].hex()
+        # Folders copied together share timestamps; format each once
+        stamps = {stamp: cls._format_stamp(stamp) for stamp in set(columns['last_modified']) if stamp >= 0}
+
+        # zip stops at the end of names, so each dict takes just its own counts
+        counts = iter(counts)
+        extension_dicts = [dict(zip(extension_sets[set_id], counts)) for set_id in columns['extension_set']]
+
+        # Values in FolderRecord.FIELDS order, which starts with cls.FIELDS
+        folders = [FolderRecord.from_values((
+            path[-name_length:] if name_length else None,
+            path,
+            path[-relative_length:] if relative_length else None,
+            round(size_bytes / (1024 * 1024), 2),
+            size_bytes,
+            stamps.get(stamp),
+            {'photos': photos, 'videos': videos, 'total_files': total_files, 'extensions': extensions},
+            bool(flags & cls.PROCESSED),
+            strings[project],
+            strings[rule],
+            strings[vendor],
+            signatures[index:index + width],
+        )) for index, path, name_length, relative_length, size_bytes, stamp, photos, videos,
+                      total_files, extensions, flags, project, rule, vendor in zip(
+            range(0, len(signatures), width), paths, columns['name_length'], columns['relative_length'],
+            columns['size_bytes'], columns['last_modified'], columns['photos'], columns['videos'],
+            columns['total_files'], extension_dicts, columns['flags'], columns['project_name'],
+            columns['camera_rule'], columns['camera_vendor'])]
+
+        for folder, flags, root in zip(folders, columns['flags'], columns['root']):
+            if flags & cls.HAS_ROOT:
+                folder['root'] = strings[root]
+            if flags & cls.HAS_MARK:
+                folder['marked_for_deletion'] = bool(flags & cls.MARKED)
+        for index, (overrides, dropped) in manifest['rest'].items():
+            folder = folders[int(index)]
+            for key in dropped:
+                folder.pop(key, None)
+            folder.update(overrides)
+        return {**manifest['header'], 'folders': folders}
+
+MARKS_JOURNAL_SUFFIX = '.marks'
+
+def marks_journal_path(scan_path: str) -> str:
+    return scan_path + MARKS_JOURNAL_SUFFIX
+
+# Held for every journal append, replay and truncation in this process
+MARKS_LOCK = threading.Lock()
+
+def read_marks(scan_path: str) -> Dict[str, Dict]:
+    """Replay a scan's marks journal: folder record path -> latest marked fields"""
+    return replay_marks(scan_path)[0]
+
+def replay_marks(scan_path: str) -> Tuple[Dict[str, Dict], int]:
+    """read_marks, plus the journal length replayed (to pass to save_scan as marks_upto)"""
+    journal = marks_journal_path(scan_path)
+    marks = {}
+    with MARKS_LOCK:
+        try:
+            with open(journal, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return marks, 0
+    # A line another process is still writing is left for the next replay
+    end = raw.rfind(b'\n') + 1
+    for line_number, line in enumerate(raw[:end].decode('utf-8', 'replace').split('\n'), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            print(f"Skipping unreadable line {line_number} in {journal}")
+            continue
+        path = record.pop('path', None)
+        if path is not None:
+            record.pop('record', None)
+            marks.setdefault(path, {}).update(record)
+    return marks, end
+
+def apply_marks(folders: List[Dict], marks: Dict[str, Dict]) -> None:
+    if not marks:
+        return
+    for folder in folders:
+        fields = marks.get(folder['path'])
+        if fields:
+            folder.update(fields)
+
+def remove_marks_journal(scan_path: str, upto: int = None) -> None:
+    """Delete a scan's marks journal, or only its first upto bytes"""
+    journal = marks_journal_path(scan_path)
+    with MARKS_LOCK:
+        try:
+            if upto is not None:
+                with open(journal, 'rb') as f:
+                    f.seek(upto)
+                    rest = f.read()
+                if rest:
+                    # Marks appended since the replay wait for the next save
+                    tmp_path = journal + '.tmp'
+                    with open(tmp_path, 'wb') as f:
+                        f.write(rest)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, journal)
+                    return
+            os.remove(journal)
+        except FileNotFoundError:
+            pass
+
+class MarksJournal:
+    """Append-only log of review marks next to a scan file.
+
+    Marking a folder no longer rewrites the whole scan: changes are queued,
+    and after a short quiet period every pending mark is appended as one
+    NDJSON line per folder and fsync'ed. A torn last line from a crash is
+    skipped on replay, so each flush lands entirely or not at all.
+    load_scan replays the journal, and save_scan folds it into the
+    rewritten file and removes it.
+    """
+
+    def __init__(self, scan_path: str, delay: float = 0.5):
+        self.path = marks_journal_path(scan_path)
+        self.delay = delay
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.timer = None
+        self.stats = {'marks': 0, 'flushes': 0, 'lines': 0}
+
+    def mark(self, folder_path: str, **fields) -> None:
+        """Queue fields (e.g. marked_for_deletion=True) for a folder record path"""
+        with self.lock:
+            self.pending.setdefault(folder_path, {}).update(fields)
+            self.stats['marks'] += 1
+            if self.timer is None:
+                self.timer = threading.Timer(self.delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self) -> None:
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            pending, self.pending = self.pending, {}
+            if not pending:
+                return
+            lines = ''.join(json.dumps({'record': 'marks', 'path': path, **fields}, ensure_ascii=False) + '\n'
+                            for path, fields in pending.items())
+            try:
+                with MARKS_LOCK, open(self.path, 'a+b') as f:
+                    # Start on a fresh line after a torn write
+                    if f.seek(0, os.SEEK_END) and (f.seek(-1, os.SEEK_END), f.read(1))[1] != b'\n':
+                        lines = '\n' + lines
+                    f.write(lines.encode('utf-8'))
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError as e:
+                # Keep the marks for the next flush
+                print(f"Error writing marks to {self.path}: {str(e)}")
+                self.pending = pending
+                return
+            self.stats['flushes'] += 1
+            self.stats['lines'] += len(pending)
+
+    def close(self) -> None:
+        self.flush()
+
+class ScanIndex:
+    """Byte offsets and list fields of every folder record in a scan file.
+
+    Opening a large scan with load_scan decodes every folder, including its
+    extension counts, before anything can be shown. The index keeps only
+    what the folder list needs (SUMMARY_FIELDS, the photo and video counts
+    and extension names from media_info, and the record's offset and
+    length) and reads a full record with one seek when a folder is selected.
+    It is saved next to the scan as <scan>.idx and reused while the scan
+    file's size and mtime are unchanged. Marks from the journal are applied
+    to the summaries on open. Compact scans load whole faster than an index
+    could be read, so for them folders holds the full records.
+    """
+
+    SUFFIX = '.idx'
+    VERSION = 3
+    # Everything the folder list shows, sorts or filters on (see FolderTable),
+    # besides the media counts and the mark
+    SUMMARY_FIELDS = ('name', 'path', 'size_mb', 'last_modified', 'project_name', 'camera_vendor')
+    BATCH_SIZE = 500
+    # Bytes read at a time when indexing a JSON scan
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, scan_path: str):
+        self.scan_path = scan_path
+        self.index_path = scan_path + self.SUFFIX
+        self.header = {}
+        self.folders = []
+        # NDJSON 'folder_duplicates' records: folder path -> [offset, length]
+        self.duplicates = {}
+
+    @classmethod
+    def open(cls, scan_path: str, on_folders=None) -> 'ScanIndex':
+        """Reuse or build (and save) the index of scan_path.
+
+        While building, on_folders is called with each batch of summaries,
+        which are the same dicts that end up in folders.
+        """
+        index = cls(scan_path)
+        if is_compact_path(scan_path):
+            data = load_scan(scan_path)
+            index.folders = data.pop('folders')
+            data.pop('duplicate_groups', None)
+            index.header = data
+            return index
+        marks = read_marks(scan_path)
+        if index.load():
+            apply_marks(index.folders, marks)
+            return index
+
+        def add_batch(batch):
+            apply_marks(batch, marks)
+            if on_folders:
+                on_folders(batch)
+
+        index.build(add_batch)
+        try:
+            index.save()
+        except OSError as e:
+            print(f"Error saving scan index {index.index_path}: {str(e)}")
+        return index
 
-    def next_folder(self):
-        if self.current_folder_index < len(self.data['folders']) - 1:
-            self.current_folder_index += 1
-            self.load_current_folder()
+    def _file_key(self) -> List[int]:
+        st = os.stat(self.scan_path)
+        return [st.st_size, st.st_mtime_ns]
 
-    def mark_deletion(self):
-        self.data['folders'][self.current_folder_index]['marked_for_deletion'] = True
-        self.save_json()
-        self.load_current_folder()
+    def load(self) -> bool:
+        """Read the sidecar index; False if it is missing or stale"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f, gc_paused():
+                data = json.load(f, object_hook=FolderSummary.object_hook())
+            if data.get('version') != self.VERSION or data.get('scan_file') != self._file_key():
+                return False
+        except (OSError, ValueError):
+            return False
+        self.header = data['header']
+        self.folders = data['folders']
+        self.duplicates = data['duplicates']
+        extension_sets = {}
+        for summary in self.folders:
+            names = summary.get('extensions')
+            if names is not None:
+                names = tuple(names)
+                summary['extensions'] = extension_sets.setdefault(names, names)
+        return True
+
+    def save(self) -> None:
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'scan_file': self._file_key(), 'header': self.header,
+                       'folders': self.folders, 'duplicates': self.duplicates}, f, ensure_ascii=False,
+                      default=json_default)
+        os.replace(tmp_path, self.index_path)
+
+    def build(self, on_folders=None) -> None:
+        """Index the scan file in one pass, holding one folder record at a time"""
+        self.header = {}
+        self.duplicates = {}
+        folders = []
+        batch = []
+        if is_ndjson_path(self.scan_path):
+            records = self._ndjson_records()
+        else:
+            records = self._json_records()
+        strings = {}
+        extension_sets = {}
+        for record, offset, length in records:
+            summary = {key: record[key] for key in self.SUMMARY_FIELDS if key in record}
+            media_info = record.get('media_info')
+            if isinstance(media_info, dict):
+                # Scalars only: the per-extension counts stay in the scan file
+                names = tuple(media_info.get('extensions') or ())
+                summary['photos'] = media_info.get('photos', 0)
+                summary['videos'] = media_info.get('videos', 0)
+                summary['extensions'] = extension_sets.setdefault(names, names)
+            summary['offset'] = offset
+            summary['length'] = length
+            if 'marked_for_deletion' in record:
+                summary['marked_for_deletion'] = record['marked_for_deletion']
+            summary = FolderSummary(summary, strings)
+            folders.append(summary)
+            batch.append(summary)
+            if on_folders and len(batch) >= self.BATCH_SIZE:
+                on_folders(batch)
+                batch = []
+        if on_folders and batch:
+            on_folders(batch)
+        if is_ndjson_path(self.scan_path):
+            # Streamed scans are in completion order; match the JSON path order
+            folders.sort(key=lambda x: x['path'].lower())
+        self.header.pop('duplicate_groups', None)
+        self.folders = folders
+
+    def _ndjson_records(self):
+        """Yield (folder record, offset, length) and fill header/duplicates"""
+        offset = 0
+        with open(self.scan_path, 'rb') as f:
+            for line in f:
+                start, offset = offset, offset + len(line)
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of an interrupted scan
+                kind = record.pop('record', 'folder')
+                if kind == 'folder':
+                    yield record, start, len(line)
+                elif kind == 'folder_duplicates':
+                    self.duplicates[record['path']] = [start, len(line)]
+                elif kind in ('header', 'summary'):
+                    self.header.update(record)
+
+    def _json_records(self):
+        """Yield (folder record, offset, length) from a JSON scan, decoding one folder at a time.
+
+        The file is read in chunks, so only the current chunk and the value
+        being decoded are held. Byte offsets are counted as the text is consumed.
+        """
+        import codecs
+
+        decoder = json.JSONDecoder()
+        whitespace = re.compile(r'[ \t\n\r]*')
+        utf8 = codecs.getincrementaldecoder('utf-8')()
+        text = ''
+        pos = 0
+        eof = False
+        # Byte offset of text[mark]; offsets are only asked for in increasing order
+        mark = mark_byte = 0
+
+        def to_bytes(index):
+            nonlocal mark, mark_byte
+            piece = text[mark:index]
+            mark_byte += len(piece) if piece.isascii() else len(piece.encode('utf-8'))
+            mark = index
+            return mark_byte
+
+        def more() -> bool:
+            """Drop the consumed text and read the next chunk; False at the end of the file"""
+            nonlocal text, pos, eof, mark, mark_byte
+            if eof:
+                return False
+            # A value longer than a chunk doubles the read, so retries stay linear
+            chunk = f.read(max(self.CHUNK_SIZE, len(text) - pos))
+            eof = not chunk
+            mark_byte = to_bytes(pos)
+            text = text[pos:] + utf8.decode(chunk, final=eof)
+            pos = mark = 0
+            return not eof
+
+        def skip(token=None):
+            nonlocal pos
+            while True:
+                pos = whitespace.match(text, pos).end()
+                if pos < len(text) or not more():
+                    break
+            if token is not None and text.startswith(token, pos):
+                pos += 1
+                skip()
+
+        def decode():
+            nonlocal pos
+            while True:
+                try:
+                    value, end = decoder.raw_decode(text, pos)
+                except ValueError:
+                    # Cut off by the end of the chunk, or not JSON at all
+                    if more():
+                        continue
+                    raise
+                # A number cut off by the end of the text ('0.' of '0.25') may go
+                # on in the next chunk; only a following delimiter settles it
+                following = whitespace.match(text, end).end()
+                if (following == len(text) or text[following] not in ',:]}') and more():
+                    continue
+                start, pos = pos, end
+                return value, start
+
+        def expect(token):
+            if not text.startswith(token, pos):
+                raise ValueError(f"{self.scan_path} is not a scan file")
+
+        with open(self.scan_path, 'rb') as f:
+            skip()
+            expect('{')
+            pos += 1
+            skip()
+            while not text.startswith('}', pos):
+                expect('"')
+                key, _ = decode()
+                skip(':')
+                if key == 'folders' and text.startswith('[', pos):
+                    pos += 1
+                    skip()
+                    while not text.startswith(']', pos):
+                        expect('{')
+                        record, start = decode()
+                        start = to_bytes(start)
+                        yield record, start, to_bytes(pos) - start
+                        skip(',')
+                    pos += 1
+                else:
+                    self.header[key], _ = decode()
+                skip(',')
+
+    def load_folder(self, summary: Dict) -> Dict:
+        """Full folder record behind a summary, with its duplicate stats and current marks"""
+        with open(self.scan_path, 'rb') as f:
+            f.seek(summary['offset'])
+            record = json.loads(f.read(summary['length']))
+            duplicates = self.duplicates.get(summary['path'])
+            if duplicates:
+                f.seek(duplicates[0])
+                record['duplicates'] = json.loads(f.read(duplicates[1]))['duplicates']
+        record.pop('record', None)
+        if 'marked_for_deletion' in summary:
+            record['marked_for_deletion'] = summary['marked_for_deletion']
+        return FolderRecord(record)
+
+_numpy = None
+
+def load_numpy():
+    """Import numpy on first use; None if it is not installed"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            print("numpy not found, sorting and filtering will be slower. "
+                  "Install with: pip install numpy", file=sys.stderr)
+            _numpy = False
+    return _numpy or None
+
+class FolderTable:
+    """Columnar copy of a scan's folder list for sorting and filtering.
+
+    Built once when a scan loads, from full folder records or ScanIndex
+    summaries. Size, modification time, photo and video counts and the
+    mark are NumPy arrays; project, vendor and extension names are
+    interned to ids, with extensions as a folder x extension bool matrix.
+    A query is then a few vectorized comparisons and one argsort, and
+    returns folder indexes, so it answers in milliseconds over a million
+    folders. Without NumPy the same queries run over plain lists.
+    """
+
+    SORT_KEYS = ('path', 'name', 'size', 'modified', 'photos', 'videos')
+
+    def __init__(self, folders: List[Dict]):
+        self.np = load_numpy()
+        self.folders = folders
+        self.projects = {}
+        self.vendors = {}
+        self.extensions = {}
+        # One pass per column: list comprehensions beat a row loop with eight appends.
+        # ScanIndex summaries hold photos, videos and extension names at the top level.
+        media_infos = [folder.get('media_info') or folder for folder in folders]
+        size_mb = [folder['size_mb'] for folder in folders]
+        modified = [folder.get('last_modified') or '' for folder in folders]
+        photos = [media_info.get('photos', 0) for media_info in media_infos]
+        videos = [media_info.get('videos', 0) for media_info in media_infos]
+        marked = [bool(folder.get('marked_for_deletion')) for folder in folders]
+        project = [self.projects.setdefault(folder.get('project_name') or '', len(self.projects))
+                   for folder in folders]
+        vendor = [self.vendors.setdefault(folder.get('camera_vendor') or '', len(self.vendors))
+                  for folder in folders]
+        # Card dumps repeat a handful of extension sets; intern the sets, then their members
+        extension_sets = {}
+        set_ids = [extension_sets.setdefault(tuple(media_info.get('extensions', ())), len(extension_sets))
+                   for media_info in media_infos]
+        set_members = [[self.extensions.setdefault(extension, len(self.extensions)) for extension in names]
+                       for names in extension_sets]
+        self.ranks = {}
+        if self.np is None:
+            self.columns = {'size': size_mb, 'modified': [self._timestamp(text) for text in modified],
+                            'photos': photos, 'videos': videos}
+            self.marked = marked
+            self.project = project
+            self.vendor = vendor
+            self.folder_extensions = [set_members[set_id] for set_id in set_ids]
+        else:
+            np = self.np
+            self.columns = {'size': np.array(size_mb, dtype=np.float64),
+                            # NumPy parses the timestamps in C; missing ones sort first
+                            'modified': np.array(modified, dtype='datetime64[s]').astype(np.int64),
+                            'photos': np.array(photos, dtype=np.int32),
+                            'videos': np.array(videos, dtype=np.int32)}
+            self.marked = np.array(marked, dtype=bool)
+            self.project = np.array(project, dtype=np.int32)
+            self.vendor = np.array(vendor, dtype=np.int32)
+            set_matrix = np.zeros((len(set_members), len(self.extensions)), dtype=bool)
+            for set_id, members in enumerate(set_members):
+                set_matrix[set_id, members] = True
+            self.folder_extensions = set_matrix[np.array(set_ids, dtype=np.int64)]
+
+    def __len__(self) -> int:
+        return len(self.folders)
+
+    @staticmethod
+    def _timestamp(last_modified: str) -> int:
+        """'2024-05-01 12:30:00' as the sortable integer 20240501123000 (list columns)"""
+        if not last_modified:
+            return 0
+        return int(last_modified.replace('-', '').replace(' ', '').replace(':', ''))
+
+    def _cutoff(self, days: float) -> int:
+        """The modified column's value for the local time days ago"""
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+        if self.np is None:
+            return self._timestamp(cutoff)
+        return int(self.np.datetime64(cutoff, 's').astype(self.np.int64))
+
+    def set_marked(self, index: int, marked: bool) -> None:
+        self.marked[index] = bool(marked)
+
+    def _rank(self, field: str):
+        """Position of each folder when sorted by a text field, computed on first use"""
+        if field not in self.ranks:
+            order = sorted(range(len(self.folders)), key=lambda i: self.folders[i][field].lower())
+            rank = [0] * len(order)
+            for position, index in enumerate(order):
+                rank[index] = position
+            self.ranks[field] = rank if self.np is None else self.np.array(rank, dtype=self.np.int64)
+        return self.ranks[field]
+
+    def query(self, project: str = None, vendor: str = None, extension: str = None,
+              marked: bool = None, min_size_mb: float = None, max_size_mb: float = None,
+              older_than_days: float = None, newer_than_days: float = None,
+              sort: str = 'path', descending: bool = False, limit: int = None) -> List[int]:
+        """Indexes of the folders matching every given filter, in sort order"""
+        if sort not in self.SORT_KEYS:
+            raise ValueError(f"Unknown sort key {sort!r}; use one of {', '.join(self.SORT_KEYS)}")
+        conditions = []
+        for names, column, value in ((self.projects, self.project, project),
+                                     (self.vendors, self.vendor, vendor)):
+            if value is not None:
+                if value not in names:
+                    return []
+                conditions.append((column, operator.eq, names[value]))
+        if extension is not None:
+            extension = extension.lower() if extension.startswith('.') else f'.{extension.lower()}'
+            if extension not in self.extensions:
+                return []
+            ext_id = self.extensions[extension]
+            if self.np is not None:
+                conditions.append((self.folder_extensions[:, ext_id], operator.eq, True))
+            else:
+                conditions.append(([ext_id in ids for ids in self.folder_extensions], operator.eq, True))
+        if marked is not None:
+            conditions.append((self.marked, operator.eq, bool(marked)))
+        if min_size_mb is not None:
+            conditions.append((self.columns['size'], operator.ge, min_size_mb))
+        if max_size_mb is not None:
+            conditions.append((self.columns['size'], operator.le, max_size_mb))
+        if older_than_days is not None:
+            conditions.append((self.columns['modified'], operator.lt, self._cutoff(older_than_days)))
+        if newer_than_days is not None:
+            conditions.append((self.columns['modified'], operator.ge, self._cutoff(newer_than_days)))
+        keys = self._rank(sort) if sort in ('path', 'name') else self.columns[sort]
+
+        if self.np is None:
+            indexes = [i for i in range(len(self.folders))
+                       if all(op(column[i], value) for column, op, value in conditions)]
+            # Stable in both directions: ties stay in scan order
+            indexes.sort(key=keys.__getitem__, reverse=descending)
+            return indexes[:limit]
+
+        np = self.np
+        mask = np.ones(len(self.folders), dtype=bool)
+        for column, op, value in conditions:
+            mask &= op(column, value)
+        indexes = np.flatnonzero(mask)
+        selected = keys[indexes]
+        if descending:
+            # Stable descending order: sort the reversed keys and reverse back
+            order = len(selected) - 1 - np.argsort(selected[::-1], kind='stable')[::-1]
+        else:
+            order = np.argsort(selected, kind='stable')
+        return indexes[order][:limit].tolist()
+
+class Inotify:
+    """Minimal inotify binding through ctypes (Linux only)"""
+
+    MODIFY = 0x00000002
+    CLOSE_WRITE = 0x00000008
+    MOVED_FROM = 0x00000040
+    MOVED_TO = 0x00000080
+    CREATE = 0x00000100
+    DELETE = 0x00000200
+    DELETE_SELF = 0x00000400
+    Q_OVERFLOW = 0x00004000
+    IGNORED = 0x00008000
+    ONLYDIR = 0x01000000
+    DONT_FOLLOW = 0x02000000
+    ISDIR = 0x40000000
+    # Final sizes arrive with CLOSE_WRITE, so the chatty MODIFY stays off
+    WATCH_MASK = CLOSE_WRITE | MOVED_FROM | MOVED_TO | CREATE | DELETE | ONLYDIR | DONT_FOLLOW
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        if not sys.platform.startswith('linux'):
+            raise RuntimeError("Watch mode needs inotify, which is only available on Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.ctypes = ctypes
+
+    def add_watch(self, path: str) -> int:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.WATCH_MASK)
+        if wd < 0:
+            error = self.ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def remove_watch(self, wd: int) -> None:
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """Yield (wd, mask, name) for every queued event"""
+        try:
+            buffer = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + self.EVENT.size <= len(buffer):
+            wd, mask, _, length = self.EVENT.unpack_from(buffer, offset)
+            offset += self.EVENT.size
+            name = buffer[offset:offset + length].rstrip(b'\0')
+            offset += length
+            yield wd, mask, os.fsdecode(name)
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+class ScanWatcher:
+    """Keep a loaded scan up to date from filesystem events.
+
+    Every directory below the scan's roots gets an inotify watch. Events
+    only mark their directory dirty; once no event has arrived for quiet
+    seconds, all dirty directories are settled in one pass, so copying a
+    whole card costs one re-aggregation. For each dirty directory the
+    subtree above its outermost camera folder (or the directory itself,
+    outside camera folders) is walked again with the scanner. Camera
+    folders whose tree signature is unchanged are reused, and review
+    marks are carried over. The affected records are replaced, added or
+    removed in data['folders'] and the totals are recomputed.
+    """
+
+    def __init__(self, data: Dict, scan_path: str = None, quiet: float = 5.0,
+                 on_update=None, camera_rules=None):
+        self.data = data
+        self.scan_path = scan_path
+        self.quiet = quiet
+        self.on_update = on_update
+        self.roots = [os.path.normpath(root) for root in scan_roots(data)]
+        self.camera_rules = MediaScanner._load_camera_rules(camera_rules)
+        self.disk_usage = any('disk_usage' in folder for folder in data.get('folders', []))
+        self.lock = threading.Lock()
+        # Marks made while an update may be saving; applied before the next save
+        self.pending_marks = {}
+        self.marks_lock = threading.Lock()
+        self.telemetry = Telemetry()
+        self.inotify = None
+        self.watches = {}
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def start(self) -> None:
+        self.inotify = Inotify()
+        with self.telemetry.phase('add_watches'):
+            for root in self.roots:
+                self._watch_tree(root)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def mark(self, folder_path: str, **fields) -> None:
+        """Record review fields for a folder so the next save keeps them"""
+        with self.marks_lock:
+            self.pending_marks.setdefault(folder_path, {}).update(fields)
+
+    def snapshot(self) -> List[Dict]:
+        """Current folder records, safe to hand to another thread"""
+        with self.lock:
+            return list(self.data['folders'])
+
+    def _watch_tree(self, path: str) -> None:
+        for directory, _, _ in os.walk(path):
+            try:
+                self.watches[self.inotify.add_watch(directory)] = directory
+            except OSError as e:
+                # ENOSPC: fs.inotify.max_user_watches is too low for this tree
+                self.telemetry.error(f"Error watching {directory}: {str(e)}")
+                if e.errno == 28:
+                    return
+
+    def _forget_tree(self, path: str) -> None:
+        prefix = path + os.sep
+        for wd, directory in list(self.watches.items()):
+            if directory == path or directory.startswith(prefix):
+                self.inotify.remove_watch(wd)
+                del self.watches[wd]
+
+    def _run(self) -> None:
+        import select
+
+        dirty = set()
+        last_event = 0.0
+        while not self.stopped.is_set():
+            timeout = 1.0
+            if dirty:
+                timeout = max(0.0, min(timeout, last_event + self.quiet - time.monotonic()))
+            ready, _, _ = select.select([self.inotify.fd], [], [], timeout)
+            if ready:
+                events = 0
+                for wd, mask, name in self.inotify.read_events():
+                    events += 1
+                    self._handle_event(wd, mask, name, dirty)
+                self.telemetry.count('events', events)
+                last_event = time.monotonic()
+            elif dirty and time.monotonic() - last_event >= self.quiet:
+                batch, dirty = dirty, set()
+                try:
+                    changes = self.apply_changes(batch)
+                    if self.on_update:
+                        self.on_update(changes)
+                except Exception as e:
+                    self.telemetry.error(f"Error updating scan: {str(e)}")
+
+    def _handle_event(self, wd: int, mask: int, name: str, dirty: set) -> None:
+        if mask & Inotify.Q_OVERFLOW:
+            # Events were lost; settle every root
+            dirty.update(self.roots)
+            return
+        directory = self.watches.get(wd)
+        if mask & Inotify.IGNORED:
+            self.watches.pop(wd, None)
+            return
+        if directory is None:
+            return
+        dirty.add(directory)
+        if mask & Inotify.ISDIR:
+            path = os.path.join(directory, name)
+            if mask & (Inotify.CREATE | Inotify.MOVED_TO):
+                self._watch_tree(path)
+            elif mask & Inotify.MOVED_FROM:
+                self._forget_tree(path)
+
+    def _root_of(self, path: str):
+        for root in self.roots:
+            if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+                return root
+        return None
 
-    def mark_keep(self):
-        self.data['folders'][self.current_folder_index]['marked_for_deletion'] = False
-        self.save_json()
-        self.load_current_folder()
+    def _scan_unit(self, path: str, by_path: Dict, camera_folders: Dict) -> str:
+        """Directory to walk again for a change in path: the parent of its outermost camera folder.
+
+        The walk classifies the children of the directory it starts from but
+        not that directory itself, so outside camera folders it starts at
+        path. Ancestors without a record yet (a camera folder that held no
+        media) are classified with the camera rules, memoized in
+        camera_folders for the batch. Above the first recorded ancestor only
+        records are consulted: a camera folder containing one has media too.
+        """
+        root = self._root_of(path)
+        unit = path
+        recorded = False
+        current = path
+        while current and current != root:
+            parent = os.path.dirname(current)
+            if parent == current:
+                break
+            if current in by_path:
+                recorded = True
+                unit = parent
+            elif not recorded and self._is_camera_folder(current, parent, camera_folders):
+                unit = parent
+            current = parent
+        return unit
+
+    def _is_camera_folder(self, path: str, parent: str, camera_folders: Dict) -> bool:
+        known = camera_folders.get(path)
+        if known is None:
+            try:
+                with os.scandir(path) as it:
+                    subfolders = [entry.name for entry in it if entry.is_dir(follow_symlinks=False)]
+            except OSError:
+                subfolders = None
+            known = camera_folders[path] = self.camera_rules.classify(
+                os.path.basename(path), os.path.basename(parent), subfolders) is not None
+        return known
+
+    @staticmethod
+    def _inside(path: str, directory: str) -> bool:
+        return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+    def apply_changes(self, directories) -> Dict:
+        """Re-aggregate the scan below the given changed directories; returns what changed"""
+        start = time.perf_counter()
+        with self.lock:
+            folders = self.data['folders']
+            by_path = {MediaScanner._os_path(folder['path']): folder for folder in folders}
+            units = set()
+            camera_folders = {}
+            for directory in directories:
+                directory = os.path.normpath(directory)
+                if self._root_of(directory) is not None:
+                    units.add(self._scan_unit(directory, by_path, camera_folders))
+            # Nested units are covered by the outer one
+            units = [unit for unit in units
+                     if not any(other != unit and self._inside(unit, other) for other in units)]
+
+            old = {path: folder for path, folder in by_path.items()
+                   if any(self._inside(path, unit) for unit in units)}
+            new = {}
+            for unit in units:
+                for folder in self._walk_unit(unit, old):
+                    new[MediaScanner._os_path(folder['path'])] = folder
+
+            kept = [folder for path, folder in by_path.items() if path not in old]
+            folders[:] = sorted(kept + list(new.values()), key=lambda x: x['path'].lower())
+            self.data.update(summarize_folders(folders))
+            if 'roots' in self.data:
+                self._update_root_totals()
+            changes = {
+                'units': units,
+                'added': sorted(path for path in new if path not in old),
+                'updated': sorted(path for path in new if path in old and new[path] != old[path]),
+                'removed': sorted(path for path in old if path not in new),
+                'total_folders': self.data['total_folders'],
+                'total_size_gb': self.data['total_size_gb'],
+            }
+            with self.marks_lock:
+                marks, self.pending_marks = self.pending_marks, {}
+            if self.scan_path:
+                # Marks may have been journaled since the scan was loaded;
+                # any journaled after this replay stay in the journal
+                journaled, marks_upto = replay_marks(self.scan_path)
+                marks = {**journaled, **marks}
+            apply_marks(folders, marks)
+            if self.scan_path:
+                save_scan(self.data, self.scan_path, marks_upto=marks_upto)
+        changes['seconds'] = round(time.perf_counter() - start, 3)
+        self.telemetry.record(counters={'updates': 1, 'folders_added': len(changes['added']),
+                                        'folders_updated': len(changes['updated']),
+                                        'folders_removed': len(changes['removed'])},
+                              timings={'update': changes['seconds']}, label=', '.join(units))
+        return changes
+
+    def _walk_unit(self, unit: str, old: Dict) -> List[Dict]:
+        if not os.path.isdir(unit):
+            return []
+        scanner = MediaScanner(unit, None, camera_rules=self.camera_rules, disk_usage=self.disk_usage)
+        scanner.telemetry = self.telemetry
+        scanner.previous_folders = {folder['path']: folder for path, folder in old.items()
+                                    if self._inside(path, unit)}
+        root = self._root_of(unit)
+        folders = []
+        for folder in scanner.walk_camera_folders():
+            # The walk started at unit; paths stay relative to the scan root
+            full_path = MediaScanner._os_path(folder['path'])
+            folder['relative_path'] = os.path.relpath(full_path, root).replace('\\', '\\\\')
+            if len(self.roots) > 1:
+                folder['root'] = MediaScanner._record_path(root)
+            folders.append(folder)
+        return folders
+
+    def _update_root_totals(self) -> None:
+        for entry in self.data['roots']:
+            root = MediaScanner._os_path(entry['path'])
+            folders = [folder for folder in self.data['folders']
+                       if self._inside(MediaScanner._os_path(folder['path']), root)]
+            size_mb = sum(folder['size_mb'] for folder in folders)
+            entry.update(total_folders=len(folders), total_size_mb=round(size_mb, 2),
+                         total_size_gb=round(size_mb / 1024, 2))
+
+def scan_roots(data: Dict) -> List[str]:
+    """Folders a scan covered: its base_paths, or its single base_path"""
+    return list(data.get('base_paths') or [data['base_path']])
+
+def default_output_file(folder_path, extension: str = 'json') -> str:
+    """Scan file name derived from the scanned folder (or the first of several) and the current time"""
+    folder_paths = folder_path if isinstance(folder_path, (list, tuple)) else [folder_path]
+    folder_name = os.path.basename(os.path.normpath(folder_paths[0]))
+    if len(folder_paths) > 1:
+        folder_name += f"_and_{len(folder_paths) - 1}_more"
+    return f"{folder_name}_scan_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+def format_progress(snapshot: Dict) -> str:
+    eta = snapshot['eta_seconds']
+    eta_text = '--' if eta is None else str(datetime.timedelta(seconds=int(eta)))
+    return (f"{snapshot['dirs']:,} folders ({snapshot['dirs_per_sec']:,.0f}/s) | "
+            f"{snapshot['files']:,} files ({snapshot['files_per_sec']:,.0f}/s) | "
+            f"{snapshot['bytes'] / (1024 ** 3):,.2f} GB found | ETA {eta_text}")
+
+def summarize_scan(data: Dict, top: int = 10) -> Dict:
+    """Totals, review state and the largest folders of a loaded scan"""
+    folders = data.get('folders', [])
+    marked = [folder for folder in folders if folder.get('marked_for_deletion')]
+    marked_mb = sum(folder['size_mb'] for folder in marked)
+    largest = sorted(folders, key=lambda x: x['size_mb'], reverse=True)[:top]
+    return {
+        'base_path': data.get('base_path'),
+        'scan_time': data.get('scan_time'),
+        **summarize_folders(folders),
+        **({'roots': data['roots']} if 'roots' in data else {}),
+        'photos': sum(folder['media_info']['photos'] for folder in folders),
+        'videos': sum(folder['media_info']['videos'] for folder in folders),
+        'marked_for_deletion': len(marked),
+        'marked_size_gb': round(marked_mb / 1024, 2),
+        **({'disk_usage': data['disk_usage']} if 'disk_usage' in data else {}),
+        **({'duplicates': data['duplicates']} if 'duplicates' in data else {}),
+        'largest': [{'path': folder['path'], 'size_mb': folder['size_mb']} for folder in largest],
+    }
+
+# Exit codes of the command line interface
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_NO_RESULTS = 3
+
+def build_arg_parser():
+    import argparse
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--json', action='store_true',
+                        help='print a machine-readable JSON result on stdout')
+
+    scan_options = argparse.ArgumentParser(add_help=False)
+    scan_options.add_argument('-o', '--output',
+                              help='scan file to write (default: <folder>_scan_<time>.<format>)')
+    scan_options.add_argument('-w', '--workers', type=int, default=1,
+                              help='parallel directory listing threads (default: 1)')
+    scan_options.add_argument('-f', '--format', choices=tuple(SCAN_FORMAT_EXTENSIONS),
+                              help='output format; compact is a zlib-compressed binary .mscan file '
+                                   '(default: from the output file extension, else json)')
+    scan_options.add_argument('--progress', action='store_true',
+                              help='report progress on stderr')
+    scan_options.add_argument('--duplicates', action='store_true',
+                              help='find duplicate media files and reclaimable space')
+    scan_options.add_argument('--hash-workers', type=int, default=4,
+                              help='parallel readers for duplicate hashing (default: 4)')
+    scan_options.add_argument('--disk-usage', action='store_true',
+                              help='also report allocated and reclaimable bytes, counting '
+                                   'hardlinked files once and sparse files by their blocks')
+    scan_options.add_argument('--telemetry', action='store_true',
+                              help='print phase timings, counters, slowest folders and errors')
+    scan_options.add_argument('--rules',
+                              help=f'JSON camera folder rules (default: {CAMERA_RULES_FILE} '
+                                   'next to mediaScan.py if present, else built-in rules)')
+
+    parser = argparse.ArgumentParser(
+        prog='mediaScan',
+        description='Find camera media folders in backups. Run without arguments to start the GUI.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    scan = commands.add_parser('scan', parents=[common, scan_options],
+                               help='scan a folder for camera media folders')
+    scan.add_argument('path', nargs='+',
+                      help='folder to scan; several folders are scanned concurrently, one at a '
+                           'time per device, into one scan file')
+    scan.add_argument('--previous', help='previous scan file to reuse unchanged folders from')
+
+    rescan = commands.add_parser('rescan', parents=[common, scan_options],
+                                 help='incrementally rescan the folder of a previous scan')
+    rescan.add_argument('previous_scan', help='previous JSON, NDJSON or compact scan file')
+    rescan.add_argument('--path', nargs='+',
+                        help='folders to scan (default: the roots of the previous scan)')
+
+    summarize = commands.add_parser('summarize', parents=[common],
+                                    help='print totals of an existing scan file')
+    summarize.add_argument('scan_file', help='JSON, NDJSON or compact scan file')
+    summarize.add_argument('--top', type=int, default=10,
+                           help='number of largest folders to list (default: 10)')
+
+    export = commands.add_parser('export', parents=[common],
+                                 help='write a scan file with its marks journal folded in')
+    export.add_argument('scan_file', help='JSON, NDJSON or compact scan file')
+    export.add_argument('-o', '--output',
+                        help='JSON, NDJSON or compact (.mscan) file to write, by extension '
+                             '(default: rewrite scan_file)')
+
+    query = commands.add_parser('query', parents=[common],
+                                help='list the folders of a scan file matching filters, sorted')
+    query.add_argument('scan_file', help='JSON, NDJSON or compact scan file')
+    query.add_argument('--project', help='only folders of this project (parent folder name)')
+    query.add_argument('--vendor', help='only folders of this camera vendor')
+    query.add_argument('--extension', help='only folders holding files with this extension, e.g. .cr2')
+    marks = query.add_mutually_exclusive_group()
+    marks.add_argument('--marked', dest='marked', action='store_true', default=None,
+                       help='only folders marked for deletion')
+    marks.add_argument('--unmarked', dest='marked', action='store_false',
+                       help='only folders not marked for deletion')
+    query.add_argument('--min-size', type=float, metavar='MB', help='only folders of at least MB')
+    query.add_argument('--max-size', type=float, metavar='MB', help='only folders of at most MB')
+    query.add_argument('--older-than', type=float, metavar='DAYS',
+                       help='only folders last modified more than DAYS ago')
+    query.add_argument('--newer-than', type=float, metavar='DAYS',
+                       help='only folders last modified within DAYS')
+    query.add_argument('--sort', choices=FolderTable.SORT_KEYS, default='path',
+                       help='sort key (default: path)')
+    query.add_argument('--desc', action='store_true', help='sort in descending order')
+    query.add_argument('--limit', type=int, default=20,
+                       help='number of folders to list, 0 for all (default: 20)')
+
+    watch = commands.add_parser('watch', parents=[common],
+                                help='keep a scan file up to date as its folders change (Linux)')
+    watch.add_argument('scan_file', help='JSON, NDJSON or compact scan file')
+    watch.add_argument('--quiet', type=float, default=5.0,
+                       help='seconds without filesystem events before changes are applied '
+                            '(default: 5)')
+    watch.add_argument('--rules',
+                       help=f'JSON camera folder rules (default: {CAMERA_RULES_FILE} '
+                            'next to mediaScan.py if present, else built-in rules)')
+    return parser
+
+def print_progress(snapshot: Dict) -> None:
+    end = '\n' if snapshot['done'] else ''
+    print(f"\r{snapshot['percent']:5.1f}% {format_progress(snapshot)}", end=end,
+          file=sys.stderr, flush=True)
+
+def cli_scan(args) -> Dict:
+    previous_scan = args.previous_scan if args.command == 'rescan' else args.previous
+    roots = args.path
+    if roots is None:
+        roots = scan_roots(load_scan(previous_scan))
+    for root in roots:
+        if not os.path.isdir(root):
+            raise ValueError(f"Not a folder: {root}")
+    base_path = roots[0] if len(roots) == 1 else roots
+
+    output_format = args.format or scan_format(args.output)
+    if args.output and scan_format(args.output) != output_format:
+        # Scan files are read back by extension alone
+        raise ValueError(f"{args.output}: a {output_format} scan needs a "
+                         f".{SCAN_FORMAT_EXTENSIONS[output_format]} file name")
+    output_file = args.output or default_output_file(roots, SCAN_FORMAT_EXTENSIONS[output_format])
+    scanner = MediaScanner(base_path, output_file, workers=args.workers,
+                           previous_scan=previous_scan, output_format=output_format,
+                           find_duplicates=args.duplicates, hash_workers=args.hash_workers,
+                           camera_rules=args.rules, disk_usage=args.disk_usage)
+    results = scanner.scan_and_save(print_progress if args.progress else None)
+    if not results:
+        raise RuntimeError(f"Scan of {', '.join(roots)} failed")
+
+    summary = {key: results.get(key) for key in ('scan_time', 'base_path')}
+    if 'base_paths' in results:
+        summary['base_paths'] = results['base_paths']
+    # The telemetry block is always in the scan file; print it only on request
+    hidden = ('duplicate_groups',) if args.telemetry else ('duplicate_groups', 'telemetry')
+    summary.update({key: results[key] for key in SCAN_SUMMARY_KEYS
+                    if key in results and key not in hidden})
+    summary['output_file'] = output_file
+    return summary
+
+def cli_export(args) -> Dict:
+    data = load_scan(args.scan_file)
+    output_file = args.output or args.scan_file
+    save_scan(data, output_file)
+    return {'output_file': output_file, **summarize_folders(data.get('folders', [])),
+            'marked_for_deletion': sum(1 for folder in data.get('folders', [])
+                                       if folder.get('marked_for_deletion'))}
+
+def cli_query(args) -> Dict:
+    # The index sidecar already holds every queried field, so large scans open fast
+    index = ScanIndex.open(args.scan_file)
+    table = FolderTable(index.folders)
+    matches = table.query(project=args.project, vendor=args.vendor, extension=args.extension,
+                          marked=args.marked, min_size_mb=args.min_size, max_size_mb=args.max_size,
+                          older_than_days=args.older_than, newer_than_days=args.newer_than,
+                          sort=args.sort, descending=args.desc)
+    folders = [index.folders[i] for i in matches]
+    return {
+        'scan_file': args.scan_file,
+        'matches': len(folders),
+        **{key: value for key, value in summarize_folders(folders).items() if key != 'total_folders'},
+        'folders': [{key: folder.get(key) for key in
+                     ('path', 'size_mb', 'last_modified', 'project_name', 'marked_for_deletion')}
+                    for folder in folders[:args.limit or None]],
+    }
+
+def format_watch_update(changes: Dict) -> str:
+    return (f"{datetime.datetime.now():%H:%M:%S} {len(changes['added'])} added, "
+            f"{len(changes['updated'])} updated, {len(changes['removed'])} removed in "
+            f"{changes['seconds']:.2f} s; {changes['total_folders']} folders, "
+            f"{changes['total_size_gb']} GB")
+
+def cli_watch(args) -> Dict:
+    data = load_scan(args.scan_file)
+    if args.json:
+        report = lambda changes: print(json.dumps(changes, ensure_ascii=False), flush=True)
+    else:
+        report = lambda changes: print(format_watch_update(changes), flush=True)
+    watcher = ScanWatcher(data, args.scan_file, quiet=args.quiet, on_update=report,
+                          camera_rules=args.rules)
+    watcher.start()
+    print(f"Watching {len(watcher.watches)} folders under {', '.join(watcher.roots)}; "
+          "Ctrl-C to stop", file=sys.stderr)
+    try:
+        while watcher.thread.is_alive():
+            watcher.thread.join(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+    return {'scan_file': args.scan_file, **summarize_folders(data['folders']),
+            'updates': watcher.telemetry.report()['counters'].get('updates', 0)}
+
+def run_cli(argv=None) -> int:
+    """Headless entry point: scan, rescan, summarize, query, export or watch without the GUI"""
+    args = build_arg_parser().parse_args(argv)
+
+    try:
+        if args.command == 'summarize':
+            result = summarize_scan(load_scan(args.scan_file), args.top)
+        elif args.command == 'export':
+            result = cli_export(args)
+        elif args.command == 'query':
+            result = cli_query(args)
+        elif args.command == 'watch':
+            result = cli_watch(args)
+        else:
+            # Keep stdout clean for --json: per-folder errors go to stderr
+            with contextlib.redirect_stdout(sys.stderr):
+                result = cli_scan(args)
+    except Exception as e:
+        if args.json:
+            print(json.dumps({'error': str(e)}))
+        else:
+            print(f"Error: {str(e)}", file=sys.stderr)
+        return EXIT_ERROR
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        for key, value in result.items():
+            if key == 'largest':
+                print('largest:')
+                for folder in value:
+                    print(f"  {folder['size_mb']:>12,.2f} MB  {folder['path']}")
+            elif key == 'folders':
+                print('folders:')
+                for folder in value:
+                    mark = '  [DELETE]' if folder['marked_for_deletion'] else ''
+                    print(f"  {folder['size_mb']:>12,.2f} MB  {folder['last_modified']}  "
+                          f"{folder['path']}{mark}")
+            elif key == 'telemetry':
+                print('telemetry:')
+                for line in format_telemetry(value).splitlines():
+                    print(f"  {line}")
+            else:
+                print(f"{key}: {value}")
 
-    def open_folder(self):
-        folder_path = self.data['folders'][self.current_folder_index]['path'].replace('\\\\', '\\')
-        try:
-            if os.name == 'nt':  # Windows
-                os.startfile(folder_path)
-            elif os.name == 'posix':  # macOS and Linux
-                subprocess.run(['xdg-open' if os.name == 'posix' else 'open', folder_path])
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not open folder: {str(e)}")
+    if args.command in ('scan', 'rescan') and not result.get('total_folders'):
+        return EXIT_NO_RESULTS
+    return EXIT_OK
 
-    def save_json(self):
-        try:
-            # Save to the original scan file to maintain history
-            if hasattr(self, 'data') and 'json_path' in self.data:
-                with open(self.data['json_path'], 'w', encoding='utf-8') as f:
-                    json.dump(self.data, f, indent=4, ensure_ascii=False)
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not save changes: {str(e)}")
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        return run_cli(argv)
 
-def main():
-    root = tk.Tk()
-    app = MediaManager(root)
-    root.mainloop()
+    import mediaScanGUI
+    mediaScanGUI.main()
+    return EXIT_OK
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # mediaScanGUI does "from mediaScan import ..."; reuse this module for it
+    sys.modules.setdefault('mediaScan', sys.modules[__name__])
+    sys.exit(main())
@@ -0,0 +1,2085 @@
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox, Canvas
+import json
+import os
+from PIL import Image, ImageTk
+from typing import Dict
+import subprocess
+from tkinter import Canvas, Scrollbar
+import threading
+import collections
+import time
+from queue import Queue, Empty
+
+from mediaScan import (FolderTable, MarksJournal, MediaScanner, ScanIndex, ScanWatcher, Telemetry,
+                       SCAN_FORMAT_EXTENSIONS, default_output_file, format_progress, format_telemetry,
+                       is_ndjson_path, json_default, load_scan, scan_roots, summarize_folders)
+
+from functools import partial
+import heapq
+import itertools
+import sqlite3
+import struct
+from io import BytesIO
+
+def default_cache_dir() -> str:
+    """Per-user cache directory for mediaScan data (thumbnails etc.)"""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'mediaScan')
+
+def exif_thumbnail_bytes(exif: bytes):
+    """Return the JPEG thumbnail stored in IFD1 of a raw EXIF block, or None.
+
+    exif is the APP1 payload PIL reads from the file header (Image.info['exif']);
+    the thumbnail is addressed by the JPEGInterchangeFormat (0x0201) and
+    JPEGInterchangeFormatLength (0x0202) tags of the second IFD.
+    """
+    if not exif or not exif.startswith(b'Exif\x00\x00'):
+        return None
+    tiff = memoryview(exif)[6:]
+    byte_order = {b'II': '<', b'MM': '>'}.get(bytes(tiff[:2]))
+    if byte_order is None:
+        return None
+    try:
+        ifd0 = struct.unpack_from(byte_order + 'I', tiff, 4)[0]
+        count = struct.unpack_from(byte_order + 'H', tiff, ifd0)[0]
+        ifd1 = struct.unpack_from(byte_order + 'I', tiff, ifd0 + 2 + 12 * count)[0]
+        if not ifd1:
+            return None
+        offset = length = None
+        count = struct.unpack_from(byte_order + 'H', tiff, ifd1)[0]
+        for i in range(count):
+            tag, _, _, value = struct.unpack_from(byte_order + 'HHII', tiff, ifd1 + 2 + 12 * i)
+            if tag == 0x0201:
+                offset = value
+            elif tag == 0x0202:
+                length = value
+    except struct.error:
+        return None
+    if not offset or not length or offset + length > len(tiff):
+        return None
+    data = bytes(tiff[offset:offset + length])
+    return data if data.startswith(b'\xff\xd8') else None
+
+# ISO BMFF / QuickTime boxes that may lead to an embedded preview image:
+# iTunes-style cover art (moov/udta/meta/ilst/covr/data) and the Canon
+# thumbnail box of EOS movies (moov/udta/CNTH/CNDA)
+PREVIEW_CONTAINER_BOXES = {b'moov', b'udta', b'meta', b'ilst', b'covr', b'CNTH'}
+PREVIEW_DATA_BOXES = {b'data', b'CNDA'}
+
+def container_preview_bytes(file_path: str, max_bytes: int = 1024 * 1024, max_boxes: int = 512):
+    """Return a JPEG or PNG preview embedded in an MP4/MOV file, or None.
+
+    Walks the box tree with seeks, reading only box headers and the
+    payload of a preview box (at most max_bytes), so even a multi-gigabyte
+    clip costs a handful of small reads. Media data is never touched.
+    """
+    budget = [max_boxes]
+
+    def walk(f, start, end):
+        position = start
+        while position + 8 <= end and budget[0] > 0:
+            budget[0] -= 1
+            f.seek(position)
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            size, kind = struct.unpack('>I4s', header)
+            header_size = 8
+            if size == 1:
+                size = struct.unpack('>Q', f.read(8))[0]
+                header_size = 16
+            elif size == 0:
+                size = end - position
+            if size < header_size:
+                return None
+
+            if kind in PREVIEW_CONTAINER_BOXES:
+                child_start = position + header_size
+                if kind == b'meta':
+                    # ISO meta is a full box (4 bytes of version and flags),
+                    # QuickTime meta is not; the handler box comes first in both
+                    f.seek(child_start)
+                    if f.read(8)[4:8] != b'hdlr':
+                        child_start += 4
+                found = walk(f, child_start, min(position + size, end))
+                if found:
+                    return found
+            elif kind in PREVIEW_DATA_BOXES:
+                f.seek(position + header_size)
+                payload = f.read(min(size - header_size, max_bytes))
+                for signature in (b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n'):
+                    offset = payload.find(signature, 0, 64)
+                    if offset >= 0:
+                        return payload[offset:]
+            position += size
+        return None
+
+    try:
+        with open(file_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            return walk(f, 0, f.tell())
+    except (OSError, struct.error) as e:
+        print(f"Error reading preview from {file_path}: {str(e)}")
+        return None
+
+def add_preview_candidates(candidates: Dict, root: str, files) -> None:
+    """Note the sidecar preview images in one directory listing.
+
+    candidates maps (clip directory, lower-case clip name without extension)
+    to (rank, image path); the lowest rank wins: a .THM sidecar, then an
+    XAVC THMBNL/<clip>T01.JPG next to the CLIP folder, then a JPEG of the
+    same name.
+    """
+    root_key = os.path.normcase(root)
+    thumbnail_folder = os.path.basename(root).upper() == 'THMBNL'
+    for name in files:
+        stem, ext = os.path.splitext(name)
+        ext = ext.lower()
+        if ext == '.thm':
+            key, rank = (root_key, stem.lower()), 0
+        elif ext in ('.jpg', '.jpeg'):
+            if thumbnail_folder and len(stem) > 3 and stem[-3:-2].upper() == 'T' and stem[-2:].isdigit():
+                clip_folder = os.path.normcase(os.path.join(os.path.dirname(root), 'CLIP'))
+                key, rank = (clip_folder, stem[:-3].lower()), 1
+            else:
+                key, rank = (root_key, stem.lower()), 2
+        else:
+            continue
+        if key not in candidates or rank < candidates[key][0]:
+            candidates[key] = (rank, os.path.join(root, name))
+
+def match_video_previews(file_paths, candidates: Dict, video_extensions) -> Dict[str, str]:
+    """Map each video in file_paths to its best sidecar preview image"""
+    previews = {}
+    for file_path in file_paths:
+        directory, name = os.path.split(file_path)
+        stem, ext = os.path.splitext(name)
+        if ext.lower() in video_extensions:
+            candidate = candidates.get((os.path.normcase(directory), stem.lower()))
+            if candidate:
+                previews[file_path] = candidate[1]
+    return previews
+
+def list_media_files(folder_path: str, file_types: Dict):
+    """All media files below folder_path and the sidecar previews of its videos"""
+    media_types = set().union(*file_types.values())
+    file_list = []
+    preview_candidates = {}
+    for root, _, files in os.walk(folder_path):
+        add_preview_candidates(preview_candidates, root, files)
+        for file in files:
+            if os.path.splitext(file.lower())[1] in media_types:
+                file_list.append(os.path.join(root, file))
+    return file_list, match_video_previews(file_list, preview_candidates, file_types['video'])
+
+class ThumbnailCache:
+    """Persistent thumbnail store in a single SQLite file.
+
+    Entries are keyed on (path, thumbnail size) and only count as a hit when
+    the source file's size and mtime still match. The total blob size is
+    capped; when it is exceeded the least recently used entries are evicted.
+    Hits do not write: their access times are collected in memory and
+    written in one batch before an eviction, on close, or every
+    TOUCH_BATCH hits. Safe to share between the thumbnail worker threads.
+    """
+
+    TOUCH_BATCH = 500
+
+    def __init__(self, db_path: str = None, max_mb: int = 512):
+        self.db_path = db_path or os.path.join(default_cache_dir(), 'thumbnails.sqlite')
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        # (path, thumb_size) -> last access time not yet written
+        self.touched = {}
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS thumbnails ('
+            ' path TEXT NOT NULL,'
+            ' thumb_size INTEGER NOT NULL,'
+            ' file_size INTEGER NOT NULL,'
+            ' mtime_ns INTEGER NOT NULL,'
+            ' data BLOB NOT NULL,'
+            ' last_used REAL NOT NULL,'
+            ' PRIMARY KEY (path, thumb_size))'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS thumbnails_lru ON thumbnails (last_used)')
+        self.conn.commit()
+        self.total_bytes = self.conn.execute(
+            'SELECT COALESCE(SUM(LENGTH(data)), 0) FROM thumbnails').fetchone()[0]
+
+    def get(self, file_path: str, thumb_size: int):
+        """Return the cached thumbnail as a PIL image, or None on a miss"""
+        try:
+            st = os.stat(file_path)
+            with self.lock:
+                row = self.conn.execute(
+                    'SELECT data FROM thumbnails WHERE path = ? AND thumb_size = ?'
+                    ' AND file_size = ? AND mtime_ns = ?',
+                    (file_path, thumb_size, st.st_size, st.st_mtime_ns)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                self.hits += 1
+                self.touched[(file_path, thumb_size)] = time.time()
+                if len(self.touched) >= self.TOUCH_BATCH:
+                    self._flush_touched()
+                    self.conn.commit()
+            img = Image.open(BytesIO(row[0]))
+            img.load()
+            return img
+        except Exception as e:
+            print(f"Error reading cached thumbnail for {file_path}: {str(e)}")
+            return None
+
+    def put(self, file_path: str, thumb_size: int, img) -> None:
+        """Store a freshly decoded thumbnail, evicting old entries if over the cap"""
+        try:
+            st = os.stat(file_path)
+            buffer = BytesIO()
+            if img.mode in ('RGB', 'L'):
+                img.save(buffer, format='JPEG', quality=85)
+            else:
+                img.save(buffer, format='PNG')
+            data = buffer.getvalue()
+
+            with self.lock:
+                old = self.conn.execute(
+                    'SELECT LENGTH(data) FROM thumbnails WHERE path = ? AND thumb_size = ?',
+                    (file_path, thumb_size)).fetchone()
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO thumbnails'
+                    ' (path, thumb_size, file_size, mtime_ns, data, last_used)'
+                    ' VALUES (?, ?, ?, ?, ?, ?)',
+                    (file_path, thumb_size, st.st_size, st.st_mtime_ns, sqlite3.Binary(data), time.time()))
+                self.total_bytes += len(data) - (old[0] if old else 0)
+                self.touched.pop((file_path, thumb_size), None)
+                if self.total_bytes > self.max_bytes:
+                    # Evict by the real access order
+                    self._flush_touched()
+                    self._evict()
+                self.conn.commit()
+        except Exception as e:
+            print(f"Error caching thumbnail for {file_path}: {str(e)}")
+
+    def _flush_touched(self) -> None:
+        """Write the collected access times (caller holds the lock and commits)"""
+        if self.touched:
+            self.conn.executemany(
+                'UPDATE thumbnails SET last_used = ? WHERE path = ? AND thumb_size = ?',
+                [(last_used, path, thumb_size) for (path, thumb_size), last_used in self.touched.items()])
+            self.touched.clear()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache is at 90% of its cap"""
+        target = int(self.max_bytes * 0.9)
+        rows = self.conn.execute(
+            'SELECT rowid, LENGTH(data) FROM thumbnails ORDER BY last_used')
+        doomed = []
+        for rowid, size in rows:
+            if self.total_bytes <= target:
+                break
+            doomed.append((rowid,))
+            self.total_bytes -= size
+        self.conn.executemany('DELETE FROM thumbnails WHERE rowid = ?', doomed)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'size_mb': round(self.total_bytes / (1024 * 1024), 2),
+        }
+
+    def close(self) -> None:
+        with self.lock:
+            try:
+                self._flush_touched()
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error saving thumbnail access times: {str(e)}")
+            self.conn.close()
+
+# Thumbnail job priorities, most urgent first
+PRIORITY_VISIBLE = 0
+PRIORITY_OFFSCREEN = 1
+PRIORITY_PREFETCH = 2
+
+class ThumbnailScheduler:
+    """Prioritized, cancellable worker pool for thumbnail jobs.
+
+    Jobs wait in a heap ordered by priority (visible cells, then offscreen
+    cells, then prefetch) and submission order. Every job belongs to the
+    generation that was current when it was submitted; advance() starts a
+    new one (the grid does so per folder), and jobs of older generations
+    are dropped when they reach the top of the heap instead of being run.
+    A job submitted with a key replaces a queued job with the same key if
+    it is more urgent. Prefetch jobs never occupy more than
+    background_limit workers, so a visible request always finds one free.
+    """
+
+    def __init__(self, workers: int = 4, background_limit: int = None):
+        self.workers = max(1, int(workers))
+        if background_limit is None:
+            background_limit = max(1, self.workers - 1)
+        self.background_limit = background_limit
+        self.cond = threading.Condition()
+        self.heap = []
+        self.queued = {}          # key -> heap entry
+        self.sequence = itertools.count()
+        self.generation = 0
+        self.running_background = 0
+        self.closed = False
+        self.stats = {'submitted': 0, 'run': 0, 'dropped': 0, 'promoted': 0}
+        self.threads = [threading.Thread(target=self.worker, daemon=True)
+                        for _ in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def advance(self) -> int:
+        """Start a new generation; queued jobs of earlier ones will not run"""
+        with self.cond:
+            self.generation += 1
+            return self.generation
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self.generation
+
+    def submit(self, function, *args, priority: int = PRIORITY_VISIBLE, key=None,
+               generation: int = None) -> bool:
+        """Queue function(*args); returns False if an equally urgent job with key is queued"""
+        with self.cond:
+            if self.closed:
+                return False
+            if generation is None:
+                generation = self.generation
+            if key is not None:
+                existing = self.queued.get(key)
+                if existing is not None and not existing[6]:
+                    if existing[0] <= priority and existing[2] == generation:
+                        return False
+                    existing[6] = True
+                    if existing[2] == generation:
+                        self.stats['promoted'] += 1
+            # [priority, sequence, generation, key, function, args, cancelled]
+            entry = [priority, next(self.sequence), generation, key, function, args, False]
+            if key is not None:
+                self.queued[key] = entry
+            heapq.heappush(self.heap, entry)
+            self.stats['submitted'] += 1
+            self.cond.notify()
+            return True
+
+    def promote(self, key, priority: int) -> bool:
+        """Move a queued job up to priority; False if it is not queued (any more)"""
+        with self.cond:
+            entry = self.queued.get(key)
+            if entry is None or entry[6] or entry[0] <= priority:
+                return False
+        return self.submit(entry[4], *entry[5], priority=priority, key=key, generation=entry[2])
+
+    def _next_entry(self):
+        # Called with cond held
+        while self.heap:
+            entry = self.heap[0]
+            if entry[6] or entry[2] != self.generation:
+                heapq.heappop(self.heap)
+                if not entry[6]:
+                    self.stats['dropped'] += 1
+                    self._forget(entry)
+                continue
+            if entry[0] >= PRIORITY_PREFETCH and self.running_background >= self.background_limit:
+                return None
+            heapq.heappop(self.heap)
+            self._forget(entry)
+            return entry
+        return None
+
+    def _forget(self, entry) -> None:
+        if entry[3] is not None and self.queued.get(entry[3]) is entry:
+            del self.queued[entry[3]]
+
+    def worker(self):
+        while True:
+            with self.cond:
+                entry = self._next_entry()
+                while entry is None:
+                    if self.closed:
+                        return
+                    self.cond.wait()
+                    entry = self._next_entry()
+                background = entry[0] >= PRIORITY_PREFETCH
+                if background:
+                    self.running_background += 1
+            try:
+                entry[4](*entry[5])
+            except Exception as e:
+                print(f"Error in thumbnail job: {str(e)}")
+            finally:
+                with self.cond:
+                    self.stats['run'] += 1
+                    if background:
+                        self.running_background -= 1
+                        self.cond.notify()
+
+    def pending(self) -> int:
+        with self.cond:
+            return len(self.heap)
+
+    def shutdown(self) -> None:
+        """Drop queued jobs and stop the workers once their current job ends"""
+        with self.cond:
+            self.closed = True
+            self.heap = []
+            self.queued = {}
+            self.cond.notify_all()
+
+class ThumbnailGrid(ttk.Frame):
+    def __init__(self, parent, cache_path=None, cache_max_mb=512, virtual=False,
+                 workers=4, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.thumbnail_size = 200
+        self.padding = 10
+        self.thumbnails = []
+        self.photo_references = collections.OrderedDict()  # Changed to dict to track by filepath
+        
+        # Virtual mode: a recycled pool of cells bound to file indices as the
+        # canvas scrolls, instead of one frame per file
+        self.virtual = virtual
+        self.files = []
+        self.cells = []
+        self.columns = 1
+        self.label_height = 40
+        self.overscan_rows = 1
+        self.wanted_paths = set()
+        self.requested_paths = set()
+        # Video path -> sidecar preview image, set per folder by the caller
+        self.video_previews = {}
+        
+        # Decode timings per tier, slowest files and errors (see telemetry_report)
+        self.telemetry = Telemetry()
+        
+        # Persistent thumbnail cache; the grid still works without it
+        try:
+            self.thumbnail_cache = ThumbnailCache(cache_path, cache_max_mb)
+        except Exception as e:
+            self.telemetry.error(f"Thumbnail cache disabled: {str(e)}")
+            self.thumbnail_cache = None
+        
+        # Prioritized worker pool for background loading; decoded images
+        # come back through a queue and are applied in batches on the
+        # main thread every update_interval_ms
+        self.scheduler = ThumbnailScheduler(workers)
+        self.pending_thumbnails = {}
+        self.thumbnail_updates = Queue()
+        self.update_interval_ms = 30
+        self.max_updates_per_frame = 64
+        # Optional FolderPrefetcher holding thumbnails decoded ahead of time
+        self.prefetcher = None
+        
+        # rawpy and pywin32 are optional and slow to import, so they are
+        # only probed the first time a thumbnail needs them (None = not yet)
+        self.has_rawpy = None
+        self.has_shell = None
+        self.optional_import_lock = threading.Lock()
+        
+        # Which decode path produced each thumbnail ('cache', 'exif', 'draft',
+        # 'full', 'raw_embedded', 'sidecar', 'container', 'windows'); count
+        # and time per path go to the 'thumbnail.<tier>' telemetry timers
+        self.thumbnail_sources = {}
+        self.tier_lock = threading.Lock()
+        # An EXIF preview is used when it is at least this fraction of
+        # thumbnail_size (cameras typically embed 160x120)
+        self.exif_min_scale = 0.75
+        
+        # Define file type icons
+        self.file_icons = {
+            'image': '📷',
+            'video': '🎥',
+            'raw': '📸',
+            'unknown': '📄'
+        }
+        
+        # Define file extensions for each type
+        self.file_types = {
+            'image': {'.jpg', '.jpeg', '.png', '.gif', '.bmp'},
+            'video': {'.mp4', '.mov', '.avi', '.mts', '.m2ts', '.mxf', '.braw'},
+            'raw': {'.cr2', '.cr3', '.nef', '.arw', '.raw', '.dng'}
+        }
+        self.thumbnail_types = self.file_types['image'] | self.file_types['raw'] | self.file_types['video']
+        
+        self.create_widgets()
+        self.update_job = self.after(self.update_interval_ms, self.apply_thumbnail_updates)
+
+    def create_widgets(self):
+        """Create and setup the UI elements"""
+        # Create canvas with scrollbar
+        self.canvas = Canvas(self, bg='white')
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
+        self.scrollable_frame = ttk.Frame(self.canvas)
+
+        if self.virtual:
+            # Cells are placed directly on the canvas; re-bind them whenever
+            # the view moves or the canvas is resized
+            self.canvas.configure(yscrollcommand=self.on_canvas_scroll,
+                                  yscrollincrement=20)
+            self.canvas.bind("<Configure>", self.layout_cells)
+        else:
+            # Configure canvas
+            self.scrollable_frame.bind(
+                "<Configure>",
+                lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+            )
+            
+            # Create scrollable window
+            self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
+            self.canvas.configure(yscrollcommand=self.scrollbar.set)
+
+        # Pack scrollbar and canvas
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        # Bind mousewheel
+        self.bind_mousewheel()
+
+    def bind_mousewheel(self):
+        def _on_mousewheel(event):
+            self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        self.canvas.bind_all("<MouseWheel>", _on_mousewheel)
+
+    def load_rawpy(self):
+        """Import rawpy on first use; returns whether it is available"""
+        if self.has_rawpy is None:
+            with self.optional_import_lock:
+                if self.has_rawpy is None:
+                    try:
+                        import rawpy
+                        self.rawpy = rawpy
+                        self.has_rawpy = True
+                    except ImportError:
+                        print("rawpy not found. Install with: pip install rawpy")
+                        self.has_rawpy = False
+        return self.has_rawpy
+
+    def load_shell(self):
+        """Import the pywin32 shell modules on first use (Windows only)"""
+        if self.has_shell is None:
+            with self.optional_import_lock:
+                if self.has_shell is None:
+                    self.has_shell = False
+                    if os.name == 'nt':
+                        try:
+                            import win32com.client
+                            import win32gui
+                            import win32con
+                            import win32ui
+                            from win32com.shell import shell, shellcon
+                            
+                            self.win32gui = win32gui
+                            self.win32con = win32con
+                            self.win32ui = win32ui
+                            self.shell = shell
+                            self.shellcon = shellcon
+                            self.has_shell = True
+                        except ImportError:
+                            print("pywin32 not found. Install with: pip install pywin32")
+        return self.has_shell
+
+    def get_windows_thumbnail(self, file_path):
+        """Try to get thumbnail using Windows Shell"""
+        try:
+            if not self.load_shell():
+                return None
+
+            start = time.perf_counter()
+            # Get shell folder and file info
+            flags = self.shellcon.SHGFI_ICON | self.shellcon.SHGFI_LARGEICON | self.shellcon.SHGFI_USEFILEATTRIBUTES
+            file_info = self.shell.SHGetFileInfo(file_path, 0, flags)
+            
+            if not file_info or not file_info[0] or not file_info[0].hIcon:
+                return None
+
+            # Extract icon
+            hicon = file_info[0].hIcon
+            
+            # Create a device context and bitmap
+            dc = self.win32ui.CreateDCFromHandle(self.win32gui.GetDC(0))
+            memdc = dc.CreateCompatibleDC()
+            bitmap = self.win32ui.CreateBitmap()
+            bitmap.CreateCompatibleBitmap(dc, self.thumbnail_size, self.thumbnail_size)
+            memdc.SelectObject(bitmap)
+            
+            # Draw icon on bitmap
+            memdc.FillSolidRect((0, 0, self.thumbnail_size, self.thumbnail_size), 0xFFFFFF)
+            self.win32gui.DrawIconEx(
+                memdc.GetHandleOutput(), 
+                0, 0, hicon, 
+                self.thumbnail_size, self.thumbnail_size, 
+                0, None, 0x0003
+            )
+            
+            # Convert to PIL Image
+            bmpstr = bitmap.GetBitmapBits(True)
+            img = Image.frombuffer(
+                'RGBA',
+                (self.thumbnail_size, self.thumbnail_size),
+                bmpstr, 'raw', 'BGRA', 0, 1
+            )
+            
+            # Clean up
+            self.win32gui.DestroyIcon(hicon)
+            bitmap.DeleteObject()
+            memdc.DeleteDC()
+            dc.DeleteDC()
+            
+            self.record_thumbnail_tier(file_path, 'windows', time.perf_counter() - start)
+            return img
+
+        except Exception as e:
+            self.telemetry.error(f"Error getting Windows thumbnail for {file_path}: {str(e)}")
+            return None
+
+    def get_cached_thumbnail(self, file_path):
+        """Look up a previously decoded thumbnail in the persistent cache"""
+        if not self.thumbnail_cache:
+            return None
+        img = self.thumbnail_cache.get(file_path, self.thumbnail_size)
+        if img is not None:
+            self.record_thumbnail_tier(file_path, 'cache', 0.0)
+        return img
+
+    def cache_thumbnail(self, file_path, img):
+        """Store a decoded thumbnail in the persistent cache"""
+        if self.thumbnail_cache and img is not None:
+            self.thumbnail_cache.put(file_path, self.thumbnail_size, img)
+        return img
+
+    def record_thumbnail_tier(self, file_path, tier, seconds):
+        """Remember which decode path produced a thumbnail and how long it took"""
+        with self.tier_lock:
+            self.thumbnail_sources[file_path] = tier
+        # Cache hits are not timed, so they are no candidates for slowest files
+        self.telemetry.record(timings={f'thumbnail.{tier}': seconds},
+                              label=None if tier == 'cache' else file_path)
+
+    def thumbnail_tier_stats(self):
+        """Thumbnails produced per decode path with their average time"""
+        timers = self.telemetry.report()['timers']
+        return {
+            name.split('.', 1)[1]: {'count': timer['count'], 'avg_ms': timer['mean_ms']}
+            for name, timer in timers.items() if name.startswith('thumbnail.')
+        }
+
+    def telemetry_report(self):
+        """Telemetry report with the cache, scheduler and prefetch counters added"""
+        report = self.telemetry.report()
+        counters = report['counters']
+        for prefix, stats in (('cache', self.cache_stats()), ('jobs', self.scheduler.stats),
+                              ('prefetch', self.prefetcher and self.prefetcher.stats)):
+            for name, value in (stats or {}).items():
+                if isinstance(value, int):
+                    counters[f'{prefix}_{name}'] = value
+        report['counters'] = dict(sorted(counters.items()))
+        return report
+
+    def get_embedded_thumbnail(self, file_path):
+        """Try to extract embedded JPEG thumbnail from RAW file"""
+        cached = self.get_cached_thumbnail(file_path)
+        if cached:
+            return cached
+        try:
+            if not self.load_rawpy():
+                return None
+
+            start = time.perf_counter()
+            with self.rawpy.imread(file_path) as raw:
+                try:
+                    thumb = raw.extract_thumb()
+                    if thumb.format == self.rawpy.ThumbFormat.JPEG:
+                        img = Image.open(BytesIO(thumb.data))
+                        img.draft(None, (self.thumbnail_size, self.thumbnail_size))
+                        img.thumbnail((self.thumbnail_size, self.thumbnail_size))
+                        self.record_thumbnail_tier(file_path, 'raw_embedded', time.perf_counter() - start)
+                        return self.cache_thumbnail(file_path, img.copy())
+                except:
+                    return None
+        except Exception as e:
+            self.telemetry.error(f"Error extracting thumbnail from {file_path}: {str(e)}")
+        return None
+
+    def get_exif_thumbnail(self, img):
+        """Decode the EXIF preview of an opened JPEG if it is large enough"""
+        data = exif_thumbnail_bytes(img.info.get('exif'))
+        if data is None:
+            return None
+        try:
+            thumb = Image.open(BytesIO(data))
+            if max(thumb.size) < self.thumbnail_size * self.exif_min_scale:
+                return None
+            thumb.thumbnail((self.thumbnail_size, self.thumbnail_size))
+            return thumb.convert('RGB') if thumb.mode not in ('RGB', 'L') else thumb
+        except Exception:
+            return None
+
+    def decode_thumbnail(self, source):
+        """Shrink an image file or buffer to thumbnail_size; returns (image, tier).
+
+        JPEGs try the EXIF preview first (it sits in the header PIL has
+        already parsed), then DCT-domain draft decoding at the smallest
+        1/2, 1/4 or 1/8 scale that still covers the thumbnail, and only
+        then a full decode. Other formats are decoded in full.
+        """
+        with Image.open(source) as img:
+            if img.format == 'JPEG':
+                thumb = self.get_exif_thumbnail(img)
+                if thumb is not None:
+                    return thumb, 'exif'
+                full_size = img.size
+                img.draft(None, (self.thumbnail_size, self.thumbnail_size))
+                tier = 'draft' if img.size != full_size else 'full'
+            else:
+                tier = 'full'
+            img.thumbnail((self.thumbnail_size, self.thumbnail_size))
+            return img.copy(), tier
+
+    def get_pil_thumbnail(self, file_path):
+        """Create thumbnail from an image file with the cheapest decode that works"""
+        cached = self.get_cached_thumbnail(file_path)
+        if cached:
+            return cached
+        start = time.perf_counter()
+        try:
+            thumb, tier = self.decode_thumbnail(file_path)
+            self.record_thumbnail_tier(file_path, tier, time.perf_counter() - start)
+            return self.cache_thumbnail(file_path, thumb)
+        except Exception as e:
+            self.telemetry.error(f"Error creating PIL thumbnail for {file_path}: {str(e)}")
+            return None
+
+    def get_video_thumbnail(self, file_path):
+        """Thumbnail for a clip from its sidecar preview or embedded cover art.
+
+        Nothing is decoded from the video stream itself: a clip with neither
+        a sidecar (see add_preview_candidates) nor a preview box keeps its
+        icon.
+        """
+        cached = self.get_cached_thumbnail(file_path)
+        if cached:
+            return cached
+        start = time.perf_counter()
+        sidecar = self.video_previews.get(file_path)
+        try:
+            if sidecar:
+                thumb, _ = self.decode_thumbnail(sidecar)
+                tier = 'sidecar'
+            else:
+                data = container_preview_bytes(file_path)
+                if data is None:
+                    return None
+                thumb, _ = self.decode_thumbnail(BytesIO(data))
+                tier = 'container'
+            self.record_thumbnail_tier(file_path, tier, time.perf_counter() - start)
+            return self.cache_thumbnail(file_path, thumb)
+        except Exception as e:
+            self.telemetry.error(f"Error creating video thumbnail for {file_path}: {str(e)}")
+            return None
+
+    def cache_stats(self):
+        """Hit/miss counters of the persistent thumbnail cache (None if disabled)"""
+        if not self.thumbnail_cache:
+            return None
+        return self.thumbnail_cache.stats()
+
+    def update_thumbnail(self, file_path, img):
+        """Update thumbnail in the UI from background thread"""
+        if file_path not in self.pending_thumbnails:
+            # Its cell was unbound meanwhile; request it again when rebound
+            self.requested_paths.discard(file_path)
+            return
+        
+        label = self.pending_thumbnails[file_path]
+        if not label.winfo_exists():
+            self.requested_paths.discard(file_path)
+            return
+            
+        try:
+            photo = ImageTk.PhotoImage(img)
+            self.photo_references[file_path] = photo
+            label.configure(image=photo)
+        except Exception as e:
+            self.telemetry.error(f"Error updating thumbnail for {file_path}: {str(e)}")
+
+    def apply_thumbnail_updates(self):
+        """Apply decoded thumbnails on the main thread, a bounded batch per tick"""
+        applied = 0
+        try:
+            while applied < self.max_updates_per_frame:
+                file_path, img = self.thumbnail_updates.get_nowait()
+                self.update_thumbnail(file_path, img)
+                applied += 1
+        except Empty:
+            pass
+        if applied and self.virtual:
+            self.trim_photo_references()
+        self.update_job = self.after(self.update_interval_ms, self.apply_thumbnail_updates)
+
+    def make_thumbnail(self, file_path):
+        """Decode a thumbnail for any supported file type (worker threads)"""
+        ext = os.path.splitext(file_path.lower())[1]
+        img = None
+        
+        # Try Windows thumbnail first for all files
+        img = self.get_windows_thumbnail(file_path)
+        
+        if not img:
+            # If Windows failed and it's a RAW file, try embedded JPEG
+            if ext in self.file_types['raw']:
+                img = self.get_embedded_thumbnail(file_path)
+            # For regular images, try PIL as last resort
+            elif ext in self.file_types['image']:
+                img = self.get_pil_thumbnail(file_path)
+            # Videos only get a sidecar or embedded preview, never a decode
+            elif ext in self.file_types['video']:
+                img = self.get_video_thumbnail(file_path)
+        return img
+
+    def submit_thumbnail(self, file_path, label, priority=PRIORITY_VISIBLE):
+        self.scheduler.submit(self.load_thumbnail_async, file_path, label,
+                              priority=priority, key=file_path)
+
+    def screenful(self):
+        """Number of thumbnails shown without scrolling"""
+        if self.virtual and self.cells:
+            return len(self.cells)
+        return 20
+
+    def load_thumbnail_async(self, file_path, label):
+        """Load thumbnail in background thread"""
+        if self.virtual and file_path not in self.wanted_paths:
+            # Scrolled out of range before a worker got to it
+            self.requested_paths.discard(file_path)
+            return
+        img = self.prefetcher.take(file_path) if self.prefetcher else None
+        if img is None:
+            img = self.make_thumbnail(file_path)
+                
+        if img:
+            # Applied on the main thread by apply_thumbnail_updates
+            self.thumbnail_updates.put((file_path, img))
+
+    def add_thumbnail(self, file_path, row, col, priority=PRIORITY_VISIBLE):
+        """Add a thumbnail or filename to the grid"""
+        try:
+            thumb_frame = ttk.Frame(self.scrollable_frame)
+            thumb_frame.grid(row=row, column=col, padx=5, pady=5)
+            
+            # Get file extension and type
+            ext = os.path.splitext(file_path.lower())[1]
+            
+            # Create placeholder with icon
+            icon = self.get_file_icon(ext)
+            
+            # Create label that will be updated with thumbnail
+            label = ttk.Label(thumb_frame, text=icon, font=('Arial', 24))
+            label.pack(pady=5)
+            
+            # Start background loading for images, raw files and videos
+            if ext in self.thumbnail_types:
+                self.pending_thumbnails[file_path] = label
+                self.submit_thumbnail(file_path, label, priority)
+            
+            # Show filename and extension
+            filename = os.path.basename(file_path)
+            name_label = ttk.Label(thumb_frame, 
+                                 text=f"{filename}\n{ext.upper()}",
+                                 wraplength=self.thumbnail_size)
+            name_label.pack()
+            
+        except Exception as e:
+            self.telemetry.error(f"Error creating thumbnail for {file_path}: {str(e)}")
+            
+    def get_file_icon(self, ext):
+        """Placeholder icon for a file extension"""
+        if ext in self.file_types['raw']:
+            return self.file_icons['raw']
+        elif ext in self.file_types['image']:
+            return self.file_icons['image']
+        elif ext in self.file_types['video']:
+            return self.file_icons['video']
+        return self.file_icons['unknown']
+
+    def set_files(self, file_list, video_previews=None):
+        """Show file_list in virtual mode; only cells near the viewport exist"""
+        self.clear()
+        self.files = list(file_list)
+        self.video_previews = video_previews or {}
+        self.canvas.yview_moveto(0)
+        self.layout_cells()
+
+    def cell_size(self):
+        return (self.thumbnail_size + 2 * self.padding,
+                self.thumbnail_size + self.label_height + 2 * self.padding)
+
+    def layout_cells(self, event=None):
+        """Size the scroll region and the cell pool to the canvas"""
+        if not self.virtual:
+            return
+        cell_width, cell_height = self.cell_size()
+        width = max(self.canvas.winfo_width(), cell_width)
+        height = max(self.canvas.winfo_height(), cell_height)
+        self.columns = max(1, width // cell_width)
+        rows = -(-len(self.files) // self.columns)
+        self.canvas.configure(scrollregion=(0, 0, self.columns * cell_width, rows * cell_height))
+        
+        # Pool covers the visible rows plus overscan above and below
+        visible_rows = height // cell_height + 1
+        pool_size = (visible_rows + 2 * self.overscan_rows) * self.columns
+        while len(self.cells) < pool_size:
+            self.cells.append(self.create_cell(cell_width, cell_height))
+        for cell in self.cells:
+            self.unbind_cell(cell)
+        self.refresh_cells()
+
+    def create_cell(self, cell_width, cell_height):
+        frame = ttk.Frame(self.canvas, width=cell_width, height=cell_height)
+        frame.pack_propagate(False)
+        icon_label = ttk.Label(frame, font=('Arial', 24), anchor='center')
+        icon_label.pack(pady=5)
+        name_label = ttk.Label(frame, wraplength=self.thumbnail_size, anchor='center')
+        name_label.pack()
+        window = self.canvas.create_window(0, 0, window=frame, anchor='nw',
+                                           width=cell_width, height=cell_height,
+                                           state='hidden')
+        return {'frame': frame, 'icon': icon_label, 'name': name_label,
+                'window': window, 'index': None, 'path': None}
+
+    def on_canvas_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.refresh_cells()
+
+    def refresh_cells(self):
+        """Bind pool cells to the file indices around the current view"""
+        if not self.virtual or not self.cells:
+            return
+        cell_width, cell_height = self.cell_size()
+        pool_size = len(self.cells)
+        top = self.canvas.canvasy(0)
+        first_row = max(0, int(top // cell_height) - self.overscan_rows)
+        first_index = first_row * self.columns
+        last_index = min(first_index + pool_size, len(self.files))
+        # Cells in the viewport itself decode before the overscan rows
+        first_visible = int(top // cell_height) * self.columns
+        last_visible = (int((top + self.canvas.winfo_height()) // cell_height) + 1) * self.columns
+        
+        # A cell keeps the index it had as long as it stays in range (index
+        # modulo pool size), so scrolling one row re-binds one row of cells
+        in_range = set()
+        wanted = set()
+        for index in range(first_index, last_index):
+            cell = self.cells[index % pool_size]
+            in_range.add(index % pool_size)
+            priority = (PRIORITY_VISIBLE if first_visible <= index < last_visible
+                        else PRIORITY_OFFSCREEN)
+            if cell['index'] != index:
+                self.bind_cell(cell, index, priority)
+                row, col = divmod(index, self.columns)
+                self.canvas.coords(cell['window'], col * cell_width, row * cell_height)
+                self.canvas.itemconfigure(cell['window'], state='normal')
+            elif priority == PRIORITY_VISIBLE:
+                # Queued as overscan, now scrolled into view
+                self.scheduler.promote(cell['path'], priority)
+            wanted.add(cell['path'])
+        for slot, cell in enumerate(self.cells):
+            if slot not in in_range and cell['index'] is not None:
+                self.unbind_cell(cell)
+        self.wanted_paths = wanted
+
+    def bind_cell(self, cell, index, priority=PRIORITY_VISIBLE):
+        """Point a pool cell at file_list[index] and request its thumbnail"""
+        self.unbind_cell(cell)
+        file_path = self.files[index]
+        ext = os.path.splitext(file_path.lower())[1]
+        cell['index'] = index
+        cell['path'] = file_path
+        cell['name'].configure(text=f"{os.path.basename(file_path)}\n{ext.upper()}")
+        
+        photo = self.photo_references.get(file_path)
+        if photo is not None:
+            self.photo_references.move_to_end(file_path)
+            cell['icon'].configure(image=photo, text='')
+        else:
+            cell['icon'].configure(image='', text=self.get_file_icon(ext))
+        
+        if ext in self.thumbnail_types:
+            self.pending_thumbnails[file_path] = cell['icon']
+            if photo is None and file_path not in self.requested_paths:
+                self.requested_paths.add(file_path)
+                self.wanted_paths.add(file_path)
+                self.submit_thumbnail(file_path, cell['icon'], priority)
+
+    def unbind_cell(self, cell):
+        if cell['path'] is not None:
+            self.pending_thumbnails.pop(cell['path'], None)
+        cell['index'] = None
+        cell['path'] = None
+        self.canvas.itemconfigure(cell['window'], state='hidden')
+
+    def trim_photo_references(self):
+        """Keep decoded images for about three pools' worth of cells"""
+        limit = max(3 * len(self.cells), 1)
+        if len(self.photo_references) <= limit:
+            return
+        for path in list(self.photo_references):
+            if len(self.photo_references) <= limit:
+                break
+            if path not in self.pending_thumbnails:
+                del self.photo_references[path]
+                self.requested_paths.discard(path)
+
+    def clear(self):
+        """Clear all thumbnails"""
+        # Queued jobs for the old contents are dropped before they start
+        self.scheduler.advance()
+        self.pending_thumbnails.clear()
+        self.photo_references.clear()
+        for widget in self.scrollable_frame.winfo_children():
+            widget.destroy()
+        self.thumbnails.clear()
+        self.files = []
+        self.wanted_paths = set()
+        self.requested_paths = set()
+        self.video_previews = {}
+        with self.tier_lock:
+            self.thumbnail_sources.clear()
+        for cell in self.cells:
+            self.unbind_cell(cell)
+
+    def destroy(self):
+        """Clean up resources when widget is destroyed"""
+        self.after_cancel(self.update_job)
+        self.scheduler.shutdown()
+        if self.prefetcher:
+            self.prefetcher.close()
+        if self.thumbnail_cache:
+            self.thumbnail_cache.close()
+        super().destroy()
+
+class FolderPrefetcher:
+    """Lists the folders next to the one on screen and decodes their first
+    screenful of thumbnails in the background.
+
+    The work runs as PRIORITY_PREFETCH jobs on the grid's scheduler, so it
+    only gets workers that visible and offscreen cells leave idle, and it
+    belongs to the scheduler generation of the folder it was started for:
+    opening another folder drops whatever had not started yet. Folders are
+    handled in the order given (most likely next first). Decoded images
+    are held in memory up to budget_mb (estimated from their pixel size);
+    once it is reached prefetching stops until images are taken or
+    dropped. They also land in the persistent thumbnail cache.
+    """
+
+    def __init__(self, grid, budget_mb: int = 64):
+        self.grid = grid
+        self.scheduler = grid.scheduler
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        self.listings = {}                         # folder path -> (file_list, video_previews)
+        self.images = {}                           # file path -> (folder path, image, bytes)
+        self.image_bytes = 0
+        self.stats = {'listing_hits': 0, 'image_hits': 0, 'decoded': 0, 'over_budget': 0}
+
+    def prefetch(self, folder_paths, screenful: int, keep=()) -> None:
+        """Prefetch folder_paths instead of the folders of earlier calls.
+
+        Images already prefetched for the folders in keep (the one just
+        opened) stay available to take().
+        """
+        folder_paths = list(folder_paths)
+        with self.lock:
+            wanted = set(folder_paths) | set(keep)
+            for folder_path in list(self.listings):
+                if folder_path not in wanted:
+                    del self.listings[folder_path]
+            for file_path, (folder_path, _, size) in list(self.images.items()):
+                if folder_path not in wanted:
+                    del self.images[file_path]
+                    self.image_bytes -= size
+        if folder_paths:
+            self.scheduler.submit(self.prefetch_folder, self.scheduler.generation,
+                                  folder_paths, screenful, priority=PRIORITY_PREFETCH)
+
+    def take_listing(self, folder_path):
+        """Prefetched (file_list, video_previews) of a folder, or None"""
+        with self.lock:
+            listing = self.listings.get(folder_path)
+            if listing is not None:
+                self.stats['listing_hits'] += 1
+            return listing
+
+    def take(self, file_path):
+        """Hand over a prefetched thumbnail (it leaves the prefetch budget)"""
+        with self.lock:
+            entry = self.images.pop(file_path, None)
+            if entry is None:
+                return None
+            self.image_bytes -= entry[2]
+            self.stats['image_hits'] += 1
+            return entry[1]
+
+    def close(self) -> None:
+        with self.lock:
+            self.listings.clear()
+            self.images.clear()
+            self.image_bytes = 0
+
+    def prefetch_folder(self, generation: int, folder_paths, screenful: int) -> None:
+        """List the first folder, queue its thumbnails, then chain to the next folder"""
+        folder_path = folder_paths[0]
+        with self.lock:
+            listing = self.listings.get(folder_path)
+        if listing is None:
+            listing = list_media_files(folder_path, self.grid.file_types)
+            with self.lock:
+                if not self.scheduler.is_current(generation):
+                    return
+                self.listings[folder_path] = listing
+        
+        for file_path in listing[0][:screenful]:
+            if os.path.splitext(file_path.lower())[1] in self.grid.thumbnail_types:
+                self.scheduler.submit(self.prefetch_thumbnail, generation, folder_path, file_path,
+                                      priority=PRIORITY_PREFETCH, key=('prefetch', file_path),
+                                      generation=generation)
+        if len(folder_paths) > 1:
+            self.scheduler.submit(self.prefetch_folder, generation, folder_paths[1:], screenful,
+                                  priority=PRIORITY_PREFETCH, generation=generation)
+
+    def prefetch_thumbnail(self, generation: int, folder_path: str, file_path: str) -> None:
+        with self.lock:
+            if file_path in self.images or self.image_bytes >= self.budget_bytes:
+                return
+        img = self.grid.make_thumbnail(file_path)
+        if img is None:
+            return
+        size = img.width * img.height * len(img.getbands())
+        with self.lock:
+            if not self.scheduler.is_current(generation):
+                return
+            if self.image_bytes + size > self.budget_bytes:
+                # Folders are in order of likelihood: keep what the
+                # earlier ones got rather than evicting it
+                self.stats['over_budget'] += 1
+                return
+            self.images[file_path] = (folder_path, img, size)
+            self.image_bytes += size
+            self.stats['decoded'] += 1
+
+class MediaManager:
+    # Filter choice that leaves a column unfiltered
+    ALL = 'All'
+    STATUS_FILTERS = {'All': None, 'Unmarked': False, 'Marked': True}
+
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Media Manager")
+        self.root.geometry("1400x900")
+        
+        self.current_folder_index = 0
+        self.file_list = []
+        self.status_var = tk.StringVar()
+        self.progress_var = tk.DoubleVar()
+        self.progress_text_var = tk.StringVar()
+        self.progress_events = Queue()
+        self.progress_frame_ms = 100
+        self.scan_workers_var = tk.IntVar(value=4)
+        # Thumbnail decoding is CPU bound: about one worker per core
+        self.thumbnail_workers = max(2, min(8, os.cpu_count() or 4))
+        self.stream_output_var = tk.BooleanVar(value=False)
+        self.compact_output_var = tk.BooleanVar(value=False)
+        self.find_duplicates_var = tk.BooleanVar(value=False)
+        self.disk_usage_var = tk.BooleanVar(value=False)
+        self.marks = None
+        self.scan_index = None
+        self.watch_var = tk.BooleanVar(value=False)
+        self.watcher = None
+        self.watch_events = Queue()
+        # Folder list rows (text, tag) by folder index, and their size total
+        self.folder_rows = {}
+        self.total_size_mb = 0
+        # Columnar index of the loaded scan, and the sorted/filtered folder
+        # indexes shown in the list (None: every folder in scan order)
+        self.folder_table = None
+        self.folder_view = None
+        self.folder_positions = None
+        self.sort_var = tk.StringVar(value='path')
+        self.sort_descending_var = tk.BooleanVar(value=False)
+        self.filter_project_var = tk.StringVar(value=self.ALL)
+        self.filter_extension_var = tk.StringVar(value=self.ALL)
+        self.filter_status_var = tk.StringVar(value=self.ALL)
+        self.filter_older_var = tk.StringVar()
+        self.filter_min_size_var = tk.StringVar()
+        self.cache_stats_var = tk.StringVar()
+        self.scanning = False
+        self.scanner = None
+        self.stats_window = None
+        
+        self.setup_ui()
+        self.refresh_cache_stats()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def setup_ui(self):
+        # Main container
+        self.main_frame = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
+        self.main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        # Left panel for folder list
+        self.folder_list_frame = ttk.Frame(self.main_frame)
+        self.main_frame.add(self.folder_list_frame, weight=1)
+
+        # Center panel container
+        self.center_container = ttk.Frame(self.main_frame)
+        self.main_frame.add(self.center_container, weight=3)
+
+        # Right panel for JSON data
+        self.right_panel = ttk.Frame(self.main_frame)
+        self.main_frame.add(self.right_panel, weight=1)
+
+        # Setup folder list (left panel)
+        # Add total size label at the top of folder list
+        self.total_size_var = tk.StringVar(value="Total Size: 0 GB")
+        total_size_label = ttk.Label(self.folder_list_frame, 
+                                   textvariable=self.total_size_var,
+                                   font=('Arial', 10))
+        total_size_label.pack(pady=(0, 5), padx=5, anchor='w')
+
+        folder_list_label = ttk.Label(self.folder_list_frame, text="Folders", font=('Arial', 11, 'bold'))
+        folder_list_label.pack(pady=5, padx=5, anchor='w')
+        self.setup_view_controls()
+
+        self.folder_list = ttk.Treeview(self.folder_list_frame, selectmode='browse', show='tree')
+        folder_list_scroll = ttk.Scrollbar(self.folder_list_frame, orient="vertical", command=self.folder_list.yview)
+        self.folder_list.configure(yscrollcommand=folder_list_scroll.set)
+
+        folder_list_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.folder_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
+        self.folder_list.bind('<<TreeviewSelect>>', self.on_folder_select)
+
+        # Setup JSON display (right panel)
+        json_label = ttk.Label(self.right_panel, text="Folder Data:", font=('Arial', 11, 'bold'))
+        json_label.pack(pady=5, padx=5, anchor='w')
+        
+        json_frame = ttk.Frame(self.right_panel)
+        json_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        self.json_text = tk.Text(json_frame, wrap=tk.WORD, width=40)
+        json_scrollbar = ttk.Scrollbar(json_frame, command=self.json_text.yview)
+        self.json_text.configure(yscrollcommand=json_scrollbar.set)
+        
+        json_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.json_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        # Create both frames in center container
+        self.setup_scan_frame()
+        self.setup_viewer_frame()
+        
+        # Initially show scan frame
+        self.show_scan_frame()
+
+    def setup_view_controls(self):
+        """Sort and filter controls above the folder list, answered by the FolderTable"""
+        controls = ttk.Frame(self.folder_list_frame)
+        controls.pack(fill=tk.X, padx=5, pady=(0, 5))
+        controls.columnconfigure(1, weight=1)
+        controls.columnconfigure(3, weight=1)
+
+        ttk.Label(controls, text="Sort:").grid(row=0, column=0, sticky='w')
+        sort = ttk.Combobox(controls, textvariable=self.sort_var, values=FolderTable.SORT_KEYS,
+                            state='readonly', width=10)
+        sort.grid(row=0, column=1, sticky='ew', padx=2)
+        ttk.Checkbutton(controls, text="Descending", variable=self.sort_descending_var,
+                        command=self.apply_folder_view).grid(row=0, column=2, columnspan=2, sticky='w')
+
+        ttk.Label(controls, text="Project:").grid(row=1, column=0, sticky='w')
+        self.project_filter = ttk.Combobox(controls, textvariable=self.filter_project_var,
+                                           values=(self.ALL,), state='readonly', width=16)
+        self.project_filter.grid(row=1, column=1, columnspan=3, sticky='ew', padx=2, pady=2)
+
+        ttk.Label(controls, text="Status:").grid(row=2, column=0, sticky='w')
+        status = ttk.Combobox(controls, textvariable=self.filter_status_var,
+                              values=tuple(self.STATUS_FILTERS), state='readonly', width=10)
+        status.grid(row=2, column=1, sticky='ew', padx=2)
+        ttk.Label(controls, text="Ext:").grid(row=2, column=2, sticky='w')
+        self.extension_filter = ttk.Combobox(controls, textvariable=self.filter_extension_var,
+                                             values=(self.ALL,), state='readonly', width=6)
+        self.extension_filter.grid(row=2, column=3, sticky='ew', padx=2)
+
+        ttk.Label(controls, text="Older than (days):").grid(row=3, column=0, columnspan=2, sticky='w')
+        older = ttk.Entry(controls, textvariable=self.filter_older_var, width=6)
+        older.grid(row=3, column=2, columnspan=2, sticky='ew', padx=2, pady=2)
+        ttk.Label(controls, text="Min size (MB):").grid(row=4, column=0, columnspan=2, sticky='w')
+        min_size = ttk.Entry(controls, textvariable=self.filter_min_size_var, width=6)
+        min_size.grid(row=4, column=2, columnspan=2, sticky='ew', padx=2)
+        ttk.Button(controls, text="Reset", command=self.reset_folder_view).grid(
+            row=5, column=0, columnspan=4, sticky='e', pady=2)
+
+        for combobox in (sort, self.project_filter, status, self.extension_filter):
+            combobox.bind('<<ComboboxSelected>>', lambda event: self.apply_folder_view())
+        for entry in (older, min_size):
+            entry.bind('<Return>', lambda event: self.apply_folder_view())
+
+    def setup_scan_frame(self):
+        """Create the scan frame"""
+        self.scan_frame = ttk.Frame(self.center_container)
+        
+        scan_label = ttk.Label(self.scan_frame, 
+                             text="Select a folder to scan or load existing scan",
+                             font=('Arial', 12))
+        scan_label.pack(pady=20)
+        
+        button_frame = ttk.Frame(self.scan_frame)
+        button_frame.pack(pady=10)
+        
+        ttk.Button(button_frame, text="New Scan", 
+                  command=self.select_folder).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Scan Several Folders", 
+                  command=self.select_folders).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Load Existing Scan", 
+                  command=self.load_existing_scan).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Rescan Existing", 
+                  command=self.rescan_existing).pack(side=tk.LEFT, padx=5)
+        
+        options_frame = ttk.Frame(self.scan_frame)
+        options_frame.pack(pady=5)
+        
+        # Parallel listing mostly helps on network shares (SMB/NFS)
+        ttk.Label(options_frame, text="Scan workers:").pack(side=tk.LEFT)
+        ttk.Spinbox(options_frame, from_=1, to=64, width=4,
+                    textvariable=self.scan_workers_var).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(options_frame, text="Stream results (NDJSON)",
+                        variable=self.stream_output_var).pack(side=tk.LEFT, padx=10)
+        ttk.Checkbutton(options_frame, text="Compact file (.mscan)",
+                        variable=self.compact_output_var).pack(side=tk.LEFT, padx=10)
+        ttk.Checkbutton(options_frame, text="Find duplicates",
+                        variable=self.find_duplicates_var).pack(side=tk.LEFT, padx=10)
+        ttk.Checkbutton(options_frame, text="Disk usage (hardlinks)",
+                        variable=self.disk_usage_var).pack(side=tk.LEFT, padx=10)
+        
+        self.progress_bar = ttk.Progressbar(self.scan_frame, 
+                                          variable=self.progress_var,
+                                          mode='determinate')
+        self.progress_bar.pack(fill=tk.X, padx=50, pady=10)
+        
+        ttk.Label(self.scan_frame, textvariable=self.progress_text_var).pack(pady=5)
+
+    def setup_viewer_frame(self):
+        """Create the viewer frame"""
+        self.viewer_frame = ttk.Frame(self.center_container)
+        
+        nav_frame = ttk.Frame(self.viewer_frame)
+        nav_frame.pack(fill=tk.X, pady=(0, 10))
+
+        ttk.Button(nav_frame, text="Previous Folder", command=self.prev_folder).pack(side=tk.LEFT)
+        ttk.Button(nav_frame, text="Next Folder", command=self.next_folder).pack(side=tk.LEFT, padx=5)
+        ttk.Button(nav_frame, text="New Scan", command=self.new_scan).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(nav_frame, text="Watch for changes", variable=self.watch_var,
+                        command=self.toggle_watch).pack(side=tk.LEFT, padx=5)
+        
+        info_frame = ttk.Frame(self.viewer_frame)
+        info_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.folder_info = ttk.Label(info_frame, text="", wraplength=1300)
+        self.folder_info.pack(fill=tk.X)
+
+        self.thumbnail_grid = ThumbnailGrid(self.viewer_frame, virtual=True,
+                                            workers=self.thumbnail_workers)
+        self.thumbnail_grid.pack(fill=tk.BOTH, expand=True)
+        self.prefetcher = FolderPrefetcher(self.thumbnail_grid)
+        self.thumbnail_grid.prefetcher = self.prefetcher
+        
+        control_frame = ttk.Frame(self.viewer_frame)
+        control_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        ttk.Button(control_frame, text="Mark for Deletion", 
+                  command=self.mark_deletion).pack(side=tk.LEFT)
+        ttk.Button(control_frame, text="Mark as Keep", 
+                  command=self.mark_keep).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="Open Folder", 
+                  command=self.open_folder).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="Statistics", 
+                  command=self.show_statistics).pack(side=tk.LEFT, padx=5)
+        
+        self.status_label = ttk.Label(control_frame, textvariable=self.status_var)
+        self.status_label.pack(side=tk.RIGHT)
+        
+        self.cache_stats_label = ttk.Label(control_frame, textvariable=self.cache_stats_var)
+        self.cache_stats_label.pack(side=tk.RIGHT, padx=10)
+
+    def refresh_cache_stats(self):
+        """Show thumbnail cache hit/miss counts and decode paths, refreshed once a second"""
+        stats = self.thumbnail_grid.cache_stats()
+        text = ''
+        if stats:
+            text = (f"Thumbnail cache: {stats['hits']} hits / "
+                    f"{stats['misses']} misses ({stats['size_mb']:.1f} MB)")
+        tiers = self.thumbnail_grid.thumbnail_tier_stats()
+        decoded = ', '.join(f"{tier} {counts['count']} ({counts['avg_ms']:.0f} ms)"
+                            for tier, counts in sorted(tiers.items()) if tier != 'cache')
+        if decoded:
+            text = f"{text}  |  Decoded: {decoded}" if text else f"Decoded: {decoded}"
+        prefetch = self.prefetcher.stats
+        if prefetch['decoded']:
+            text += (f"  |  Prefetched: {prefetch['decoded']}, used {prefetch['image_hits']} "
+                     f"({self.prefetcher.image_bytes / (1024 * 1024):.0f} MB held)")
+        if text:
+            self.cache_stats_var.set(text)
+        self.root.after(1000, self.refresh_cache_stats)
+
+    def show_statistics(self):
+        """Open (or raise) a window with live scan and thumbnail telemetry"""
+        if self.stats_window is not None and self.stats_window.winfo_exists():
+            self.stats_window.lift()
+            return
+        self.stats_window = tk.Toplevel(self.root)
+        self.stats_window.title("Statistics")
+        self.stats_window.geometry("900x600")
+        self.stats_text = tk.Text(self.stats_window, wrap=tk.NONE, font=('Courier', 9))
+        self.stats_text.pack(fill=tk.BOTH, expand=True)
+        self.refresh_statistics()
+
+    def refresh_statistics(self):
+        if self.stats_window is None or not self.stats_window.winfo_exists():
+            self.stats_window = None
+            return
+        # A running scan reports live; otherwise show the block saved with the scan
+        if self.scanning and self.scanner is not None:
+            scan_report = self.scanner.telemetry.report()
+        else:
+            scan_report = getattr(self, 'data', None) and self.data.get('telemetry')
+        text = "Scan\n" + (format_telemetry(scan_report, slowest=10) if scan_report else "no telemetry")
+        text += "\n\nThumbnails\n" + format_telemetry(self.thumbnail_grid.telemetry_report(), slowest=10)
+        view = self.stats_text.yview()
+        self.stats_text.delete(1.0, tk.END)
+        self.stats_text.insert(tk.END, text)
+        self.stats_text.yview_moveto(view[0])
+        self.root.after(1000, self.refresh_statistics)
+
+    def show_scan_frame(self):
+        """Switch to scan frame"""
+        self.viewer_frame.pack_forget()
+        self.scan_frame.pack(fill=tk.BOTH, expand=True)
+        self.progress_var.set(0)
+        
+    def show_viewer_frame(self):
+        """Switch to viewer frame"""
+        self.scan_frame.pack_forget()
+        self.viewer_frame.pack(fill=tk.BOTH, expand=True)
+
+    def update_folder_list(self):
+        """Rebuild the folder list from current data.
+
+        Only needed when the folder order changes (a scan is opened, sorted
+        or filtered). Rows use the folder index as item id, so navigation
+        and marks update single rows through refresh_folder_row.
+        """
+        self.folder_list.delete(*self.folder_list.get_children())
+        self.folder_rows = {}
+        self.total_size_mb = 0
+        
+        if hasattr(self, 'data') and self.data.get('folders'):
+            self.append_folder_rows(self.visible_folders())
+
+            # Configure tag colors
+            self.folder_list.tag_configure('marked', foreground='red')
+
+            # Select current folder
+            if self.current_folder_index in self.folder_rows:
+                self.select_folder_row(self.current_folder_index)
+        else:
+            self.total_size_var.set("Total Size: 0.00 GB")
+
+    def visible_folders(self):
+        """Folder indexes in list order: the sorted/filtered view, or every folder"""
+        if self.folder_view is not None:
+            return self.folder_view
+        return range(len(self.data['folders']))
+
+    def folder_position(self, idx):
+        """Row of folder idx in the list, None if it is filtered out"""
+        if self.folder_positions is not None:
+            return self.folder_positions.get(idx)
+        return idx if 0 <= idx < len(self.data['folders']) else None
+
+    def set_folder_table(self, table=None, load=True):
+        """Index the current folders (unless table is given) and re-apply sort and filters"""
+        self.folder_table = table if table is not None else FolderTable(self.data['folders'])
+        projects = sorted(project for project in self.folder_table.projects if project)
+        extensions = sorted(self.folder_table.extensions)
+        self.project_filter['values'] = (self.ALL, *projects)
+        self.extension_filter['values'] = (self.ALL, *extensions)
+        # Names from a previous scan would match nothing
+        if self.filter_project_var.get() not in projects:
+            self.filter_project_var.set(self.ALL)
+        if self.filter_extension_var.get() not in extensions:
+            self.filter_extension_var.set(self.ALL)
+        self.apply_folder_view(load)
+
+    def folder_view_query(self):
+        """FolderTable.query arguments from the controls; None for plain path order"""
+        query = {'sort': self.sort_var.get(), 'descending': self.sort_descending_var.get()}
+        if self.filter_project_var.get() != self.ALL:
+            query['project'] = self.filter_project_var.get()
+        if self.filter_extension_var.get() != self.ALL:
+            query['extension'] = self.filter_extension_var.get()
+        marked = self.STATUS_FILTERS[self.filter_status_var.get()]
+        if marked is not None:
+            query['marked'] = marked
+        for key, var in (('older_than_days', self.filter_older_var),
+                         ('min_size_mb', self.filter_min_size_var)):
+            text = var.get().strip()
+            if text:
+                query[key] = float(text)
+        if query == {'sort': 'path', 'descending': False}:
+            return None
+        return query
+
+    def apply_folder_view(self, load=True):
+        """Query the folder table and rebuild the list in the new order.
+
+        If the current folder is filtered out, the first match becomes
+        current (and is shown when load is set).
+        """
+        if self.folder_table is None or not self.data.get('folders'):
+            return
+        try:
+            query = self.folder_view_query()
+        except ValueError:
+            messagebox.showerror("Error", "Age and size filters must be numbers")
+            return
+        if query is None:
+            self.folder_view = self.folder_positions = None
+        else:
+            self.folder_view = self.folder_table.query(**query)
+            self.folder_positions = {idx: position for position, idx in enumerate(self.folder_view)}
+        moved = self.folder_position(self.current_folder_index) is None and bool(self.folder_view)
+        if moved:
+            self.current_folder_index = self.folder_view[0]
+        self.update_folder_list()
+        if not self.folder_view and self.folder_view is not None:
+            self.status_var.set("No folders match the filters")
+        elif moved and load:
+            self.load_current_folder()
+
+    def reset_folder_view(self):
+        self.sort_var.set('path')
+        self.sort_descending_var.set(False)
+        for var in (self.filter_project_var, self.filter_extension_var, self.filter_status_var):
+            var.set(self.ALL)
+        self.filter_older_var.set('')
+        self.filter_min_size_var.set('')
+        self.apply_folder_view()
+
+    def refresh_folder_row(self, idx):
+        """Update one folder row, touching Tk only if its text or tag changed"""
+        if idx not in self.folder_rows:
+            return  # filtered out
+        row = self.folder_row(self.data['folders'][idx])
+        if self.folder_rows[idx] != row:
+            self.folder_rows[idx] = row
+            text, tag = row
+            self.folder_list.item(str(idx), text=text, tags=(tag,))
+
+    def select_folder_row(self, idx):
+        item = str(idx)
+        if self.folder_list.selection() != (item,):
+            self.folder_list.selection_set(item)
+        self.folder_list.see(item)
+
+    def folder_row(self, folder):
+        """Display text and tag for a folder list row"""
+        folder_text = f"{folder['name']} ({folder['size_mb']:.1f}MB)"
+        if folder.get('camera_vendor'):
+            folder_text += f" - {folder['camera_vendor']}"
+        if folder.get('marked_for_deletion'):
+            folder_text += " [DELETE]"
+        tag = 'marked' if folder.get('marked_for_deletion') else ''
+        return folder_text, tag
+
+    def on_folder_select(self, event):
+        """Handle folder selection from the list"""
+        selection = self.folder_list.selection()
+        if selection:
+            idx = int(selection[0])
+            if idx != self.current_folder_index:
+                self.current_folder_index = idx
+                self.load_current_folder()
+            
+    def load_existing_scan(self):
+        """Load a previously saved JSON scan file"""
+        json_file = filedialog.askopenfilename(
+            title="Select Scan File",
+            filetypes=[("Scan files", "*.json *.ndjson *.jsonl *.mscan"), ("JSON files", "*.json"), ("NDJSON files", "*.ndjson *.jsonl"), ("Compact scans", "*.mscan"), ("All files", "*.*")]
+        )
+        
+        if json_file:
+            self.load_scan_file(json_file)
+
+    def load_scan_file(self, json_file):
+        """Open a JSON or NDJSON scan through its offset index.
+
+        The folder list only gets summary fields, streamed in as the index is
+        built (or all at once when a saved index is reused), and each full
+        record is read when load_current_folder selects it.
+        """
+        self.stop_watch()
+        self.data = {'folders': [], 'json_path': json_file}
+        self.scan_index = None
+        self.folder_table = None
+        self.folder_view = self.folder_positions = None
+        self.current_folder_index = 0
+        self.open_marks_journal(json_file)
+        self.update_folder_list()
+        stream = Queue()
+        
+        def reader():
+            try:
+                index = ScanIndex.open(json_file, on_folders=lambda batch: stream.put(('folders', batch)))
+                stream.put(('index', index))
+                stream.put(('table', FolderTable(index.folders)))
+            except Exception as e:
+                stream.put(('error', str(e)))
+            stream.put(('done', None))
+        
+        threading.Thread(target=reader, daemon=True).start()
+        self.drain_scan_stream(stream, json_file)
+
+    def drain_scan_stream(self, stream, json_file, max_batches=20):
+        """Apply loaded folder batches on the Tk thread, a few per tick"""
+        if self.data.get('json_path') != json_file:
+            return  # another scan was opened meanwhile
+        
+        for _ in range(max_batches):
+            try:
+                kind, payload = stream.get_nowait()
+            except Empty:
+                break
+            
+            if kind == 'folders':
+                start = len(self.data['folders'])
+                self.data['folders'].extend(payload)
+                if start == 0:
+                    self.show_loaded_scan()
+                else:
+                    self.append_folder_rows(range(start, len(self.data['folders'])))
+            elif kind == 'index':
+                self.scan_index = payload
+            elif kind == 'table':
+                self.folder_table = payload
+            elif kind == 'error':
+                messagebox.showerror("Error", f"Could not load scan file: {payload}")
+            elif kind == 'done':
+                self.finish_scan_stream()
+                return
+        
+        self.root.after(50, self.drain_scan_stream, stream, json_file)
+
+    def show_loaded_scan(self):
+        self.scan_frame.pack_forget()
+        self.viewer_frame.pack(fill=tk.BOTH, expand=True)
+        self.load_current_folder()
+
+    def finish_scan_stream(self):
+        if self.scan_index is None:
+            return
+        folders = self.scan_index.folders
+        if not folders:
+            messagebox.showwarning("No Results", "The scan file contains no folders.")
+            return
+        
+        # The index holds the same summaries in path order
+        current = self.data['folders'][self.current_folder_index] if self.data['folders'] else None
+        self.data.update({key: value for key, value in self.scan_index.header.items() if key != 'json_path'})
+        self.data['folders'] = folders
+        self.data.update(summarize_folders(folders))
+        if current is None:
+            self.set_folder_table(self.folder_table, load=False)
+            self.show_loaded_scan()
+            return
+        self.current_folder_index = next(i for i, folder in enumerate(folders) if folder is current)
+        self.set_folder_table(self.folder_table)
+
+    def folder_record(self, index):
+        """Full record of a folder; scans opened through an index only list summaries"""
+        folder = self.data['folders'][index]
+        if 'offset' not in folder:
+            return folder
+        # Offsets are known before the index is complete
+        scan_index = self.scan_index or ScanIndex(self.data['json_path'])
+        return scan_index.load_folder(folder)
+
+    def append_folder_rows(self, indexes):
+        """Add list rows for the given folder indexes, in order"""
+        for idx in indexes:
+            folder = self.data['folders'][idx]
+            row = self.folder_row(folder)
+            text, tag = row
+            self.folder_list.insert('', 'end', iid=str(idx), text=text, values=(idx,), tags=(tag,))
+            self.folder_rows[idx] = row
+            self.total_size_mb += folder['size_mb']
+        total_text = f"Total Size: {self.total_size_mb / 1024:.2f} GB"
+        if self.folder_view is not None:
+            total_text += f" ({len(self.folder_view)} of {len(self.data['folders'])} folders)"
+        self.total_size_var.set(total_text)
+                
+    def select_folder(self):
+        folder_path = filedialog.askdirectory(title="Select Folder to Scan")
+        if folder_path:
+            self.start_scan(folder_path)
+
+    def select_folders(self):
+        """Pick drives or shares one after another (cancel to finish) and scan them together"""
+        folder_paths = []
+        while True:
+            folder_path = filedialog.askdirectory(
+                title=f"Select Folder {len(folder_paths) + 1} to Scan (Cancel when done)")
+            if not folder_path:
+                break
+            folder_paths.append(folder_path)
+        if folder_paths:
+            self.start_scan(folder_paths if len(folder_paths) > 1 else folder_paths[0])
+
+    def rescan_existing(self):
+        """Rescan the roots of a previous scan, reusing unchanged folders and marks"""
+        json_file = filedialog.askopenfilename(
+            title="Select Previous Scan File",
+            filetypes=[("Scan files", "*.json *.ndjson *.jsonl *.mscan"), ("JSON files", "*.json"), ("NDJSON files", "*.ndjson *.jsonl"), ("Compact scans", "*.mscan"), ("All files", "*.*")]
+        )
+        
+        if json_file:
+            try:
+                folder_paths = scan_roots(ScanIndex.open(json_file).header)
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not load scan file: {str(e)}")
+                return
+            
+            for folder_path in folder_paths:
+                if not os.path.isdir(folder_path):
+                    messagebox.showerror("Error", f"Scanned folder no longer exists: {folder_path}")
+                    return
+            self.start_scan(folder_paths if len(folder_paths) > 1 else folder_paths[0],
+                            previous_scan=json_file)
+
+    def start_scan(self, folder_path, previous_scan=None):
+        self.progress_var.set(0)
+        self.progress_text_var.set("")
+        self.scanning = True
+        
+        # Create output filename from folder name
+        if self.stream_output_var.get():
+            output_format = 'ndjson'
+        else:
+            output_format = 'compact' if self.compact_output_var.get() else 'json'
+        output_file = default_output_file(folder_path, SCAN_FORMAT_EXTENSIONS[output_format])
+        
+        # Start scanning in a separate thread
+        try:
+            workers = self.scan_workers_var.get()
+        except tk.TclError:
+            workers = 1
+        scanner = self.scanner = MediaScanner(folder_path, output_file, workers=workers,
+                                              previous_scan=previous_scan,
+                                              find_duplicates=self.find_duplicates_var.get(),
+                                              disk_usage=self.disk_usage_var.get())
+        
+        def scan_thread():
+            self.data = scanner.scan_and_save(self.update_progress)
+            if self.data and not is_ndjson_path(output_file):
+                self.data['json_path'] = output_file
+            self.root.after(0, self.scanning_complete)
+        
+        threading.Thread(target=scan_thread, daemon=True).start()
+        self.poll_progress()
+
+    def update_progress(self, snapshot):
+        """Progress callback; runs on the scan thread, so only queue the snapshot"""
+        self.progress_events.put(snapshot)
+
+    def poll_progress(self):
+        """Drain queued progress snapshots on the Tk thread at a fixed frame rate"""
+        snapshot = None
+        while True:
+            try:
+                snapshot = self.progress_events.get_nowait()
+            except Empty:
+                break
+        
+        if snapshot:
+            self.progress_var.set(snapshot['percent'])
+            self.progress_text_var.set(format_progress(snapshot))
+        if self.scanning:
+            self.root.after(self.progress_frame_ms, self.poll_progress)
+
+    def scanning_complete(self):
+        self.scanning = False
+        self.poll_progress()
+        if self.data and self.data.get('total_folders') and is_ndjson_path(self.data.get('output_file')):
+            # Streamed scans keep no folder list in memory; read the file back
+            self.load_scan_file(self.data['output_file'])
+        elif self.data and self.data.get('folders'):
+            self.scan_index = None
+            self.open_marks_journal(self.data['json_path'])
+            self.current_folder_index = 0
+            self.set_folder_table(load=False)
+            self.scan_frame.pack_forget()
+            self.viewer_frame.pack(fill=tk.BOTH, expand=True)
+            self.load_current_folder()
+        else:
+            messagebox.showwarning("No Results", 
+                                 "No camera media folders found in the selected directory.")
+
+    def new_scan(self):
+        self.viewer_frame.pack_forget()
+        self.scan_frame.pack(fill=tk.BOTH, expand=True)
+        self.progress_var.set(0)
+        
+    def load_current_folder(self):
+        if not self.data['folders']:
+            messagebox.showerror("Error", "No folders found in scan results")
+            return
+
+        try:
+            folder_data = self.folder_record(self.current_folder_index)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Could not read folder record: {str(e)}")
+            return
+        folder_path = folder_data['path'].replace('\\\\', '\\')
+
+        # Update JSON display
+        self.json_text.delete(1.0, tk.END)
+        json_str = json.dumps(folder_data, indent=2, default=json_default)
+        self.json_text.insert(tk.END, json_str)
+        
+        duplicates = folder_data.get('duplicates')
+        duplicate_text = (f"Duplicates: {duplicates['files']} files, "
+                          f"{duplicates['reclaimable_mb']:.2f} MB reclaimable\n" if duplicates else "")
+        disk_usage = folder_data.get('disk_usage')
+        disk_text = (f"On disk: {disk_usage['allocated_bytes'] / (1024 * 1024):.2f} MB, "
+                     f"{disk_usage['reclaimable_mb']:.2f} MB reclaimable\n" if disk_usage else "")
+        self.folder_info.config(text=f"Folder: {folder_data['name']}\n"
+                                   f"Project: {folder_data['project_name']}\n"
+                                   f"Path: {folder_path}\n"
+                                   f"Size: {folder_data['size_mb']:.2f} MB\n"
+                                   f"Photos: {folder_data['media_info']['photos']}, "
+                                   f"Videos: {folder_data['media_info']['videos']}\n"
+                                   f"{disk_text}"
+                                   f"{duplicate_text}"
+                                   f"Status: {'Marked for deletion' if folder_data.get('marked_for_deletion') else 'Keep'}")
+        
+        self.thumbnail_grid.clear()
+        
+        # Collect all media files and video sidecar previews (.THM etc.),
+        # unless the prefetcher already listed this folder
+        listing = self.prefetcher.take_listing(folder_path)
+        if listing is None:
+            listing = list_media_files(folder_path, self.thumbnail_grid.file_types)
+        self.file_list, video_previews = listing
+        self.file_list = list(self.file_list)
+        
+        # Virtual grid binds its cell pool to the list; otherwise load in batches
+        if self.thumbnail_grid.virtual:
+            self.thumbnail_grid.set_files(self.file_list, video_previews)
+        else:
+            self.thumbnail_grid.video_previews = video_previews
+            self.load_file_batch(0)
+        
+        visible = self.visible_folders()
+        position = self.folder_position(self.current_folder_index)
+        if position is None:
+            self.status_var.set("Folder hidden by the filters")
+        else:
+            self.status_var.set(f"Folder {position + 1} of {len(visible)}")
+        if len(self.folder_rows) != len(visible):
+            self.update_folder_list()
+        else:
+            self.refresh_folder_row(self.current_folder_index)
+            self.select_folder_row(self.current_folder_index)
+        self.prefetch_adjacent_folders()
+
+    def prefetch_adjacent_folders(self):
+        """Prefetch the next folder, then the previous one, while this one is shown"""
+        folders = self.data['folders']
+        visible = self.visible_folders()
+        position = self.folder_position(self.current_folder_index)
+        adjacent = []
+        for neighbour in ((position + 1, position - 1) if position is not None else ()):
+            if 0 <= neighbour < len(visible):
+                adjacent.append(folders[visible[neighbour]]['path'].replace('\\\\', '\\'))
+        current = folders[self.current_folder_index]['path'].replace('\\\\', '\\')
+        self.prefetcher.prefetch(adjacent, self.thumbnail_grid.screenful(), keep=[current])
+
+    def load_file_batch(self, start_index, batch_size=20):
+        """Load files in smaller batches"""
+        columns = 4
+        end_index = min(start_index + batch_size, len(self.file_list))
+        
+        first_screen = self.thumbnail_grid.screenful()
+        for idx in range(start_index, end_index):
+            row = idx // columns
+            col = idx % columns
+            priority = PRIORITY_VISIBLE if idx < first_screen else PRIORITY_OFFSCREEN
+            self.thumbnail_grid.add_thumbnail(self.file_list[idx], row, col, priority)
+            
+        # Schedule next batch if there are more files
+        if end_index < len(self.file_list):
+            self.root.after(100, lambda: self.load_file_batch(end_index))
+
+
+    def prev_folder(self):
+        self.step_folder(-1)
+
+    def next_folder(self):
+        self.step_folder(1)
+
+    def step_folder(self, step):
+        """Move to the folder step rows away in the (sorted, filtered) list"""
+        visible = self.visible_folders()
+        position = self.folder_position(self.current_folder_index)
+        if position is not None and 0 <= position + step < len(visible):
+            self.current_folder_index = visible[position + step]
+            self.load_current_folder()
+
+    def mark_deletion(self):
+        self.set_mark(True)
+
+    def mark_keep(self):
+        self.set_mark(False)
+
+    def set_mark(self, marked: bool):
+        folder = self.data['folders'][self.current_folder_index]
+        folder['marked_for_deletion'] = marked
+        if self.folder_table is not None:
+            self.folder_table.set_marked(self.current_folder_index, marked)
+        if self.marks is not None:
+            self.marks.mark(folder['path'], marked_for_deletion=marked)
+        if self.watcher is not None:
+            self.watcher.mark(folder['path'], marked_for_deletion=marked)
+        self.load_current_folder()
+
+    def open_folder(self):
+        folder_path = self.data['folders'][self.current_folder_index]['path'].replace('\\\\', '\\')
+        try:
+            if os.name == 'nt':  # Windows
+                os.startfile(folder_path)
+            elif os.name == 'posix':  # macOS and Linux
+                subprocess.run(['xdg-open' if os.name == 'posix' else 'open', folder_path])
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not open folder: {str(e)}")
+
+    def open_marks_journal(self, scan_path):
+        """Send marks to the journal of scan_path instead of rewriting the scan file"""
+        if self.marks is not None:
+            self.marks.close()
+        self.marks = MarksJournal(scan_path)
+
+    def toggle_watch(self):
+        if self.watch_var.get():
+            self.start_watch()
+        else:
+            self.stop_watch()
+
+    def start_watch(self):
+        """Watch the open scan's folders and apply changes to the list as they settle"""
+        scan_path = getattr(self, 'data', None) and self.data.get('json_path')
+        if not scan_path:
+            self.watch_var.set(False)
+            return
+        self.status_var.set("Starting watch...")
+        events = Queue()
+
+        def starter():
+            try:
+                # The watcher needs full records; the list may only hold index summaries
+                # Index the updated folders off the Tk thread
+                watcher = ScanWatcher(load_scan(scan_path), scan_path,
+                                      on_update=lambda changes: events.put(
+                                          ('update', (changes, FolderTable(watcher.snapshot())))))
+                watcher.start()
+                events.put(('started', watcher))
+            except Exception as e:
+                events.put(('error', str(e)))
+
+        threading.Thread(target=starter, daemon=True).start()
+        self.drain_watch_events(scan_path, events)
+
+    def stop_watch(self):
+        self.watch_var.set(False)
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+    def drain_watch_events(self, scan_path, events, watcher=None):
+        """Apply watcher updates on the Tk thread until this watch is stopped"""
+        if watcher is not None and self.watcher is not watcher:
+            return
+        while True:
+            try:
+                kind, payload = events.get_nowait()
+            except Empty:
+                break
+            if kind == 'started':
+                watcher = payload
+                if (self.watcher is not None or not self.watch_var.get()
+                        or self.data.get('json_path') != scan_path):
+                    # Switched off, or another scan opened, while the watches were added
+                    watcher.stop()
+                    return
+                self.watcher = watcher
+                self.status_var.set(f"Watching {len(watcher.watches)} folders")
+            elif kind == 'error':
+                self.watch_var.set(False)
+                messagebox.showerror("Error", f"Could not watch scan folders: {payload}")
+                return
+            elif kind == 'update':
+                self.apply_watch_update(*payload)
+        self.root.after(200, self.drain_watch_events, scan_path, events, watcher)
+
+    def apply_watch_update(self, changes, table):
+        """Swap in the watcher's folder records, keeping the current folder selected"""
+        folders = self.data['folders']
+        current = folders[self.current_folder_index]['path'] if folders else None
+        self.data['folders'] = table.folders
+        self.data.update(summarize_folders(self.data['folders']))
+        self.scan_index = None
+        paths = [folder['path'] for folder in self.data['folders']]
+        self.current_folder_index = paths.index(current) if current in paths else 0
+        self.set_folder_table(table, load=False)
+        self.status_var.set(f"{len(changes['added'])} added, {len(changes['updated'])} updated, "
+                            f"{len(changes['removed'])} removed")
+        if not self.data['folders']:
+            return
+        changed = changes['updated'] + changes['removed']
+        if (current is None or current.replace('\\\\', '\\') in changed
+                or self.data['folders'][self.current_folder_index]['path'] != current):
+            self.load_current_folder()
+
+    def on_close(self):
+        self.stop_watch()
+        if self.marks is not None:
+            self.marks.close()
+        self.root.destroy()
+
+def main():
+    root = tk.Tk()
+    app = MediaManager(root)
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
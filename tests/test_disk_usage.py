@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+
+from mediaScan import MediaScanner
+
+
+def allocated(path):
+    return os.stat(path).st_blocks * 512
+
+
+@unittest.skipUnless(hasattr(os.stat_result, 'st_blocks'), 'needs st_blocks')
+class DiskUsageTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmp.name, 'backup')
+        self.first = os.path.join(self.base, 'Day_01', 'DCIM', '100CANON')
+        self.second = os.path.join(self.base, 'Day_02', 'DCIM', '100CANON')
+        os.makedirs(self.first)
+        os.makedirs(self.second)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, size=50000):
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        return path
+
+    def scan(self):
+        output = os.path.join(self.tmp.name, 'scan.json')
+        data = MediaScanner(self.base, output, disk_usage=True).scan_and_save()
+        return data, {folder['path']: folder['disk_usage'] for folder in data['folders']}
+
+    def test_hardlinks_inside_a_folder_count_once(self):
+        original = self.write(os.path.join(self.first, 'IMG_0001.JPG'))
+        os.link(original, os.path.join(self.first, 'IMG_0001_link.JPG'))
+        other = self.write(os.path.join(self.second, 'IMG_0002.JPG'))
+
+        data, by_path = self.scan()
+
+        self.assertEqual(by_path[self.first]['allocated_bytes'], allocated(original))
+        self.assertEqual(by_path[self.first]['reclaimable_bytes'], allocated(original))
+        self.assertEqual(by_path[self.first]['shared_files'], 0)
+        self.assertEqual(data['disk_usage']['allocated_bytes'], allocated(original) + allocated(other))
+        self.assertEqual(data['disk_usage']['logical_bytes'], 150000)
+        self.assertEqual(data['disk_usage']['shared_files'], 0)
+
+    def test_hardlink_across_folders_frees_nothing_alone(self):
+        original = self.write(os.path.join(self.first, 'IMG_0001.JPG'))
+        os.link(original, os.path.join(self.second, 'IMG_0001.JPG'))
+        own = self.write(os.path.join(self.second, 'IMG_0002.JPG'))
+
+        data, by_path = self.scan()
+
+        self.assertEqual(by_path[self.first]['allocated_bytes'], allocated(original))
+        self.assertEqual(by_path[self.first]['reclaimable_bytes'], 0)
+        self.assertEqual(by_path[self.first]['shared_files'], 1)
+        self.assertEqual(by_path[self.second]['reclaimable_bytes'], allocated(own))
+        # Both links are in the scan, so the blocks are counted once and freed with both
+        self.assertEqual(data['disk_usage']['allocated_bytes'], allocated(original) + allocated(own))
+        self.assertEqual(data['disk_usage']['reclaimable_bytes'], allocated(original) + allocated(own))
+        self.assertEqual(data['disk_usage']['shared_files'], 0)
+
+    def test_link_outside_the_scan_stays_shared(self):
+        original = self.write(os.path.join(self.first, 'IMG_0001.JPG'))
+        os.link(original, os.path.join(self.tmp.name, 'outside.JPG'))
+
+        data, by_path = self.scan()
+
+        self.assertEqual(by_path[self.first]['reclaimable_bytes'], 0)
+        self.assertEqual(data['disk_usage']['allocated_bytes'], allocated(original))
+        self.assertEqual(data['disk_usage']['reclaimable_bytes'], 0)
+        self.assertEqual(data['disk_usage']['shared_files'], 1)
+
+    def test_sparse_file_counts_allocated_blocks(self):
+        sparse = os.path.join(self.first, 'MVI_0001.MOV')
+        with open(sparse, 'wb') as f:
+            f.truncate(10 * 1024 * 1024)
+            f.write(b'\xff' * 4096)
+        if allocated(sparse) >= os.path.getsize(sparse):
+            self.skipTest('filesystem does not keep sparse files')
+
+        data, by_path = self.scan()
+
+        self.assertEqual(by_path[self.first]['allocated_bytes'], allocated(sparse))
+        self.assertEqual(data['disk_usage']['logical_bytes'], os.path.getsize(sparse))
+        self.assertLess(data['disk_usage']['allocated_bytes'], data['disk_usage']['logical_bytes'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+
+from mediaScan import DuplicateFinder, MediaScanner, duplicate_stats_by_folder
+
+
+class DuplicateTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmp.name, 'backup')
+        self.first = os.path.join(self.base, 'Day_01', 'DCIM', '100CANON')
+        self.second = os.path.join(self.base, 'Day_02', 'DCIM', '100CANON')
+        os.makedirs(self.first)
+        os.makedirs(self.second)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, content):
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def scan(self):
+        output = os.path.join(self.tmp.name, 'scan.json')
+        return MediaScanner(self.base, output, find_duplicates=True).scan_and_save()
+
+    def test_groups_equal_content_only(self):
+        # Same size everywhere; the large pair differs only in the middle
+        middle = bytearray(os.urandom(300000))
+        self.write(os.path.join(self.first, 'IMG_0001.JPG'), bytes(middle))
+        self.write(os.path.join(self.second, 'IMG_0001.JPG'), bytes(middle))
+        middle[150000] ^= 0xFF
+        self.write(os.path.join(self.second, 'IMG_0002.JPG'), bytes(middle))
+
+        data = self.scan()
+
+        self.assertEqual(data['duplicates']['groups'], 1)
+        self.assertEqual(data['duplicates']['reclaimable_bytes'], 300000)
+        group = data['duplicate_groups'][0]
+        self.assertEqual(group['files'], [os.path.join(self.first, 'IMG_0001.JPG'),
+                                          os.path.join(self.second, 'IMG_0001.JPG')])
+        self.assertEqual(group['copies'], 2)
+        self.assertNotIn('hardlinks', group)
+        by_path = {folder['path']: folder for folder in data['folders']}
+        self.assertEqual(by_path[self.first]['duplicates']['reclaimable_bytes'], 300000)
+        self.assertEqual(by_path[self.second]['duplicates']['reclaimable_bytes'], 300000)
+
+    def test_hardlinks_are_not_reclaimable(self):
+        for index in (1, 2):
+            original = self.write(os.path.join(self.first, f'IMG_000{index}.JPG'), os.urandom(75000))
+            os.link(original, os.path.join(self.second, f'IMG_000{index}.JPG'))
+
+        data = self.scan()
+
+        self.assertEqual(data['duplicates']['groups'], 0)
+        self.assertEqual(data['duplicates']['reclaimable_bytes'], 0)
+        # One read per inode; the two links are never hashed
+        self.assertEqual(data['duplicates']['edge_hashed'], 2)
+        self.assertEqual(data['duplicates']['hardlinks_skipped'], 2)
+
+    def test_hardlinked_copy_is_hashed_once(self):
+        content = os.urandom(75000)
+        original = self.write(os.path.join(self.first, 'IMG_0001.JPG'), content)
+        alias = os.path.join(self.first, 'IMG_0001_link.JPG')
+        os.link(original, alias)
+        copy = self.write(os.path.join(self.second, 'IMG_0001.JPG'), content)
+
+        data = self.scan()
+
+        self.assertEqual(data['duplicates']['edge_hashed'], 2)
+        self.assertEqual(data['duplicates']['hardlinks_skipped'], 1)
+        self.assertEqual(data['duplicates']['reclaimable_bytes'], 75000)
+        group = data['duplicate_groups'][0]
+        self.assertEqual(group['files'], sorted([original, alias, copy]))
+        self.assertEqual(group['copies'], 2)
+        self.assertEqual(group['hardlinks'], [sorted([original, alias])])
+
+    def test_copy_with_a_link_elsewhere_frees_nothing(self):
+        group = {'id': 0, 'size': 100, 'files': ['/a/x', '/b/x', '/c/x'], 'copies': 2,
+                 'hardlinks': [['/a/x', '/b/x']]}
+        stats = duplicate_stats_by_folder([group], {'/a', '/b', '/c'})
+        self.assertEqual(stats['/a']['reclaimable_bytes'], 0)
+        self.assertEqual(stats['/c']['reclaimable_bytes'], 100)
+
+    def test_single_inode_sizes_are_dropped(self):
+        finder = DuplicateFinder(workers=1)
+        groups = finder.find({10: [('/a/x', (1, 5)), ('/b/x', (1, 5))], 20: [('/a/y', None)]})
+        self.assertEqual(groups, [])
+        self.assertEqual(finder.stats['files_considered'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+from mediaScan import MediaScanner, load_scan, save_scan
+
+TOTALS = ('total_folders', 'total_size_mb', 'total_size_gb', 'disk_usage')
+
+
+class IncrementalRescanTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmp.name, 'backup')
+        self.cameras = [os.path.join(self.base, 'Project', day, 'DCIM', '100CANON')
+                        for day in ('Day_01', 'Day_02', 'Day_03')]
+        for camera in self.cameras:
+            os.makedirs(camera)
+            self.write(camera, 'IMG_0001.JPG')
+            self.write(camera, 'MVI_0002.MOV', 3000)
+        # A hardlink across folders keeps those two from being reused
+        os.link(os.path.join(self.cameras[0], 'IMG_0001.JPG'), os.path.join(self.cameras[1], 'IMG_0003.JPG'))
+        self.previous = os.path.join(self.tmp.name, 'previous.json')
+        MediaScanner(self.base, self.previous, disk_usage=True).scan_and_save()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, directory, name, size=1000):
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(os.urandom(size))
+
+    def rescan(self, previous_scan=None):
+        name = 'incremental.json' if previous_scan else 'full.json'
+        scanner = MediaScanner(self.base, os.path.join(self.tmp.name, name),
+                               previous_scan=previous_scan, disk_usage=True)
+        return scanner, scanner.scan_and_save()
+
+    def assert_same_scan(self, incremental, full):
+        self.assertEqual(incremental['folders'], full['folders'])
+        for key in TOTALS:
+            self.assertEqual(incremental[key], full[key], key)
+
+    def test_unchanged_tree_matches_full_scan(self):
+        scanner, incremental = self.rescan(self.previous)
+        _, full = self.rescan()
+
+        self.assert_same_scan(incremental, full)
+        # Day_03's DCIM and 100CANON; the hardlinked days are rescanned
+        self.assertEqual(scanner.reused_folders, 2)
+
+    def test_changed_folders_match_full_scan(self):
+        self.write(self.cameras[2], 'IMG_0004.CR2', 5000)
+        os.remove(os.path.join(self.cameras[0], 'MVI_0002.MOV'))
+        new_camera = os.path.join(self.base, 'Project', 'Day_04', 'DCIM', '101CANON')
+        os.makedirs(new_camera)
+        self.write(new_camera, 'IMG_0005.JPG')
+
+        scanner, incremental = self.rescan(self.previous)
+        _, full = self.rescan()
+
+        self.assert_same_scan(incremental, full)
+        self.assertEqual(scanner.reused_folders, 0)
+
+    def test_review_marks_are_carried_over(self):
+        previous = load_scan(self.previous)
+        for folder in previous['folders']:
+            folder['processed'] = True
+            folder['marked_for_deletion'] = True
+        save_scan(previous, self.previous)
+        self.write(self.cameras[2], 'IMG_0004.CR2', 5000)
+
+        _, incremental = self.rescan(self.previous)
+        _, full = self.rescan()
+
+        for folder in incremental['folders']:
+            self.assertTrue(folder['processed'])
+            self.assertTrue(folder['marked_for_deletion'])
+        for folder in full['folders']:
+            folder['processed'] = True
+            folder['marked_for_deletion'] = True
+        self.assert_same_scan(incremental, full)
+
+
+if __name__ == '__main__':
+    unittest.main()
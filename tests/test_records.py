@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+import unittest
+
+from mediaScan import FolderRecord, MediaScanner, json_default, load_scan, save_scan
+
+
+class FolderRecordTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmp.name, 'backup')
+        for day in ('Day_01', 'Day_02'):
+            for camera, files in (('100CANON', ('IMG_0001.JPG', 'IMG_0002.CR2')), ('101CANON', ('MVI_0003.MOV',))):
+                directory = os.path.join(self.base, 'Project', day, 'DCIM', camera)
+                os.makedirs(directory)
+                for name in files:
+                    with open(os.path.join(directory, name), 'wb') as f:
+                        f.write(os.urandom(2000))
+        self.output = os.path.join(self.tmp.name, 'scan.json')
+        MediaScanner(self.base, self.output, find_duplicates=True, disk_usage=True).scan_and_save()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_load_scan_dumps_like_plain_json(self):
+        with open(self.output, 'r', encoding='utf-8') as f:
+            plain = json.load(f)
+        data = load_scan(self.output)
+
+        self.assertTrue(all(isinstance(folder, FolderRecord) for folder in data['folders']))
+        # Same keys, values and key order
+        self.assertEqual(json.dumps(data, indent=4, default=json_default), json.dumps(plain, indent=4))
+
+    def test_save_of_a_loaded_scan_is_byte_identical(self):
+        with open(self.output, 'rb') as f:
+            original = f.read()
+        resaved = os.path.join(self.tmp.name, 'resaved.json')
+        save_scan(load_scan(self.output), resaved)
+        with open(resaved, 'rb') as f:
+            self.assertEqual(f.read(), original)
+
+    def test_media_info_is_a_mutable_dict(self):
+        folder = load_scan(self.output)['folders'][0]
+        folder['media_info']['photos'] += 1
+        folder['media_info']['extensions']['.xmp'] = 1
+        self.assertEqual(json.loads(json.dumps(folder, default=json_default))['media_info'],
+                         folder['media_info'])
+
+    def test_keys_keep_dict_order(self):
+        plain = {'path': '/a/DCIM', 'disk_usage': {'allocated_bytes': 0}}
+        record = FolderRecord(plain)
+        record['name'] = 'DCIM'
+        plain['name'] = 'DCIM'
+        record['marked_for_deletion'] = True
+        plain['marked_for_deletion'] = True
+        self.assertEqual(list(record), list(plain))
+        self.assertEqual(record, plain)
+
+        del record['disk_usage']
+        del plain['disk_usage']
+        record['size_mb'] = 1.5
+        plain['size_mb'] = 1.5
+        self.assertEqual(json.dumps(record, default=json_default), json.dumps(plain))
+        self.assertEqual(len(record), len(plain))
+
+    def test_names_are_shared_within_a_load(self):
+        folders = load_scan(self.output)['folders']
+        projects = [folder['project_name'] for folder in folders if folder['project_name'] == 'DCIM']
+        self.assertGreater(len(projects), 1)
+        self.assertTrue(all(project is projects[0] for project in projects))
+
+
+if __name__ == '__main__':
+    unittest.main()
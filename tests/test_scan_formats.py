@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import unittest
+
+from mediaScan import MediaScanner, json_default, load_scan, run_cli, save_scan
+
+
+def folders_json(data):
+    # NDJSON keeps walk order; JSON and compact scans are sorted by path
+    folders = sorted(data['folders'], key=lambda folder: folder['path'].lower())
+    return json.dumps(folders, sort_keys=True, default=json_default)
+
+
+class ScanFormatTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmp.name, 'backup')
+        for day, camera, files in (('Day_01', '100CANON', ('IMG_0001.JPG', 'IMG_0002.CR2', 'MVI_0003.MOV')),
+                                   ('Day_02', '101CANON', ('IMG_0004.JPG', 'notes.txt'))):
+            directory = os.path.join(self.base, 'Project', day, 'DCIM', camera)
+            os.makedirs(directory)
+            for index, name in enumerate(files):
+                with open(os.path.join(directory, name), 'wb') as f:
+                    f.write(os.urandom(1000 * (index + 1)))
+        # A duplicate, so the per-folder and scan-level blocks are written too
+        with open(os.path.join(self.base, 'Project', 'Day_01', 'DCIM', '100CANON', 'IMG_0001.JPG'), 'rb') as f:
+            content = f.read()
+        with open(os.path.join(self.base, 'Project', 'Day_02', 'DCIM', '101CANON', 'IMG_0001.JPG'), 'wb') as f:
+            f.write(content)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def scan(self, name, output_format=None):
+        return MediaScanner(self.base, self.path(name), output_format=output_format,
+                            find_duplicates=True, disk_usage=True).scan_and_save()
+
+    def test_ndjson_scan_loads_like_json(self):
+        self.scan('scan.json')
+        self.scan('scan.ndjson', 'ndjson')
+        expected = load_scan(self.path('scan.json'))
+        loaded = load_scan(self.path('scan.ndjson'))
+
+        self.assertEqual(folders_json(loaded), folders_json(expected))
+        for key in ('total_folders', 'total_size_mb', 'total_size_gb', 'duplicates', 'disk_usage'):
+            self.assertEqual(loaded[key], expected[key], key)
+
+    def test_compact_round_trip(self):
+        self.scan('scan.json')
+        expected = load_scan(self.path('scan.json'))
+        save_scan(expected, self.path('scan.mscan'))
+        loaded = load_scan(self.path('scan.mscan'))
+
+        self.assertEqual(folders_json(loaded), folders_json(expected))
+        for key in ('total_folders', 'total_size_mb', 'total_size_gb', 'duplicates', 'disk_usage'):
+            self.assertEqual(loaded[key], expected[key], key)
+
+        # And back to JSON without loss
+        save_scan(loaded, self.path('again.json'))
+        self.assertEqual(folders_json(load_scan(self.path('again.json'))), folders_json(expected))
+
+    def test_cli_rejects_format_the_extension_contradicts(self):
+        for output_format, name in (('compact', 'out.json'), ('ndjson', 'out.json'), ('json', 'out.mscan')):
+            output = self.path(name)
+            self.assertEqual(run_cli(['scan', self.base, '-f', output_format, '-o', output, '--json']), 1)
+            self.assertFalse(os.path.exists(output))
+
+        output = self.path('out.mscan')
+        self.assertEqual(run_cli(['scan', self.base, '-f', 'compact', '-o', output, '--json']), 0)
+        self.assertEqual(load_scan(output)['total_folders'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import unittest
+
+from mediaScan import FolderTable, MediaScanner, ScanIndex, load_scan
+
+
+class ScanIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmp.name, 'backup')
+        for project, day, camera, files in (
+                ('Wedding', 'Day_01', '100CANON', ('IMG_0001.JPG', 'IMG_0002.CR2')),
+                ('Wedding', 'Day_02', '101CANON', ('MVI_0003.MOV',)),
+                ('Überseestadt', 'Day_01', '100CANON', ('IMG_0004.JPG', 'IMG_0005.JPG'))):
+            directory = os.path.join(self.base, project, day, 'DCIM', camera)
+            os.makedirs(directory)
+            for index, name in enumerate(files):
+                with open(os.path.join(directory, name), 'wb') as f:
+                    f.write(os.urandom(1000 * (index + 1)))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def scan(self, name, output_format=None):
+        path = os.path.join(self.tmp.name, name)
+        MediaScanner(self.base, path, output_format=output_format).scan_and_save()
+        return path
+
+    def test_summaries_hold_scalars_only(self):
+        index = ScanIndex.open(self.scan('scan.json'))
+        for summary in index.folders:
+            self.assertNotIn('media_info', summary)
+            self.assertIsInstance(summary['extensions'], tuple)
+            self.assertIsInstance(summary['photos'], int)
+
+        # The saved sidecar loads back the same summaries
+        reopened = ScanIndex.open(index.scan_path)
+        self.assertEqual([dict(summary) for summary in reopened.folders],
+                         [dict(summary) for summary in index.folders])
+
+    def test_table_from_summaries_matches_full_records(self):
+        for name, output_format in (('scan.json', None), ('scan.ndjson', 'ndjson')):
+            path = self.scan(name, output_format)
+            summaries = FolderTable(ScanIndex.open(path).folders)
+            records = FolderTable(sorted(load_scan(path)['folders'], key=lambda x: x['path'].lower()))
+            for query in ({'extension': 'cr2'}, {'extension': '.mov'}, {'sort': 'photos', 'descending': True},
+                          {'project': 'DCIM', 'sort': 'videos'}, {'sort': 'size'}):
+                self.assertEqual(summaries.query(**query), records.query(**query), (name, query))
+
+    def test_load_folder_reads_the_full_record(self):
+        for name, output_format in (('scan.json', None), ('scan.ndjson', 'ndjson')):
+            path = self.scan(name, output_format)
+            index = ScanIndex.open(path)
+            records = {folder['path']: folder for folder in load_scan(path)['folders']}
+            for summary in index.folders:
+                self.assertEqual(index.load_folder(summary), records[summary['path']], name)
+
+    def test_json_offsets_across_chunk_boundaries(self):
+        path = self.scan('scan.json')
+        with open(path, 'rb') as f:
+            raw = f.read()
+        expected = ScanIndex(path)
+        expected_records = list(expected._json_records())
+        for chunk_size in (1, 3, 64):
+            index = ScanIndex(path)
+            index.CHUNK_SIZE = chunk_size
+            records = list(index._json_records())
+            self.assertEqual(records, expected_records, chunk_size)
+            self.assertEqual(index.header, expected.header)
+            for record, offset, length in records:
+                self.assertEqual(json.loads(raw[offset:offset + length]), record)
+
+
+if __name__ == '__main__':
+    unittest.main()
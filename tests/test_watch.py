@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import mediaScan
+from mediaScan import MarksJournal, MediaScanner, ScanWatcher, load_scan, read_marks
+
+
+class ApplyChangesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmp.name, 'backup')
+        self.day = os.path.join(self.base, 'Project', 'Day_01')
+        self.camera = os.path.join(self.day, 'DCIM', '100CANON')
+        os.makedirs(self.camera)
+        self.output = os.path.join(self.tmp.name, 'scan.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, size=1024, directory=None):
+        with open(os.path.join(directory or self.camera, name), 'wb') as f:
+            f.write(b'\0' * size)
+
+    def scan(self):
+        return MediaScanner(self.base, self.output).scan_and_save()
+
+    def assert_matches_full_scan(self, data):
+        rescan = list(MediaScanner(self.base, None).walk_camera_folders())
+        self.assertEqual([folder['path'] for folder in data['folders']],
+                         sorted(folder['path'] for folder in rescan))
+        self.assertEqual(data['total_folders'], len(rescan))
+
+    def test_media_added_to_camera_folder_without_record(self):
+        self.write('notes.txt')
+        data = self.scan()
+        self.assertEqual(data['total_folders'], 0)
+
+        self.write('IMG_0001.JPG')
+        changes = ScanWatcher(data, self.output).apply_changes([self.camera])
+
+        self.assertIn(self.camera, changes['added'])
+        self.assert_matches_full_scan(data)
+
+    def test_card_copied_into_project_day(self):
+        self.write('IMG_0001.JPG')
+        data = self.scan()
+
+        card = os.path.join(self.base, 'Project', 'Day_02', 'DCIM', '101CANON')
+        os.makedirs(card)
+        self.write('IMG_0002.JPG', directory=card)
+        changes = ScanWatcher(data, self.output).apply_changes(
+            [os.path.join(self.base, 'Project'), os.path.dirname(card), card])
+
+        self.assertEqual(changes['units'], [os.path.join(self.base, 'Project')])
+        self.assertIn(card, changes['added'])
+        self.assert_matches_full_scan(data)
+
+    def test_mark_journaled_during_save_is_kept(self):
+        self.write('IMG_0001.JPG')
+        data = self.scan()
+        journal = MarksJournal(self.output)
+        journal.mark(self.camera, processed=True)
+        journal.flush()
+
+        late = MarksJournal(self.output)
+        apply_marks = mediaScan.apply_marks
+
+        def mark_while_applying(folders, marks):
+            # The GUI journals a mark after the watcher replayed the journal
+            late.mark(self.camera, marked_for_deletion=True)
+            late.flush()
+            apply_marks(folders, marks)
+
+        self.write('IMG_0002.JPG')
+        with mock.patch('mediaScan.apply_marks', mark_while_applying):
+            ScanWatcher(data, self.output).apply_changes([self.camera])
+
+        self.assertEqual(read_marks(self.output), {self.camera: {'marked_for_deletion': True}})
+        folder = {folder['path']: folder for folder in load_scan(self.output)['folders']}[self.camera]
+        self.assertTrue(folder['processed'])
+        self.assertTrue(folder['marked_for_deletion'])
+
+
+class ScanUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmp.name, 'backup')
+        self.day = os.path.join(self.base, 'Project', 'Day_01')
+        self.dcim = os.path.join(self.day, 'DCIM')
+        self.camera = os.path.join(self.dcim, '100CANON')
+        os.makedirs(os.path.join(self.camera, 'sub'))
+        self.watcher = ScanWatcher({'base_path': self.base, 'folders': []})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def unit(self, path, by_path=(), camera_folders=None):
+        return self.watcher._scan_unit(path, dict.fromkeys(by_path), {} if camera_folders is None else camera_folders)
+
+    def test_outside_camera_folders_walks_the_directory_itself(self):
+        self.assertEqual(self.unit(self.day), self.day)
+        project = os.path.dirname(self.day)
+        self.assertEqual(self.unit(project), project)
+        self.assertEqual(self.unit(self.base), self.base)
+
+    def test_recorded_camera_folder_widens_to_outermost_parent(self):
+        self.assertEqual(self.unit(os.path.join(self.camera, 'sub'), (self.dcim, self.camera)), self.day)
+
+    def test_unrecorded_camera_folder_is_classified(self):
+        self.assertEqual(self.unit(self.camera), self.day)
+
+    def test_classification_stops_at_first_recorded_ancestor(self):
+        camera_folders = {}
+        self.unit(os.path.join(self.camera, 'sub'), (self.dcim, self.camera), camera_folders)
+        self.assertEqual(camera_folders, {os.path.join(self.camera, 'sub'): False})
+
+    def test_classification_is_memoized_per_batch(self):
+        camera_folders = {self.camera: False, self.dcim: False}
+        self.assertEqual(self.unit(self.camera, camera_folders=camera_folders), self.camera)
+
+
+if __name__ == '__main__':
+    unittest.main()